@@ -0,0 +1,98 @@
+"""_____________________________________________________________________
+
+:PROJECT: LabOP Device Ontology
+
+* Benchmark: memory footprint of the low-memory mode *
+
+:details:  python benchmarks/bench_low_memory.py [--devices N] [--emmo EMMO_FILE_OR_URL] [--rows-only]
+
+           measures the python memory (tracemalloc) of a synthetic catalogue
+             - catalogue rows, with and without interned values
+               (100000 devices: 227 MB plain, 122 MB interned)
+             - in-memory World after the import and a bulk read of all device records,
+               default and low-memory mode, with the per-component memory report
+               (entities: owlready2 objects still reachable after the import,
+                num_cached_entities: kept alive by the owlready2 entity ring buffer)
+
+.. note:: -
+.. todo:: -
+________________________________________________________________________
+"""
+
+import os
+import gc
+import argparse
+import resource
+import tempfile
+import tracemalloc
+import multiprocessing
+
+from labop_device_ontology.parallel_import import read_catalogue
+from labop_device_ontology.low_memory import format_memory_report
+
+from synthetic_catalogue import write_synthetic_catalogue
+
+FIXTURE_EMMO = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'test', 'data', 'emmo_minimal.ttl')
+
+
+def traced(function):
+    """result and retained python memory (bytes) of function()"""
+    gc.collect()
+    tracemalloc.start()
+    result = function()
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current
+
+
+def bench_rows(csv_filename: str) -> None:
+    for intern_values in (False, True):
+        rows, size = traced(lambda: read_catalogue(csv_filename, intern_values=intern_values))
+        print(f"catalogue rows {'interned' if intern_values else 'plain':8s}: {len(rows)} rows, "
+              f"{size / 2 ** 20:.1f} MB")
+        del rows
+
+
+def bench_world(csv_filename: str, low_memory: bool, emmo_filename: str = None) -> None:
+    from labop_device_ontology.labop_device_ontology_impl import LabwareInterface
+
+    def run():
+        lodev = LabwareInterface(emmo_filename=emmo_filename, low_memory=low_memory)
+        lodev.import_csv_parallel(csv_filename)
+        lodev.material_compatibility  # bulk read of all device records
+        return lodev
+
+    tracemalloc.start()
+    lodev = run()
+    gc.collect()
+    report = lodev.memory_report()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"--- World, {'low-memory' if low_memory else 'default'} mode")
+    print(format_memory_report(report))
+    print(f"{'python_peak':24s} {peak / 2 ** 20:>9.2f} MB")
+    # process peak incl. the SQLite database, which tracemalloc does not see (kilobytes on Linux)
+    print(f"{'process_peak_rss':24s} {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2 ** 10:>9.2f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="low-memory mode benchmark")
+    parser.add_argument("--devices", type=int, default=100000, help="number of synthetic devices")
+    parser.add_argument("--emmo", default=FIXTURE_EMMO, help="local EMMO file, default: the test fixture EMMO")
+    parser.add_argument("--rows-only", action="store_true", help="only measure the catalogue rows (no World)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_filename = write_synthetic_catalogue(os.path.join(tmp_dir, "catalogue.csv"), args.devices)
+        bench_rows(csv_filename)
+        if not args.rows_only:
+            for low_memory in (False, True):  # one process per mode, for comparable peak RSS
+                process = multiprocessing.get_context('spawn').Process(
+                    target=bench_world, args=(csv_filename, low_memory, args.emmo))
+                process.start()
+                process.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""_____________________________________________________________________
+
+:PROJECT: LabOP Device Ontology
+
+* Benchmark: parallel import scaling by number of worker processes *
+
+:details:  python benchmarks/bench_parallel_import.py [--devices N] [--workers 1 2 4 8] [--emmo EMMO_FILE_OR_URL]
+
+           - conversion: rows -> triples with encoded literals in the worker processes
+           - import (with --emmo): complete import_csv_parallel incl. the serial merge
+             into the quadstore (re-import of the same catalogue, devices are replaced)
+
+           speed-up relative to one worker process
+
+.. note:: the merge into the quadstore (abbreviation, bulk insert) is serial
+.. todo:: -
+________________________________________________________________________
+"""
+
+import os
+import time
+import argparse
+import tempfile
+
+from labop_device_ontology.parallel_import import convert_parallel, importable_datatypes, DEFAULT_CHUNK_SIZE
+from labop_device_ontology.tbox_schema import load_property_schema
+
+from synthetic_catalogue import write_synthetic_catalogue, synthetic_rows
+
+
+def best_time(function, repeat: int) -> float:
+    """best wall time in s"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def print_scaling(label: str, timings: dict) -> None:
+    base = timings[min(timings)]
+    for workers, seconds in timings.items():
+        print(f"{label:10s} {workers:7d} {seconds:9.3f} {base / seconds:8.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="parallel import benchmark")
+    parser.add_argument("--devices", type=int, default=100000, help="number of synthetic devices")
+    parser.add_argument("--workers", type=int, nargs='+', default=[1, 2, 4, 8], help="numbers of worker processes")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="rows per chunk")
+    parser.add_argument("--repeat", type=int, default=3, help="repetitions per worker count")
+    parser.add_argument("--emmo", default=None, help="local EMMO file, enables the complete import")
+    args = parser.parse_args()
+
+    rows = synthetic_rows(args.devices)
+    datatypes = importable_datatypes(load_property_schema(), set(rows[0]))
+    tbox_base_iri = 'http://www.labop.org/labop_device_tbox#'
+    groups = [('http://www.labop.org/labop_device_abox#', rows)]
+
+    print(f"{'stage':10s} {'workers':>7s} {'best s':>9s} {'speedup':>8s}")
+    print_scaling('conversion', {workers: best_time(lambda: convert_parallel(groups, tbox_base_iri, datatypes,
+                                                                             processes=workers,
+                                                                             chunk_size=args.chunk_size),
+                                                    args.repeat)
+                                 for workers in sorted(args.workers)})
+
+    if args.emmo is None:
+        return
+
+    from labop_device_ontology.labop_device_ontology_impl import LabwareInterface
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_filename = write_synthetic_catalogue(os.path.join(tmp_dir, "catalogue.csv"), args.devices)
+        lodev = LabwareInterface(emmo_filename=args.emmo)
+        print_scaling('import', {workers: best_time(lambda: lodev.import_csv_parallel(csv_filename,
+                                                                                      processes=workers),
+                                                    args.repeat)
+                                 for workers in sorted(args.workers)})
+
+
+if __name__ == "__main__":
+    main()
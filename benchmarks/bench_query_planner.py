@@ -0,0 +1,87 @@
+"""_____________________________________________________________________
+
+:PROJECT: LabOP Device Ontology
+
+* Benchmark: query planner vs. SPARQL engine *
+
+:details:  python benchmarks/bench_query_planner.py [--devices N] [--repeat R] [--emmo EMMO_FILE_OR_URL]
+
+           imports a synthetic catalogue and compares the latency of representative
+           device searches, compiled by the query planner and run by world.sparql,
+           and checks that both return the same devices. Rows with entities and
+           rows with IRIs (raw=True vs. the IRIs of the SPARQL result entities).
+
+.. note:: -
+.. todo:: -
+________________________________________________________________________
+"""
+
+import os
+import time
+import argparse
+import tempfile
+
+from labop_device_ontology.labop_device_ontology_impl import LabwareInterface
+
+from synthetic_catalogue import write_synthetic_catalogue
+
+QUERIES = {
+    'material': 'SELECT ?d WHERE { ?d lodev:hasMaterial "polystyrene" }',
+    'wells range': 'SELECT ?d WHERE { ?d lodev:hasNumWells ?n . FILTER(?n >= 96 && ?n <= 384) }',
+    'vendor + wells': 'SELECT ?d WHERE { ?d lodev:hasVendorName "Corning" ; lodev:hasNumWells 384 }',
+    'star + projection': '''SELECT ?d ?vendor ?volume WHERE {
+                                ?d a lodev:Device ;
+                                   lodev:hasMaterial "polypropylene" ;
+                                   lodev:hasNumWells ?wells ;
+                                   lodev:hasVendorName ?vendor ;
+                                   lodev:hasWellVolume ?volume .
+                                FILTER(?wells = 96 && ?volume > 100.0)
+                            }''',
+}
+
+
+def latency(function, repeat: int) -> float:
+    """median latency in ms"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return sorted(times)[len(times) // 2] * 1000
+
+
+def sparql_iris(planner, query: str) -> list:
+    """SPARQL engine rows with the subjects as IRIs, like planner.query(query, raw=True)"""
+    return [[row[0].iri] + list(row[1:]) for row in planner._sparql(query)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="query planner benchmark")
+    parser.add_argument("--devices", type=int, default=20000, help="number of synthetic devices")
+    parser.add_argument("--repeat", type=int, default=20, help="repetitions per query")
+    parser.add_argument("--emmo", default=None, help="local EMMO file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_filename = write_synthetic_catalogue(os.path.join(tmp_dir, "catalogue.csv"), args.devices)
+        lodev = LabwareInterface(emmo_filename=args.emmo)
+        lodev.import_csv_parallel(csv_filename)
+
+    planner = lodev.query_planner
+    print(f"{'query':20s} {'rows':>7s} {'planner ms':>11s} {'sparql ms':>10s} {'speedup':>8s}"
+          f" {'raw ms':>7s} {'sparql+iri ms':>14s} {'speedup':>8s}")
+    for name, query in QUERIES.items():
+        planned = planner.query(query, raw=True)
+        general = sparql_iris(planner, query)
+        if sorted(map(str, planned)) != sorted(map(str, general)):
+            print(f"{name}: results differ ({len(planned)} / {len(general)} rows)")
+        planner_ms = latency(lambda: planner.query(query), args.repeat)
+        sparql_ms = latency(lambda: planner._sparql(query), args.repeat)
+        raw_ms = latency(lambda: planner.query(query, raw=True), args.repeat)
+        sparql_iri_ms = latency(lambda: sparql_iris(planner, query), args.repeat)
+        print(f"{name:20s} {len(planned):7d} {planner_ms:11.2f} {sparql_ms:10.2f} {sparql_ms / planner_ms:7.1f}x"
+              f" {raw_ms:7.2f} {sparql_iri_ms:14.2f} {sparql_iri_ms / raw_ms:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""_____________________________________________________________________
+
+:PROJECT: LabOP Device Ontology
+
+* Benchmark: TBox creation from the declarative schema vs. class by class *
+
+:details:  python benchmarks/bench_tbox_schema.py [--emmo EMMO_FILE_OR_URL] [--repeat N]
+
+.. note:: EMMO is loaded once per world, only the TBox definition is timed
+.. todo:: -
+________________________________________________________________________
+"""
+
+import argparse
+import time
+
+from ontopy import World
+
+from labop_device_ontology.device_tbox import LOLabwareTBox
+from labop_device_ontology.emmo_utils import sync_python_names
+
+
+def time_tbox(emmo_url: str, bulk_schema: bool) -> float:
+    """time of the device TBox definition in a fresh world"""
+    world = World()
+    emmo = world.get_ontology(emmo_url).load()
+    sync_python_names(emmo)
+
+    start = time.perf_counter()
+    LOLabwareTBox(emmo_world=world, emmo=emmo, emmo_url=emmo_url, bulk_schema=bulk_schema)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TBox schema benchmark")
+    parser.add_argument("--emmo", default="emmo-development", help="EMMO file or url")
+    parser.add_argument("--repeat", type=int, default=3, help="number of repetitions")
+    args = parser.parse_args()
+
+    for bulk_schema, label in ((False, "class by class"), (True, "bulk schema")):
+        timings = [time_tbox(args.emmo, bulk_schema) for _ in range(args.repeat)]
+        print(f"{label:15s}: best {min(timings) * 1000:8.1f} ms, mean {sum(timings) / len(timings) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
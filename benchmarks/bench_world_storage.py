@@ -0,0 +1,67 @@
+"""_____________________________________________________________________
+
+:PROJECT: LabOP Device Ontology
+
+* Benchmark: persistent World import with storage profiles *
+
+:details:  python benchmarks/bench_world_storage.py [--devices N] [--emmo EMMO_FILE_OR_URL]
+
+           imports a synthetic catalogue into a persistent World, once with the default
+           settings and once in bulk-load mode, and reports import speed and database
+           size (incl. the WAL file) before and after compaction.
+
+.. note:: -
+.. todo:: -
+________________________________________________________________________
+"""
+
+import os
+import time
+import argparse
+import tempfile
+
+from labop_device_ontology.labop_device_ontology_impl import LabwareInterface
+
+from synthetic_catalogue import write_synthetic_catalogue
+
+
+def disk_size(db_filename: str) -> int:
+    """size of a SQLite database on disk in bytes, including the -wal and -shm files (WAL mode)"""
+    return sum(os.path.getsize(filename) for filename in (db_filename, db_filename + '-wal', db_filename + '-shm')
+               if os.path.exists(filename))
+
+
+def run(db_path: str, db_name: str, csv_filename: str, bulk_load: bool, emmo_filename: str = None) -> dict:
+    lodev = LabwareInterface(db_path=db_path, db_name=db_name, emmo_filename=emmo_filename,
+                             storage_profile='default')
+    start = time.perf_counter()
+    device_iris = lodev.import_csv_parallel(csv_filename, bulk_load=bulk_load)
+    lodev.emmo_world.save()
+    import_time = time.perf_counter() - start
+    size_before = disk_size(os.path.join(db_path, db_name))
+    start = time.perf_counter()
+    lodev.compact_database()
+    compact_time = time.perf_counter() - start
+    size_after = disk_size(os.path.join(db_path, db_name))
+    lodev.emmo_world.close()
+    return {'devices': len(device_iris), 'import_s': import_time, 'devices_per_s': len(device_iris) / import_time,
+            'size_mb': size_before / 2 ** 20, 'compacted_mb': size_after / 2 ** 20, 'compact_s': compact_time}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="World storage benchmark")
+    parser.add_argument("--devices", type=int, default=100000, help="number of synthetic devices")
+    parser.add_argument("--emmo", default=None, help="local EMMO file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_filename = write_synthetic_catalogue(os.path.join(tmp_dir, "catalogue.csv"), args.devices)
+        for bulk_load, label in ((False, "default"), (True, "bulk load")):
+            result = run(tmp_dir, f"world_{label.replace(' ', '_')}.sqlite3", csv_filename, bulk_load, args.emmo)
+            print(f"{label:10s}: {result['devices']} devices in {result['import_s']:.2f} s "
+                  f"({result['devices_per_s']:.0f}/s), db {result['size_mb']:.1f} MB -> "
+                  f"{result['compacted_mb']:.1f} MB after compact ({result['compact_s']:.2f} s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+"""_____________________________________________________________________
+
+:PROJECT: LabOP Device Ontology
+
+* Offline regression harness: export output, timing and memory *
+
+:details:  python benchmarks/regression_harness.py --emmo EMMO_FILE [--devices N] [--seed S]
+                  [--baseline FILE] [--update] [--time-threshold T] [--memory-threshold M]
+
+           builds the complete ontology set from a local (vendored) EMMO and a fixed
+           synthetic catalogue, without network access:
+             stages: load (EMMO, TBoxes), import (catalogue), export:<format> for every
+                     format of onto_file_ending
+
+           Every exported file is canonicalized (deterministic blank node labels, sorted
+           N-Triples lines, see catalogue_snapshots.graph_lines) and hashed, so the hashes
+           only change, if the exported graphs change (isomorphism-safe).
+           Wall time and python peak memory (tracemalloc) are measured per stage.
+
+           Cross-file consistency: every LabOP IRI and every minted name (labop_<hash>)
+           referenced by an exported file has to be declared in one of the exported files
+           of the format (the ABox refers to the minted TBox / EMMO extension names).
+
+           Federation round trip: the exports are loaded as an earlier catalogue release
+           (add_catalogue_version, minted TBox names resolved by their prefLabels), its
+           device records and a query result have to match the current release.
+
+           The hashes and the stage measurements are compared with the baseline (JSON):
+           the harness fails (exit code 1), if an exported graph changed or a stage is slower /
+           needs more memory than the baseline by more than the threshold (relative).
+           --update (re-)writes the baseline, e.g. after an intended output change.
+
+.. note:: hashes contain the ontology version (version IRIs), a new __version__ requires a new baseline;
+          timing baselines are machine specific
+.. todo:: -
+________________________________________________________________________
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import platform
+import tempfile
+import tracemalloc
+
+import rdflib
+
+from labop_device_ontology import __version__
+from labop_device_ontology.labop_device_ontology_impl import LabwareInterface
+from labop_device_ontology.export_ontology import onto_file_ending
+from labop_device_ontology.catalogue_snapshots import graph_lines
+from labop_device_ontology.federation import versioned_iri, LABOP_NAMESPACE
+from labop_device_ontology.iri_minting import IRIMinter
+
+from synthetic_catalogue import write_synthetic_catalogue
+
+DEFAULT_BASELINE_FILENAME = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'regression_baseline.json')
+
+# absolute tolerances below the relative thresholds, against timer / allocator noise
+MIN_SECONDS = 0.5
+MIN_PEAK_MB = 5.0
+
+# the exports of the current release, loaded next to it
+ROUND_TRIP_VERSION = 'roundtrip'
+ROUND_TRIP_QUERY = "SELECT ?d ?wells WHERE { ?d lodev:hasNumWells ?wells . FILTER(?wells >= 96) }"
+
+
+def load_export(filename: str) -> rdflib.Graph:
+    """graph of an exported file, parsed in the rdflib format of its file ending"""
+    graph = rdflib.Graph()
+    graph.parse(filename, format=rdflib.util.guess_format(filename))
+    return graph
+
+
+def graph_hash(filename: str) -> str:
+    """sha256 of the canonicalized graph of an exported file"""
+    graph = load_export(filename)
+    return hashlib.sha256(''.join(graph_lines(graph)).encode('utf-8')).hexdigest()
+
+
+def export_hashes(path: str) -> dict:
+    """graph hash of all exported files of a directory"""
+    return {filename: graph_hash(os.path.join(path, filename)) for filename in sorted(os.listdir(path))}
+
+
+def undeclared_iris(path: str) -> list:
+    """cross-file check of the exported files of a directory
+
+    :return: list of failure messages, one per file with references to undeclared LabOP IRIs / minted names
+    """
+    minter = IRIMinter()
+    graphs = {filename: load_export(os.path.join(path, filename)) for filename in sorted(os.listdir(path))}
+    declared = {s for graph in graphs.values() for s in graph.subjects()}
+    # ontology (version) IRIs are referenced, not declared
+    declared |= {o for graph in graphs.values()
+                 for p in (rdflib.OWL.versionIRI, rdflib.OWL.imports, rdflib.OWL.priorVersion)
+                 for o in graph.objects(None, p)}
+
+    def checked(term) -> bool:
+        if not isinstance(term, rdflib.URIRef):
+            return False
+        iri = str(term)
+        return iri.startswith(LABOP_NAMESPACE) or minter.is_minted(iri[max(iri.rfind('#'), iri.rfind('/')) + 1:])
+
+    failures = []
+    for filename, graph in graphs.items():
+        undeclared = {term for triple in graph for term in triple if checked(term) and term not in declared}
+        if undeclared:
+            failures.append(f"cross-file: {filename} references {len(undeclared)} undeclared IRIs, "
+                            f"e.g. {sorted(undeclared)[0]}")
+    return failures
+
+
+def _normalized(record) -> tuple:
+    """record values without the IRI, multi-valued properties in a defined order"""
+    return tuple(tuple(sorted(map(str, value))) if isinstance(value, tuple) else value for value in record[1:])
+
+
+def federation_round_trip(lodev, export_dir: str, format: str) -> list:
+    """loading the exported TBox / ABox as catalogue version and comparing it with the current release
+
+    :return: list of failure messages, empty if the round trip preserves the devices
+    """
+    ending = onto_file_ending[format]
+    lodev.add_catalogue_version(ROUND_TRIP_VERSION, os.path.join(export_dir, 'labop_device_tbox' + ending),
+                                [os.path.join(export_dir, 'labop_device_abox' + ending)])
+    try:
+        failures = []
+        current = {versioned_iri(iri, ROUND_TRIP_VERSION): _normalized(record)
+                   for iri, record in lodev.federation.device_records().items()}
+        loaded = {iri: _normalized(record)
+                  for iri, record in lodev.federation.device_records(ROUND_TRIP_VERSION).items()}
+        if not loaded:
+            failures.append("round trip: no device records")
+        missing = set(current) - set(loaded)
+        changed = [iri for iri, values in current.items() if iri in loaded and loaded[iri] != values]
+        if missing or changed:
+            failures.append(f"round trip: {len(missing)} devices missing, {len(changed)} devices changed")
+
+        current_rows = sorted((versioned_iri(iri, ROUND_TRIP_VERSION), wells)
+                              for iri, wells in lodev.query_version(__version__, ROUND_TRIP_QUERY, raw=True))
+        loaded_rows = sorted(tuple(row) for row in lodev.query_version(ROUND_TRIP_VERSION, ROUND_TRIP_QUERY, raw=True))
+        if current_rows != loaded_rows:
+            failures.append(f"round trip: query returned {len(loaded_rows)} rows, current release {len(current_rows)}")
+        return failures
+    finally:
+        lodev.remove_catalogue_version(ROUND_TRIP_VERSION)
+
+
+def measured(function):
+    """result, wall time (s) and python peak memory (MB) of function()"""
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    result = function()
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    return result, {'seconds': round(seconds, 3), 'peak_mb': round(peak / 2 ** 20, 1)}
+
+
+def run_stages(emmo_filename: str = None, emmo_module_filename: str = None, num_devices: int = 1000,
+               seed: int = 42, formats: list = None) -> dict:
+    """building and exporting the ontology set
+
+    :return: dict with the stage measurements, the export hashes per format,
+             the cross-file and the round trip failures
+    """
+    formats = formats or list(onto_file_ending)
+    stages = {}
+    hashes = {}
+    cross_file = []
+    round_trip = []
+    tracemalloc.start()
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            csv_filename = write_synthetic_catalogue(os.path.join(tmp_dir, "catalogue.csv"), num_devices, seed)
+
+            lodev, stages['load'] = measured(lambda: LabwareInterface(emmo_filename=emmo_filename,
+                                                                      emmo_module_filename=emmo_module_filename))
+            _, stages['import'] = measured(lambda: lodev.import_csv_parallel(csv_filename))
+
+            for format in formats:
+                export_dir = os.path.join(tmp_dir, format)
+                os.makedirs(export_dir)
+                _, stages[f'export:{format}'] = measured(
+                    lambda: lodev.export_ontologies(path=export_dir, format=format))
+                hashes[format] = export_hashes(export_dir)
+                cross_file += [f"{format}/{failure}" for failure in undeclared_iris(export_dir)]
+
+            export_dir = os.path.join(tmp_dir, formats[0])
+            round_trip, stages['federation'] = measured(lambda: federation_round_trip(lodev, export_dir, formats[0]))
+    finally:
+        tracemalloc.stop()
+    return {'stages': stages, 'hashes': hashes, 'cross_file': cross_file, 'round_trip': round_trip}
+
+
+def compare(result: dict, baseline: dict, time_threshold: float = 0.25, memory_threshold: float = 0.25) -> list:
+    """differences to the baseline, that are regarded as regressions
+
+    :return: list of failure messages, empty if the result matches the baseline
+    """
+    failures = list(result.get('cross_file', [])) + list(result.get('round_trip', []))
+    for format, baseline_hashes in baseline['hashes'].items():
+        hashes = result['hashes'].get(format, {})
+        for filename in sorted(set(baseline_hashes) | set(hashes)):
+            if filename not in hashes:
+                failures.append(f"output {format}/{filename}: missing")
+            elif filename not in baseline_hashes:
+                failures.append(f"output {format}/{filename}: new file")
+            elif hashes[filename] != baseline_hashes[filename]:
+                failures.append(f"output {format}/{filename}: graph changed")
+
+    for stage, baseline_values in baseline['stages'].items():
+        values = result['stages'].get(stage)
+        if values is None:
+            failures.append(f"stage {stage}: not run")
+            continue
+        for key, threshold, tolerance in (('seconds', time_threshold, MIN_SECONDS),
+                                          ('peak_mb', memory_threshold, MIN_PEAK_MB)):
+            limit = max(baseline_values[key] * (1 + threshold), baseline_values[key] + tolerance)
+            if values[key] > limit:
+                failures.append(f"stage {stage}: {key} {values[key]} > {limit:.3f} (baseline {baseline_values[key]})")
+    return failures
+
+
+def format_stages(result: dict, baseline: dict = None) -> str:
+    lines = [f"{'stage':20s} {'seconds':>9s} {'peak MB':>9s} {'baseline s':>11s} {'baseline MB':>12s}"]
+    for stage, values in result['stages'].items():
+        baseline_values = (baseline or {}).get('stages', {}).get(stage, {})
+        lines.append(f"{stage:20s} {values['seconds']:9.3f} {values['peak_mb']:9.1f} "
+                     f"{baseline_values.get('seconds', float('nan')):11.3f} "
+                     f"{baseline_values.get('peak_mb', float('nan')):12.1f}")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="offline regression harness of the ontology exports")
+    parser.add_argument("--emmo", default=None, help="local (vendored) EMMO file")
+    parser.add_argument("--emmo-module", default=None, help="local extracted EMMO module, instead of --emmo")
+    parser.add_argument("--devices", type=int, default=1000, help="number of synthetic devices")
+    parser.add_argument("--seed", type=int, default=42, help="seed of the synthetic catalogue")
+    parser.add_argument("--formats", nargs='+', default=list(onto_file_ending), choices=list(onto_file_ending),
+                        help="export formats")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_FILENAME, help="baseline JSON file")
+    parser.add_argument("--update", action="store_true", help="write the baseline instead of comparing")
+    parser.add_argument("--time-threshold", type=float, default=0.25, help="allowed relative slow-down per stage")
+    parser.add_argument("--memory-threshold", type=float, default=0.25,
+                        help="allowed relative increase of the peak memory per stage")
+    args = parser.parse_args()
+
+    if args.emmo is None and args.emmo_module is None:
+        parser.error("a local EMMO (--emmo or --emmo-module) is required, the harness runs offline")
+
+    result = run_stages(emmo_filename=args.emmo, emmo_module_filename=args.emmo_module,
+                        num_devices=args.devices, seed=args.seed, formats=args.formats)
+    result.update({'version': __version__, 'devices': args.devices, 'seed': args.seed,
+                   'python': platform.python_version()})
+
+    if args.update or not os.path.isfile(args.baseline):
+        # inconsistent exports are never recorded as baseline
+        failures = result['cross_file'] + result['round_trip']
+        for failure in failures:
+            print("FAIL", failure)
+        if failures:
+            return 1
+        with open(args.baseline, 'w', encoding='utf-8') as baseline_file:
+            json.dump(result, baseline_file, indent=2, sort_keys=True)
+        print(format_stages(result))
+        print(f"baseline written to {args.baseline}")
+        return 0
+
+    with open(args.baseline, encoding='utf-8') as baseline_file:
+        baseline = json.load(baseline_file)
+    print(format_stages(result, baseline))
+
+    if (baseline['devices'], baseline['seed']) != (args.devices, args.seed):
+        print(f"baseline was recorded with {baseline['devices']} devices, seed {baseline['seed']}")
+        return 1
+    if baseline['version'] != __version__:
+        print(f"baseline of version {baseline['version']}, exports of {__version__} differ by their version IRIs")
+
+    failures = compare(result, baseline, time_threshold=args.time_threshold,
+                       memory_threshold=args.memory_threshold)
+    for failure in failures:
+        print("FAIL", failure)
+    if not failures:
+        print("no regressions")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
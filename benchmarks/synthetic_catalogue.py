@@ -0,0 +1,91 @@
+"""_____________________________________________________________________
+
+:PROJECT: LabOP Device Ontology
+
+* Synthetic device catalogue for benchmarks *
+
+:details:  deterministic (seeded) device catalogue CSV with the columns of the
+           Device datatype properties of the TBox schema and a few quantity columns
+           (hasLength, hasWidth, hasHeight in mm, hasGrippingHeight, hasGrippingPressure in kPa,
+           hasLengthTolerance), derived from the random values of a row.
+
+.. note:: -
+.. todo:: -
+________________________________________________________________________
+"""
+
+import csv
+import random
+
+VENDORS = ['Greiner Bio-One', 'Corning', 'Eppendorf', 'Thermo Fisher Scientific', 'Sarstedt', 'Brand', 'Nunc',
+           'Porvair Sciences', 'Agilent', 'Hamilton']
+MATERIALS = ['polystyrene', 'polypropylene', 'glass', 'cyclic olefin copolymer', 'polycarbonate']
+PLATE_FORMATS = [(8, 12), (16, 24), (32, 48), (4, 6), (2, 3), (1, 1)]
+SHAPES = ['round', 'square']
+BOTTOMS = ['flat', 'round', 'conical', 'V']
+
+COLUMNS = ['name', 'hasVendorName', 'hasVendorProductID', 'hasProductID', 'hasManufacturer', 'hasEAN', 'hasUNSPSC',
+           'hasEClass', 'hasNumRows', 'hasNumCols', 'hasNumWells', 'hasMaterial', 'hasColorRGB', 'hasWellVolume',
+           'hasWellDistRow', 'hasWellDistCol', 'hasDepthWell', 'hasShapeWell', 'hasShapeWellBottom', 'hasVolume',
+           'hasHightLidded', 'hasHightStacked', 'hasHightStackedLidded', 'hasMass', 'isLiddable', 'isStackable',
+           'isSealable', 'hasCoatingMaterial', 'hasSeptumMaterial', 'hasLength', 'hasLengthTolerance', 'hasWidth',
+           'hasHeight', 'hasGrippingHeight', 'hasGrippingPressure']
+
+
+def synthetic_rows(num_devices: int = 1000, seed: int = 42) -> list:
+    """deterministic list of catalogue rows (dicts of strings)"""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(num_devices):
+        vendor = VENDORS[i % len(VENDORS)]
+        num_rows, num_cols = rng.choice(PLATE_FORMATS)
+        well_dist = round(9.0 * 8 / num_rows, 2)
+        height = round(rng.uniform(10.0, 45.0), 2)
+        rows.append({
+            'name': f"{vendor} {num_rows * num_cols} well plate {i}",
+            'hasVendorName': vendor,
+            'hasVendorProductID': f"{rng.randint(100000, 999999)}-{i}",
+            'hasProductID': f"P{i:07d}",
+            'hasManufacturer': vendor,
+            'hasEAN': f"{rng.randint(10 ** 12, 10 ** 13 - 1)}",
+            'hasUNSPSC': rng.choice(['41121807', '41121802', '41122101', '41121503', '41121810']),
+            'hasEClass': rng.choice(['32-01-01-01', '32-01-01-02', '32-01-03-01', '32-03-01-04']),
+            'hasNumRows': str(num_rows),
+            'hasNumCols': str(num_cols),
+            'hasNumWells': str(num_rows * num_cols),
+            'hasMaterial': rng.choice(MATERIALS),
+            'hasColorRGB': rng.choice(['#FFFFFF', '#000000', '#F0F0F0']),
+            'hasWellVolume': str(round(rng.uniform(10.0, 3000.0), 1)),
+            'hasWellDistRow': str(well_dist),
+            'hasWellDistCol': str(well_dist),
+            'hasDepthWell': str(round(height * 0.8, 2)),
+            'hasShapeWell': rng.choice(SHAPES),
+            'hasShapeWellBottom': rng.choice(BOTTOMS),
+            'hasVolume': str(round(rng.uniform(0.1, 300.0), 2)),
+            'hasHightLidded': str(round(height + 2.5, 2)),
+            'hasHightStacked': str(round(height - 2.0, 2)),
+            'hasHightStackedLidded': str(round(height + 0.5, 2)),
+            'hasMass': str(round(rng.uniform(20.0, 120.0), 1)),
+            'isLiddable': rng.choice(['true', 'false']),
+            'isStackable': rng.choice(['true', 'false']),
+            'isSealable': rng.choice(['true', 'false']),
+            'hasCoatingMaterial': rng.choice(['N/A', 'poly-D-lysine', 'collagen']),
+            'hasSeptumMaterial': 'N/A',
+            # SBS footprint, no random numbers: the other columns stay the same for a seed
+            'hasLength': '127.76',
+            'hasLengthTolerance': '1.002',
+            'hasWidth': '85.48',
+            'hasHeight': str(height),
+            'hasGrippingHeight': str(round(height / 2, 2)),
+            'hasGrippingPressure': str(40 + i % 3 * 20),
+        })
+    return rows
+
+
+def write_synthetic_catalogue(filename: str, num_devices: int = 1000, seed: int = 42) -> str:
+    """writing a synthetic catalogue CSV file"""
+    with open(filename, 'w', newline='', encoding='utf-8') as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=COLUMNS, lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(synthetic_rows(num_devices, seed))
+    return filename
@@ -6,17 +6,14 @@
 
 * Main module command line interface *
 
-:details:  Main module command line interface. 
+:details:  Main module command line interface.
            !!! Warning: it should have a diffent name than the package name.
 
 .. note:: -
-.. todo:: - 
+.. todo:: -
 ________________________________________________________________________
 """
 
-"""Main module implementation. !!! Warning: it should have a diffent name than the package name. """
-"""Console script for labop_device_ontology."""
-
 import argparse
 import sys
 import logging
@@ -24,11 +21,18 @@ import time
 from labop_device_ontology import __version__
 
 from labop_device_ontology.labop_device_ontology_impl import LabwareInterface
+from labop_device_ontology.catalogue_snapshots import SnapshotStore
+from labop_device_ontology.jobs import JobRunner, read_status, status_line
+from labop_device_ontology.low_memory import format_memory_report
+
+"""Main module implementation. !!! Warning: it should have a diffent name than the package name. """
+"""Console script for labop_device_ontology."""
 
 logging.basicConfig(
     format="%(levelname)-4s| %(module)s.%(funcName)s: %(message)s",
     level=logging.DEBUG,
-)    
+)
+
 
 def parse_command_line():
     """ Looking for command line arguments"""
@@ -47,38 +51,201 @@ def parse_command_line():
     )
 
     parser.add_argument(
-        "-f", "--output-format", action="store", help="save all device ontologies in the given format [turtle, owl, rdf, xml, n3, nt, json-ld]"
+        "-f", "--output-format", action="store",
+        help="save all device ontologies in the given format [turtle, owl, rdf, xml, n3, nt, json-ld]"
+    )
+
+    parser.add_argument(
+        "-j", "--jobs", action="store", type=int, default=1,
+        help="number of worker processes for the csv import (0: all cores)"
+    )
+
+    parser.add_argument(
+        "--validate", action="store",
+        help="validate the imported devices and write the report table to the given csv file"
+    )
+
+    parser.add_argument(
+        "--snapshot-dir", action="store", help="record the exported ontologies as snapshot in the given directory"
+    )
+
+    parser.add_argument(
+        "--diff", action="store", nargs=2, metavar=("OLD_VERSION", "NEW_VERSION"),
+        help="print the structural diff between two recorded snapshot versions (in --snapshot-dir, default: snapshots)"
+    )
+
+    parser.add_argument(
+        "--partition-by", action="store", choices=["vendor", "site", "class"],
+        help="split the device ABox into one ontology per vendor, site or product type"
+    )
+
+    parser.add_argument(
+        "--partition-dir", action="store", help="directory of the stored ABox partitions (loaded on demand)"
+    )
+
+    parser.add_argument(
+        "--extract-emmo-module", action="store", help="extract the minimal EMMO module into the given N-Triples file"
+    )
+
+    parser.add_argument(
+        "--emmo-module", action="store", help="load the given minimal EMMO module instead of the full EMMO"
+    )
+
+    parser.add_argument(
+        "--db-path", action="store", help="directory of the persistent World database"
+    )
+
+    parser.add_argument(
+        "--db-name", action="store", help="filename of the persistent World database"
+    )
+
+    parser.add_argument(
+        "--bulk-load", action="store_true",
+        help="import with deferred indexes and relaxed synchronous in one transaction"
+    )
+
+    parser.add_argument(
+        "--compact", action="store_true",
+        help="compact the World database (ANALYZE, REINDEX, VACUUM), after the import and export, if given"
+    )
+
+    parser.add_argument(
+        "--status-interval", action="store", type=float, default=1.0,
+        help="seconds between job status lines of the parallel import (Ctrl-C cancels the import and rolls it back)"
+    )
+
+    parser.add_argument(
+        "--job-status-file", action="store", help="JSON file, the status of the import job is written to"
+    )
+
+    parser.add_argument(
+        "--job-status", action="store", metavar="JOB_STATUS_FILE",
+        help="print the status of the jobs recorded in the given job status file (of a running import) and exit"
+    )
+
+    parser.add_argument(
+        "--low-memory", action="store_true",
+        help="bounded entity cache, interned literals, device records instead of individuals "
+             "and a small SQLite page cache"
+    )
+
+    parser.add_argument(
+        "--memory-report", action="store_true",
+        help="print the memory usage per component, after the import and export, if given"
     )
 
     parser.add_argument('-v', '--version', action='version', version='%(prog)s ' + __version__)
 
     # add more arguments here
 
-    return parser.parse_args()
+    args = parser.parse_args()
+    if args.partition_dir and not args.partition_by:
+        parser.error("--partition-dir requires --partition-by")
+    return args
+
+
+def run_import_job(lodev, args) -> bool:
+    """running the parallel import as background job, printing its status until it is finished
+
+    :return: False, if the import was cancelled (Ctrl-C) or failed
+    """
+    runner = JobRunner(lodev, status_filename=args.job_status_file)
+    job = runner.submit_import(args.import_csv, processes=args.jobs or None, validate=bool(args.validate))
+    try:
+        while not job.done():
+            time.sleep(args.status_interval)
+            print(job.status_line())
+    except KeyboardInterrupt:
+        job.cancel()
+        print("cancelling import ...")
+    runner.shutdown(cancel=False)  # waits for the job (and its rollback)
+    print(job.status_line())
+    return job.state == 'done'
+
+
+def print_snapshot_diff(args) -> None:
+    """structural diff between two recorded snapshot versions"""
+    snapshot_store = SnapshotStore(args.snapshot_dir or "snapshots")
+    for ontology_name, diff in snapshot_store.diff_versions(*args.diff).items():
+        print(diff)
+        for subject in sorted(diff.changed_subjects()):
+            print("   ", subject)
+
+
+def open_interface(args) -> LabwareInterface:
+    """LabwareInterface with the storage and partition options"""
+    lodev = LabwareInterface(db_path=args.db_path, db_name=args.db_name, emmo_module_filename=args.emmo_module,
+                             storage_profile='wal' if args.db_name else 'default', low_memory=args.low_memory)
+    if args.partition_by:
+        lodev.enable_partitioning(key=args.partition_by, partition_dir=args.partition_dir)
+    return lodev
+
+
+def import_catalogue(lodev, args) -> bool:
+    """serial, bulk or job import of the csv catalogue, storing the partitions
+
+    :return: False, if the import job was cancelled or failed
+    """
+    if args.jobs == 1 and not args.partition_by and not args.bulk_load:
+        lodev.import_csv_parallel(args.import_csv, processes=1, validate=bool(args.validate))
+        return True
+    if args.bulk_load:
+        lodev.import_csv_parallel(args.import_csv, processes=args.jobs or None,
+                                  validate=bool(args.validate), bulk_load=True)
+    elif not run_import_job(lodev, args):
+        return False
+    if args.partition_dir:
+        lodev.abox_partitions.store()
+    return True
+
+
+def report_storage(lodev, args) -> None:
+    """memory report and compaction of the World database"""
+    if args.memory_report:
+        print(format_memory_report(lodev.memory_report()))
+    if args.compact:
+        size_before, size_after = lodev.compact_database()
+        print(f"database compacted: {size_before} -> {size_after} bytes")
+
 
 def main():
     """Console script for labop_device_ontology."""
-        # or use logging.INFO (=20) or logging.ERROR (=30) for less output
+    # or use logging.INFO (=20) or logging.ERROR (=30) for less output
     logging.basicConfig(
         format='%(levelname)-4s| %(module)s.%(funcName)s: %(message)s', level=logging.DEBUG)
-    
-    
+
     args = parse_command_line()
-        
+
     if len(sys.argv) <= 2:
         logging.debug("no arguments provided !")
 
+    if args.job_status:
+        for status in read_status(args.job_status):
+            print(status_line(status))
+        return 0
+
+    if args.diff:
+        print_snapshot_diff(args)
+        return 0
 
     print("Arguments: " + str(args._))
     print("Replace this message by putting your code into labop_device_ontology.__main__")
-    
-    lodev = LabwareInterface()
+
+    lodev = open_interface(args)
+    if args.extract_emmo_module:
+        missing = lodev.extract_emmo_module(args.extract_emmo_module)
+        print("EMMO module complete" if not missing else f"EMMO module incomplete: {missing}")
+        return 0 if not missing else 1
     if args.output_format:
         if args.import_csv is not None:
-            lodev.lodev_abox.import_csv(args.import_csv)
-            lodev.export_ontologies(path=args.output_path, format=args.output_format)
-    #logging.debug(greeting)
-    
+            if not import_catalogue(lodev, args):
+                return 1
+            if args.validate:
+                lodev.validate_devices(report_filename=args.validate)
+            lodev.export_ontologies(path=args.output_path, format=args.output_format, snapshot_dir=args.snapshot_dir)
+    report_storage(lodev, args)
+    # logging.debug(greeting)
+
     return 0
 
 
@@ -0,0 +1,262 @@
+"""_____________________________________________________________________
+
+:PROJECT: LabOP Device Ontology
+
+* Partitioned device ABox *
+
+:details:  partitioning of the device ABox into several ontologies (named graphs),
+           e.g. one per vendor, lab site or product type.
+
+           Partitions are stored as N-Triples files in a partition directory and loaded
+           lazily into the World on first access, so a deployment only pays for the
+           partitions it uses. Loading / unloading a partition notifies the in-process
+           listeners of the change feed with insert / delete events of its devices, so that
+           the search and code indices and the payload cache follow the loaded partitions -
+           the events are not written to the feed, the devices are not changed. Exports are written per
+           partition and device queries are pruned to the partitions matching the
+           partition key (a literal value of its first property, e.g. hasVendorName).
+
+           partition IRI:   <base_iri>/<partition>#
+           partition file:  <partition_dir>/labop_device_abox_<partition>.nt
+
+.. note:: the 'site' partition key is read from a 'site' column of the catalogue
+.. todo:: -
+________________________________________________________________________
+"""
+
+import os
+import re
+import logging
+
+from owlready2.base import rdf_type
+
+from labop_device_ontology.emmo_utils import save_ntriples
+from labop_device_ontology.export_ontology import export_ontology
+from labop_device_ontology.parallel_import import (read_catalogue, unique_rows, importable_datatypes,
+                                                   importable_quantities, convert_parallel, insert_triples,
+                                                   imported_rows)
+from labop_device_ontology.query_planner import parse_star_query, UnsupportedQuery
+from labop_device_ontology.tbox_schema import read_device_records, load_property_schema
+
+logger = logging.getLogger(__name__)
+
+# partition key: catalogue columns / device properties providing the partition name (first non-empty)
+PARTITION_KEYS = {
+    'vendor': ('hasVendorName', 'hasManufacturer'),
+    'site': ('site',),
+    'class': ('isProductType',),
+}
+
+UNKNOWN_PARTITION = 'unknown'
+
+
+def partition_slug(name) -> str:
+    """file and IRI compatible partition name, e.g. 'Greiner Bio-One' -> 'greiner_bio_one' """
+    slug = re.sub(r'[^0-9a-z]+', '_', str(name or '').strip().lower()).strip('_')
+    return slug or UNKNOWN_PARTITION
+
+
+class PartitionedABox:
+    def __init__(self, emmo_world=None, lw_tbox=None, emmo_url: str = None, key: str = 'vendor',
+                 partition_dir: str = None, base_iri: str = 'http://www.labop.org/labop_device_abox',
+                 change_feed=None) -> None:
+        """Device ABox split into one ontology per partition
+
+        :param key: partition key: 'vendor', 'site' or 'class'
+        :param partition_dir: directory of the stored partitions (lazy loading)
+        :param change_feed: optional ChangeFeed, its listeners are notified of loaded / unloaded partitions
+        """
+        if key not in PARTITION_KEYS:
+            raise ValueError(f"unknown partition key '{key}', valid keys: {', '.join(PARTITION_KEYS)}")
+        self.emmo_world = emmo_world
+        self.lw_tbox = lw_tbox
+        self.emmo_url = emmo_url
+        self.key = key
+        self.partition_dir = partition_dir
+        self.base_iri = base_iri
+        self.change_feed = change_feed
+
+        self.loaded = {}  # partition name: ontology
+
+    # --- partition management
+
+    def partition_of(self, row: dict) -> str:
+        """partition name of a catalogue row or device record (as dict)"""
+        for column in PARTITION_KEYS[self.key]:
+            if row.get(column):
+                return partition_slug(row[column])
+        return UNKNOWN_PARTITION
+
+    def _partition_filename(self, partition: str) -> str:
+        return os.path.join(self.partition_dir, f"labop_device_abox_{partition}.nt")
+
+    def stored_partitions(self) -> list:
+        """names of all partitions in the partition directory"""
+        if self.partition_dir is None or not os.path.isdir(self.partition_dir):
+            return []
+        return sorted(match.group(1) for match in (re.match(r'labop_device_abox_(\w+)\.nt$', filename)
+                                                   for filename in os.listdir(self.partition_dir)) if match)
+
+    def partitions(self) -> list:
+        """names of all stored or loaded partitions"""
+        return sorted(set(self.stored_partitions()) | set(self.loaded))
+
+    def get(self, partition: str, create: bool = False):
+        """partition ontology, loaded on first access
+
+        :param create: create a new, empty partition if it does not exist
+        :return: ontology or None
+        """
+        partition = partition_slug(partition)
+        ontology = self.loaded.get(partition)
+        if ontology is not None:
+            return ontology
+
+        if self.partition_dir is not None and os.path.exists(self._partition_filename(partition)):
+            logger.debug(f"loading partition {partition}")
+            ontology = self.emmo_world.get_ontology(f"{self.base_iri}/{partition}#")
+            with open(self._partition_filename(partition), 'rb') as partition_file:
+                ontology.load(fileobj=partition_file, format='ntriples')
+            self.loaded[partition] = ontology
+            self._notify_changes('insert', partition)
+            return ontology
+        if create:
+            ontology = self.emmo_world.get_ontology(f"{self.base_iri}/{partition}#")
+            ontology.imported_ontologies.append(self.lw_tbox.lodevt)
+        else:
+            return None
+        self.loaded[partition] = ontology
+        return ontology
+
+    def store(self, partitions: list = None) -> None:
+        """writing loaded partitions to the partition directory"""
+        os.makedirs(self.partition_dir, exist_ok=True)
+        for partition in partitions or list(self.loaded):
+            save_ntriples(self.loaded[partition], self._partition_filename(partition))
+
+    def unload(self, partition: str) -> None:
+        """removing a (stored) partition from the World to free memory"""
+        ontology = self.loaded.get(partition)
+        if ontology is None:
+            return
+        iris = self._device_iris(partition)
+        del self.loaded[partition]
+        ontology.destroy()
+        if self.change_feed is not None:
+            self.change_feed.notify(('delete', iri, {'partition': partition}) for iri in iris)
+
+    def _device_iris(self, partition: str) -> list:
+        return [self.emmo_world._unabbreviate(storid) for storid in self.device_storids([partition])]
+
+    def _notify_changes(self, operation: str, partition: str) -> None:
+        """devices of a loaded partition for the in-process listeners (search indices, caches),
+        not written to the change feed: loading is no device mutation"""
+        if self.change_feed is not None:
+            self.change_feed.notify((operation, iri, {'partition': partition})
+                                    for iri in self._device_iris(partition))
+
+    # --- import / export
+
+    def import_csv(self, csv_filename: str, processes: int = None, validator=None, change_feed=None,
+                   minter=None, progress=None, intern_values: bool = False) -> dict:
+        """importing a catalogue, each row into the ontology of its partition
+
+        :param progress: optional callback progress(rows_processed, triples_written), totals over all partitions
+        :param intern_values: intern repeated short values of the catalogue rows (low-memory mode)
+        :return: dict partition: list of imported device IRIs
+        """
+        rows = read_catalogue(csv_filename, intern_values=intern_values)
+        if validator is not None:
+            rows, _, _ = validator.quarantine(rows)
+        if not rows:
+            return {}
+        rows = unique_rows(rows)
+
+        partition_rows = {}
+        for row in rows:
+            partition_rows.setdefault(self.partition_of(row), []).append(row)
+        partitions = sorted(partition_rows)
+        aboxes = [self.get(partition, create=True) for partition in partitions]
+
+        # the rows of all partitions are sharded over one pool of worker processes
+        specs = load_property_schema()
+        datatypes = importable_datatypes(specs, set(rows[0]))
+        quantities = importable_quantities(specs, set(rows[0]), emmo=self.lw_tbox.emmo)
+        converted = convert_parallel([(abox.base_iri, partition_rows[partition])
+                                      for partition, abox in zip(partitions, aboxes)],
+                                     self.lw_tbox.lodevt.base_iri, datatypes, processes=processes, progress=progress,
+                                     quantities=quantities)
+
+        partition_iris = {}
+        num_triples = 0
+        for partition, abox, (device_iris, data_triples, obj_triples) in zip(partitions, aboxes, converted):
+            if minter is not None:
+                minter.mint_devices(abox.base_iri, imported_rows(abox.base_iri, partition_rows[partition],
+                                                                 device_iris))
+            num_triples += insert_triples(abox, self.lw_tbox, device_iris, data_triples, change_feed=change_feed,
+                                          obj_triples=obj_triples)
+            partition_iris[partition] = device_iris
+        if progress is not None:
+            progress(len(rows), num_triples)
+        logger.info(f"partitioned import: {len(rows)} devices, {num_triples} triples in {len(partitions)} partitions")
+        return partition_iris
+
+    def export(self, path: str = ".", format='turtle', partitions: list = None, snapshot_store=None,
+               minter=None, minted_iris: dict = None) -> None:
+        """exporting partitions (default: all) into separate files"""
+        for partition in partitions or self.partitions():
+            export_ontology(ontology=self.get(partition), path=path,
+                            onto_base_filename=f'labop_device_abox_{partition}', format=format,
+                            emmo_url=self.emmo_url, snapshot_store=snapshot_store, minter=minter,
+                            minted_iris=minted_iris)
+
+    # --- queries
+
+    def select(self, values=None) -> list:
+        """partition names matching partition key values, e.g. select(['Greiner Bio-One'])"""
+        if values is None:
+            return self.partitions()
+        available = set(self.partitions())
+        return [partition for partition in dict.fromkeys(partition_slug(value) for value in values)
+                if partition in available]
+
+    def key_values(self, sparql: str, prefixes: dict = None) -> list:
+        """literal values of the partition key property (first property of the key) in a star pattern query,
+        None for other queries (no pruning)"""
+        try:
+            star = parse_star_query(sparql, prefixes)
+        except UnsupportedQuery:
+            return None
+        key_iri = self.lw_tbox.lodevt.base_iri + PARTITION_KEYS[self.key][0]
+        values = [value for predicate, _, value in star.patterns if predicate == key_iri and value is not None]
+        return values or None
+
+    def load_query_partitions(self, sparql: str, prefixes: dict = None) -> list:
+        """loading the partitions, that can contain results of a query (partition pruning)
+
+        :return: names of the partitions of the query
+        """
+        partitions = self.select(self.key_values(sparql, prefixes))
+        for partition in partitions:
+            self.get(partition)
+        return partitions
+
+    def device_storids(self, partitions: list = None) -> list:
+        """storids of all devices of the given partitions (loaded on demand)"""
+        device_class = self.lw_tbox.lodevt.Device.storid
+        storids = []
+        for partition in partitions if partitions is not None else self.partitions():
+            ontology = self.get(partition)
+            if ontology is None:
+                continue
+            storids += [s for (s,) in self.emmo_world.graph.db.execute(
+                "SELECT s FROM objs WHERE c = ? AND p = ? AND o = ?", (ontology.graph.c, rdf_type, device_class))]
+        return storids
+
+    def devices(self, values=None) -> dict:
+        """device records of the partitions matching the partition key values, other partitions are not loaded
+
+        :return: dict iri: DeviceRecord
+        """
+        return read_device_records(emmo_world=self.emmo_world, ontology=self.lw_tbox.lodevt,
+                                   subject_storids=self.device_storids(self.select(values)), emmo=self.lw_tbox.emmo)
@@ -0,0 +1,209 @@
+"""_____________________________________________________________________
+
+:PROJECT: LabOP Device Ontology
+
+* Versioned catalogue snapshots *
+
+:details:  snapshot store and structural diff of exported ontologies.
+
+           Every export can be recorded as a snapshot: the graph is canonicalized
+           (deterministic blank node labels), written as sorted N-Triples lines and
+           hashed. Two snapshots are compared by a merge-join over the sorted triple
+           runs, the changes are grouped by subject into added, removed and changed
+           entities (devices, classes, properties). Ontologies recorded in only one of
+           the versions are diffed against an empty snapshot (all entities added / removed).
+
+           layout:  <snapshot_dir>/<version>/<ontology>.nt
+                    <snapshot_dir>/<version>/manifest.json
+
+.. note:: -
+.. todo:: -
+________________________________________________________________________
+"""
+
+import io
+import os
+import re
+import json
+import hashlib
+import logging
+
+import rdflib
+from rdflib.compare import to_canonical_graph
+
+logger = logging.getLogger(__name__)
+
+
+# N-Triples escapes of literals: one triple per line, also for multi-line literals (comments)
+NT_LITERAL_ESCAPES = str.maketrans({'\\': '\\\\', '"': '\\"', '\n': '\\n', '\r': '\\r'})
+
+
+def nt_term(term) -> str:
+    """N-Triples form of a term, literals on one line (n3() writes multi-line literals in triple quotes)"""
+    if isinstance(term, rdflib.Literal):
+        literal = '"' + str(term).translate(NT_LITERAL_ESCAPES) + '"'
+        if term.language:
+            return f"{literal}@{term.language}"
+        if term.datatype:
+            return f"{literal}^^<{term.datatype}>"
+        return literal
+    return term.n3()
+
+
+def graph_lines(graph) -> list:
+    """sorted N-Triples lines of the canonicalized graph, one line per triple"""
+    canonical_graph = to_canonical_graph(graph)
+    return sorted(f"{nt_term(s)} {nt_term(p)} {nt_term(o)} .\n" for s, p, o in canonical_graph)
+
+
+def version_key(version: str) -> tuple:
+    """sort key of a version string, numeric parts compare as numbers ('0.9.0' < '0.10.0'),
+    pre-release parts ('0.10.0rc1', '0.10.0-dev') sort before the release"""
+    key = []
+    for part in re.findall(r'\d+|[A-Za-z]+', version):
+        key.append((1, int(part), '') if part.isdigit() else (0, 0, part.lower()))
+    # end marker: between pre-release parts (0) and further numeric parts (1)
+    return tuple(key) + ((0.5, 0, ''),)
+
+
+def split_line(line: str) -> tuple:
+    """subject, predicate, object of an N-Triples line"""
+    s, p, o = line.rstrip('\n').split(' ', 2)
+    return s, p, o[:-2]
+
+
+class SnapshotDiff:
+    def __init__(self, old_version: str, new_version: str, ontology_name: str) -> None:
+        """Structural difference of one ontology between two snapshots"""
+        self.old_version = old_version
+        self.new_version = new_version
+        self.ontology_name = ontology_name
+
+        self.added = {}    # subject: [(predicate, object)] of new subjects
+        self.removed = {}  # subject: [(predicate, object)] of deleted subjects
+        self.changed = {}  # subject: {predicate: ([old objects], [new objects])}
+
+    @property
+    def empty(self) -> bool:
+        return not (self.added or self.removed or self.changed)
+
+    def changed_subjects(self) -> set:
+        """all added, removed or changed subjects, e.g. for cache invalidation"""
+        return set(self.added) | set(self.removed) | set(self.changed)
+
+    def summary(self) -> dict:
+        return {'added': len(self.added), 'removed': len(self.removed), 'changed': len(self.changed)}
+
+    def __repr__(self) -> str:
+        return f"SnapshotDiff({self.ontology_name}: {self.old_version} -> {self.new_version}, {self.summary()})"
+
+
+class SnapshotStore:
+    def __init__(self, snapshot_dir: str = "snapshots") -> None:
+        """Store of sorted, hashed triple sets of exported ontologies
+
+        :param snapshot_dir: root directory of the snapshots
+        """
+        self.snapshot_dir = snapshot_dir
+
+    def _version_dir(self, version: str) -> str:
+        return os.path.join(self.snapshot_dir, version)
+
+    def _snapshot_filename(self, version: str, ontology_name: str) -> str:
+        return os.path.join(self._version_dir(version), ontology_name + '.nt')
+
+    def _open_snapshot(self, version: str, ontology_name: str):
+        """sorted N-Triples lines of a snapshot, no lines if the ontology is not recorded in the version"""
+        if ontology_name not in self.manifest(version):
+            return io.StringIO()
+        return open(self._snapshot_filename(version, ontology_name), encoding='utf-8')
+
+    def manifest(self, version: str) -> dict:
+        """ontology name: {'sha256': ..., 'num_triples': ...} of a version"""
+        manifest_filename = os.path.join(self._version_dir(version), 'manifest.json')
+        if not os.path.exists(manifest_filename):
+            return {}
+        with open(manifest_filename, encoding='utf-8') as manifest_file:
+            return json.load(manifest_file)
+
+    def versions(self) -> list:
+        """all recorded versions"""
+        if not os.path.isdir(self.snapshot_dir):
+            return []
+        return sorted((version for version in os.listdir(self.snapshot_dir)
+                       if os.path.exists(os.path.join(self._version_dir(version), 'manifest.json'))),
+                      key=version_key)
+
+    def record(self, version: str, ontology_name: str, graph=None, filename: str = None,
+               format: str = 'turtle') -> str:
+        """recording an ontology (rdflib graph or file) as snapshot
+
+        :return: sha256 hash of the canonical triple set
+        """
+        if graph is None:
+            graph = rdflib.Graph()
+            graph.parse(filename, format=format)
+        lines = graph_lines(graph)
+
+        os.makedirs(self._version_dir(version), exist_ok=True)
+        sha256 = hashlib.sha256()
+        with open(self._snapshot_filename(version, ontology_name), 'w', encoding='utf-8') as snapshot_file:
+            for line in lines:
+                snapshot_file.write(line)
+                sha256.update(line.encode('utf-8'))
+
+        manifest = self.manifest(version)
+        manifest[ontology_name] = {'sha256': sha256.hexdigest(), 'num_triples': len(lines)}
+        with open(os.path.join(self._version_dir(version), 'manifest.json'), 'w', encoding='utf-8') as manifest_file:
+            json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+
+        logger.debug(f"snapshot {version}/{ontology_name}: {len(lines)} triples")
+        return manifest[ontology_name]['sha256']
+
+    def diff(self, old_version: str, new_version: str, ontology_name: str) -> SnapshotDiff:
+        """structural diff of an ontology between two versions (merge-join of the sorted triples)"""
+        diff = SnapshotDiff(old_version, new_version, ontology_name)
+        old_hash = self.manifest(old_version).get(ontology_name, {}).get('sha256')
+        new_hash = self.manifest(new_version).get(ontology_name, {}).get('sha256')
+        if old_hash is not None and old_hash == new_hash:
+            return diff
+
+        old_subjects, new_subjects = set(), set()
+        removed_triples, added_triples = [], []
+        with self._open_snapshot(old_version, ontology_name) as old_file, \
+                self._open_snapshot(new_version, ontology_name) as new_file:
+            old_line, new_line = old_file.readline(), new_file.readline()
+            while old_line or new_line:
+                if old_line and (not new_line or old_line < new_line):
+                    removed_triples.append(split_line(old_line))
+                    old_subjects.add(removed_triples[-1][0])
+                    old_line = old_file.readline()
+                elif new_line and (not old_line or new_line < old_line):
+                    added_triples.append(split_line(new_line))
+                    new_subjects.add(added_triples[-1][0])
+                    new_line = new_file.readline()
+                else:  # identical triple
+                    subject = split_line(old_line)[0]
+                    old_subjects.add(subject)
+                    new_subjects.add(subject)
+                    old_line, new_line = old_file.readline(), new_file.readline()
+
+        for s, p, o in removed_triples:
+            if s in new_subjects:
+                diff.changed.setdefault(s, {}).setdefault(p, ([], []))[0].append(o)
+            else:
+                diff.removed.setdefault(s, []).append((p, o))
+        for s, p, o in added_triples:
+            if s in old_subjects:
+                diff.changed.setdefault(s, {}).setdefault(p, ([], []))[1].append(o)
+            else:
+                diff.added.setdefault(s, []).append((p, o))
+        return diff
+
+    def diff_versions(self, old_version: str, new_version: str) -> dict:
+        """diffs of all ontologies of two versions, ontologies of only one version are added / removed completely
+
+        :return: dict ontology name: SnapshotDiff
+        """
+        names = set(self.manifest(old_version)) | set(self.manifest(new_version))
+        return {name: self.diff(old_version, new_version, name) for name in sorted(names)}
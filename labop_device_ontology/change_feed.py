@@ -0,0 +1,151 @@
+"""_____________________________________________________________________
+
+:PROJECT: LabOP Device Ontology
+
+* Change feed of ABox mutations *
+
+:details:  durable, ordered log of device inserts, updates and deletes.
+
+           Every change is appended to a SQLite table with a monotonic sequence number.
+           Downstream caches (LIMS, scheduler, search service) remember the last sequence
+           number they processed (their cursor) and catch up incrementally, either by
+           iterating (sync) or by subscribing (asyncio).
+
+           The log is a table of the World database, written through the connection of the
+           World, in the same transaction as the device triples: events are appended after the
+           triples are written, are rolled back with them (e.g. a cancelled import job) and are
+           durable when the World is committed (world.save()), also in WAL mode.
+           Consumers in other processes open the World database file read-only.
+           In-process listeners are also notified of devices entering or leaving the World
+           without a mutation (loaded / unloaded ABox partitions), these are not logged.
+
+.. note:: changes are captured by the importers (parallel_import.insert_triples) and by
+          LabwareInterface.device_changed / delete_device - devices modified directly via
+          the owlready2 API of the ABox must be announced with device_changed
+.. todo:: -
+________________________________________________________________________
+"""
+
+import json
+import time
+import sqlite3
+import asyncio
+import logging
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+ChangeEvent = namedtuple('ChangeEvent', ['seq', 'timestamp', 'operation', 'iri', 'payload'])
+
+OPERATIONS = ('insert', 'update', 'delete')
+
+
+class ChangeFeed:
+    def __init__(self, emmo_world=None, filename: str = None) -> None:
+        """Change feed of device mutations
+
+        :param emmo_world: owlready2 World, the log is stored in its database and written in its transactions
+        :param filename: World database file, without emmo_world: read-only consumer of the log
+        """
+        if emmo_world is None:
+            self.db = sqlite3.connect(f"file:{filename}?mode=ro", uri=True, isolation_level=None,
+                                      check_same_thread=False)
+        else:
+            self.db = emmo_world.graph.db
+            self.db.execute("CREATE TABLE IF NOT EXISTS lodev_changes (seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+                            "timestamp REAL NOT NULL, operation TEXT NOT NULL, iri TEXT NOT NULL, payload TEXT)")
+        self.table = 'lodev_changes'
+        self.listeners = []
+
+    def add_listener(self, callback) -> None:
+        """in-process listener, called with the list of new ChangeEvents after each append"""
+        self.listeners.append(callback)
+
+    def append(self, operation: str, iri: str, payload: dict = None) -> int:
+        """appending one change
+
+        :param operation: 'insert', 'update' or 'delete'
+        :param payload: optional JSON serializable change details
+        :return: sequence number of the change
+        """
+        return self.append_many([(operation, iri, payload)])
+
+    def append_many(self, changes) -> int:
+        """appending a batch of (operation, iri, payload) changes in the current transaction of the World,
+        after the changes are written
+
+        :return: sequence number of the last change
+        """
+        timestamp = time.time()
+        rows = []
+        for operation, iri, payload in changes:
+            if operation not in OPERATIONS:
+                raise ValueError(f"change feed: unknown operation '{operation}'")
+            rows.append((timestamp, operation, iri, json.dumps(payload) if payload is not None else None))
+        if not rows:
+            return self.last_seq()
+
+        first_seq = self.last_seq() + 1
+        self.db.executemany(f"INSERT INTO {self.table} (timestamp, operation, iri, payload) VALUES (?, ?, ?, ?)",
+                            rows)
+        last_seq = self.last_seq()
+
+        if self.listeners:
+            events = self.read(cursor=first_seq - 1, limit=len(rows))
+            for callback in self.listeners:
+                callback(events)
+        return last_seq
+
+    def notify(self, changes) -> None:
+        """calling the in-process listeners with (operation, iri, payload) changes, that are not written
+        to the log (no seq), e.g. devices of partitions loaded into or removed from the World -
+        not mutations of the devices, so feed consumers never see them
+        """
+        timestamp = time.time()
+        events = [ChangeEvent(None, timestamp, operation, iri, payload) for operation, iri, payload in changes]
+        if events:
+            for callback in self.listeners:
+                callback(events)
+
+    def last_seq(self) -> int:
+        """sequence number of the latest change (also after compaction), 0 for an empty log"""
+        row = self.db.execute("SELECT seq FROM sqlite_sequence WHERE name = 'lodev_changes'").fetchone()
+        return row[0] if row is not None else 0
+
+    def read(self, cursor: int = 0, limit: int = 1000) -> list:
+        """changes after the cursor (sequence number of the last processed change)"""
+        return [ChangeEvent(seq, timestamp, operation, iri, json.loads(payload) if payload is not None else None)
+                for seq, timestamp, operation, iri, payload in self.db.execute(
+                    f"SELECT seq, timestamp, operation, iri, payload FROM {self.table} WHERE seq > ? "
+                    "ORDER BY seq LIMIT ?", (cursor, limit))]
+
+    def iterate(self, cursor: int = 0, batch_size: int = 1000):
+        """iterating over all changes after the cursor that are currently in the log"""
+        while True:
+            events = self.read(cursor=cursor, limit=batch_size)
+            if not events:
+                return
+            yield from events
+            cursor = events[-1].seq
+
+    async def subscribe(self, cursor: int = 0, poll_interval: float = 0.5, batch_size: int = 1000):
+        """asynchronous, endless iteration over all changes after the cursor, waiting for new changes
+
+            async for event in change_feed.subscribe(cursor=last_processed_seq):
+                ...
+        """
+        while True:
+            events = self.read(cursor=cursor, limit=batch_size)
+            if not events:
+                await asyncio.sleep(poll_interval)
+                continue
+            for event in events:
+                yield event
+            cursor = events[-1].seq
+
+    def compact(self, cursor: int) -> int:
+        """removing all changes up to the cursor, e.g. after all consumers have processed them
+
+        :return: number of removed changes
+        """
+        return self.db.execute(f"DELETE FROM {self.table} WHERE seq <= ?", (cursor,)).rowcount
@@ -0,0 +1,172 @@
+"""_____________________________________________________________________
+
+:PROJECT: LabOP Device Ontology
+
+* Precomputed class hierarchy closure *
+
+:details:  transitive closure of the EMMO + device class hierarchy as bitsets.
+
+           Every named class gets a bit position, the ancestors and descendants of each
+           class are stored as python integers (bitsets). Subclass and instance tests are
+           single bit tests and "all devices of class X including subclasses" is the union
+           of the direct instances of the descendant classes - no walking of is_a chains
+           through owlready2 objects.
+
+           The closure is built from the asserted rdfs:subClassOf and rdf:type triples
+           of the quadstore (no reasoning), it has to be rebuilt after TBox changes
+           and after imports (instances).
+
+.. note:: -
+.. todo:: -
+________________________________________________________________________
+"""
+
+import logging
+from collections import deque
+
+from owlready2.base import rdf_type, rdfs_subclassof, owl_class
+
+logger = logging.getLogger(__name__)
+
+
+def iter_bits(bitset: int):
+    """positions of the set bits of a bitset"""
+    while bitset:
+        lowest = bitset & -bitset
+        yield lowest.bit_length() - 1
+        bitset ^= lowest
+
+
+class ClassHierarchyClosure:
+    def __init__(self, emmo_world=None) -> None:
+        """Transitive closure of the class hierarchy of all ontologies in emmo_world"""
+        self.emmo_world = emmo_world
+        self.build()
+
+    def build(self) -> None:
+        """(re-)building the closure from the quadstore"""
+        db = self.emmo_world.graph.db
+
+        parents = self._read_parents(db)
+        classes = set(parents) | {o for ps in parents.values() for o in ps}
+        classes |= {s for (s,) in db.execute("SELECT s FROM objs WHERE p = ? AND o = ? AND s > 0",
+                                             (rdf_type, owl_class))}
+        self.storids = sorted(classes)
+        self.index = {storid: i for i, storid in enumerate(self.storids)}
+
+        self.ancestors = self._build_ancestors(parents)
+        self.descendants = [0] * len(self.storids)
+        for i, bitset in enumerate(self.ancestors):
+            for ancestor in iter_bits(bitset):
+                self.descendants[ancestor] |= 1 << i
+        self._read_instances(db)
+
+        logger.debug(f"class hierarchy closure: {len(self.storids)} classes, {len(self.instance_types)} individuals")
+
+    @staticmethod
+    def _read_parents(db) -> dict:
+        """asserted named superclasses of each class"""
+        parents = {}
+        for s, o in db.execute("SELECT s, o FROM objs WHERE p = ? AND s > 0 AND o > 0", (rdfs_subclassof,)):
+            parents.setdefault(s, set()).add(o)
+        return parents
+
+    def _build_ancestors(self, parents: dict) -> list:
+        """ancestor bitsets in topological order (parents first, Kahn's algorithm)"""
+        children = {}
+        num_parents = {}
+        for storid in self.storids:
+            class_parents = parents.get(storid, ())
+            num_parents[storid] = len(class_parents)
+            for parent in class_parents:
+                children.setdefault(parent, []).append(storid)
+
+        ancestors = [0] * len(self.storids)
+        queue = deque(storid for storid in self.storids if num_parents[storid] == 0)
+        done = set()
+        while queue:
+            storid = queue.popleft()
+            bitset = 1 << self.index[storid]
+            for parent in parents.get(storid, ()):
+                bitset |= ancestors[self.index[parent]]
+            ancestors[self.index[storid]] = bitset
+            done.add(storid)
+            for child in children.get(storid, ()):
+                num_parents[child] -= 1
+                if num_parents[child] == 0:
+                    queue.append(child)
+
+        # classes in subclass cycles (equivalent classes asserted as mutual subclasses)
+        for storid in self.storids:
+            if storid not in done:
+                ancestors[self.index[storid]] = self._ancestors_bfs(storid, parents)
+        return ancestors
+
+    def _read_instances(self, db) -> None:
+        """asserted types of individuals"""
+        self.direct_instances = {}
+        self.instance_types = {}
+        for s, o in db.execute("SELECT s, o FROM objs WHERE p = ? AND s > 0", (rdf_type,)):
+            i = self.index.get(o)
+            if i is None or s in self.index:
+                continue
+            self.direct_instances.setdefault(i, []).append(s)
+            self.instance_types[s] = self.instance_types.get(s, 0) | self.ancestors[i]
+
+    def _ancestors_bfs(self, storid: int, parents: dict) -> int:
+        bitset = 0
+        queue = [storid]
+        while queue:
+            current = queue.pop()
+            bit = 1 << self.index[current]
+            if bitset & bit:
+                continue
+            bitset |= bit
+            queue.extend(parents.get(current, ()))
+        return bitset
+
+    def _storid(self, entity) -> int:
+        """storid of an owlready2 entity, IRI or storid"""
+        if isinstance(entity, int):
+            return entity
+        if isinstance(entity, str):
+            return self.emmo_world._abbreviate(entity, False)
+        return entity.storid
+
+    # --- queries
+
+    def is_subclass(self, subclass, superclass) -> bool:
+        """subclass is (reflexively, transitively) a subclass of superclass"""
+        sub, sup = self.index.get(self._storid(subclass)), self.index.get(self._storid(superclass))
+        if sub is None or sup is None:
+            return False
+        return bool(self.ancestors[sub] >> sup & 1)
+
+    def is_instance(self, individual, cls) -> bool:
+        """individual has an asserted type that is cls or one of its subclasses"""
+        i = self.index.get(self._storid(cls))
+        return i is not None and bool(self.instance_types.get(self._storid(individual), 0) >> i & 1)
+
+    def superclasses(self, cls) -> list:
+        """storids of all ancestors of cls (including cls)"""
+        i = self.index.get(self._storid(cls))
+        return [self.storids[j] for j in iter_bits(self.ancestors[i])] if i is not None else []
+
+    def subclasses(self, cls) -> list:
+        """storids of all descendants of cls (including cls)"""
+        i = self.index.get(self._storid(cls))
+        return [self.storids[j] for j in iter_bits(self.descendants[i])] if i is not None else []
+
+    def instances_of(self, cls) -> list:
+        """storids of all individuals of cls, including the instances of its subclasses"""
+        i = self.index.get(self._storid(cls))
+        if i is None:
+            return []
+        instances = []
+        for j in iter_bits(self.descendants[i]):
+            instances.extend(self.direct_instances.get(j, ()))
+        return list(dict.fromkeys(instances))
+
+    def entities(self, storids) -> list:
+        """owlready2 entities of storids"""
+        return [self.emmo_world._get_by_storid(storid) for storid in storids]
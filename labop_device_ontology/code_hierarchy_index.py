@@ -0,0 +1,199 @@
+"""_____________________________________________________________________
+
+:PROJECT: LabOP Device Ontology
+
+* Classification code hierarchy index *
+
+:details:  prefix tree index over the hierarchical UNSPSC and eCl@ss codes of the devices.
+
+           UNSPSC: 8 digits, segment (2) / family (4) / class (6) / commodity (8)
+           eCl@ss: 8 digits, segment (2) / main group (4) / group (6) / commodity class (8)
+
+           Every node of the tree stores the devices below it and their count,
+           so browsing ("all devices under family 4112") and faceted counts are
+           dictionary lookups instead of GROUP BY scans over the quadstore.
+           The tree is built once from the quadstore and then maintained incrementally
+           from the devices of the change feed (changed codes move a device, deleted
+           devices are pruned).
+
+.. note:: -
+.. todo:: -
+________________________________________________________________________
+"""
+
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# code scheme: (device property, hierarchy level names)
+CODE_SCHEMES = {
+    'unspsc': ('hasUNSPSC', ('segment', 'family', 'class', 'commodity')),
+    'eclass': ('hasEClass', ('segment', 'main_group', 'group', 'commodity_class')),
+}
+
+LEVEL_DIGITS = 2  # both schemes use two digits per hierarchy level
+
+# devices read per quadstore query (SQLite host parameter limit)
+UPDATE_BATCH_SIZE = 500
+
+
+class CodeNode:
+    """node of the code prefix tree"""
+    __slots__ = ('prefix', 'level', 'children', 'devices')
+
+    def __init__(self, prefix: str, level: int) -> None:
+        self.prefix = prefix
+        self.level = level
+        self.children = {}
+        self.devices = set()
+
+    @property
+    def count(self) -> int:
+        """number of devices at or below this node"""
+        return len(self.devices)
+
+
+class CodeHierarchyIndex:
+    def __init__(self, emmo_world=None, lw_tbox=None, change_feed=None) -> None:
+        """Prefix tree index of the UNSPSC and eCl@ss codes of all devices
+
+        :param emmo_world: owlready2 World holding the device ABox
+        :param lw_tbox: LOLabwareTBox, providing the code properties
+        :param change_feed: ChangeFeed, the codes of inserted, updated and deleted devices are updated
+        """
+        self.emmo_world = emmo_world
+        self.lw_tbox = lw_tbox
+        self.clear()
+
+        if change_feed is not None:
+            change_feed.add_listener(self._on_changes)
+
+    def _on_changes(self, events) -> None:
+        for event in events:
+            if event.operation == 'delete':
+                self.remove(event.iri)
+        self.update_devices(event.iri for event in events if event.operation != 'delete')
+
+    def clear(self) -> None:
+        """removing all devices from the index"""
+        self.roots = {scheme: CodeNode('', 0) for scheme in CODE_SCHEMES}
+        # flat prefix -> node lookup for constant time access
+        self.nodes = {scheme: {'': root} for scheme, root in self.roots.items()}
+        # device iri -> code, required for incremental updates
+        self.device_codes = {scheme: {} for scheme in CODE_SCHEMES}
+
+    @staticmethod
+    def normalize(code) -> str:
+        """digits of a code, e.g. '41-12-15-02' -> '41121502' """
+        return re.sub(r'\D', '', str(code))
+
+    @staticmethod
+    def prefixes(code: str):
+        """all hierarchy prefixes of a normalized code, e.g. 41121502 -> 41, 4112, 411215, 41121502"""
+        return [code[:end] for end in range(LEVEL_DIGITS, len(code) + 1, LEVEL_DIGITS)]
+
+    # --- index maintenance
+
+    def add(self, iri: str, code, scheme: str = 'unspsc') -> None:
+        """add (or move) a device to the node of its code and all parent nodes"""
+        code = self.normalize(code)
+        if self.device_codes[scheme].get(iri) == code:
+            return
+        self.remove(iri, scheme)
+        if not code:
+            return
+
+        nodes = self.nodes[scheme]
+        parent = self.roots[scheme]
+        parent.devices.add(iri)
+        for level, prefix in enumerate(self.prefixes(code), start=1):
+            node = nodes.get(prefix)
+            if node is None:
+                node = nodes[prefix] = parent.children[prefix] = CodeNode(prefix, level)
+            node.devices.add(iri)
+            parent = node
+        self.device_codes[scheme][iri] = code
+
+    def remove(self, iri: str, scheme: str = None) -> None:
+        """remove a device from the index (from all schemes if no scheme is given)"""
+        for scheme in [scheme] if scheme is not None else list(CODE_SCHEMES):
+            code = self.device_codes[scheme].pop(iri, None)
+            if code is None:
+                continue
+            nodes = self.nodes[scheme]
+            self.roots[scheme].devices.discard(iri)
+            for prefix in reversed(self.prefixes(code)):
+                node = nodes[prefix]
+                node.devices.discard(iri)
+                if not node.devices:  # prune empty branches
+                    del nodes[prefix]
+                    nodes[prefix[:-LEVEL_DIGITS]].children.pop(prefix, None)
+
+    def _code_properties(self) -> dict:
+        """storid of the code property: scheme"""
+        storids = {}
+        for scheme, (prop_name, _) in CODE_SCHEMES.items():
+            prop = getattr(self.lw_tbox.lodevt, prop_name, None)
+            if prop is not None:
+                storids[prop.storid] = scheme
+        return storids
+
+    def update_devices(self, iris) -> None:
+        """moving devices to the nodes of their current codes (read from the quadstore),
+        devices without a code are removed from a scheme"""
+        schemes = self._code_properties()
+        iris = list(dict.fromkeys(iris))
+        for i in range(0, len(iris), UPDATE_BATCH_SIZE):
+            storids = {storid: iri for storid, iri in ((self.emmo_world._abbreviate(iri, False), iri)
+                                                       for iri in iris[i:i + UPDATE_BATCH_SIZE])}
+            codes = {}
+            known = [storid for storid in storids if storid is not None]
+            if known and schemes:
+                for s, p, o in self.emmo_world.graph.db.execute(
+                        f"SELECT s, p, o FROM datas WHERE p IN ({','.join('?' * len(schemes))}) "
+                        f"AND s IN ({','.join('?' * len(known))})", [*schemes, *known]):
+                    codes[storids[s], schemes[p]] = o
+            for iri in storids.values():
+                for scheme in CODE_SCHEMES:
+                    code = codes.get((iri, scheme))
+                    if code:
+                        self.add(iri, code, scheme)
+                    else:
+                        self.remove(iri, scheme)
+
+    def rebuild(self) -> int:
+        """rebuilding the index from the quadstore, e.g. after opening a World or a rollback
+
+        :return: number of indexed codes
+        """
+        self.clear()
+        num_codes = 0
+        for storid, scheme in self._code_properties().items():
+            for s, o in self.emmo_world.graph.db.execute("SELECT s, o FROM datas WHERE p = ?", (storid,)):
+                self.add(self.emmo_world._unabbreviate(s), o, scheme)
+                num_codes += 1
+        logger.debug(f"code hierarchy index rebuilt with {num_codes} codes")
+        return num_codes
+
+    # --- queries
+
+    def devices_under(self, prefix, scheme: str = 'unspsc') -> set:
+        """all devices under a code prefix, e.g. family '4112' """
+        node = self.nodes[scheme].get(self.normalize(prefix))
+        return set(node.devices) if node is not None else set()
+
+    def count(self, prefix, scheme: str = 'unspsc') -> int:
+        """number of devices under a code prefix"""
+        node = self.nodes[scheme].get(self.normalize(prefix))
+        return node.count if node is not None else 0
+
+    def facets(self, prefix='', scheme: str = 'unspsc') -> dict:
+        """device counts of the next hierarchy level below prefix, e.g. all families of segment '41'
+
+        :return: dict child prefix: device count
+        """
+        node = self.nodes[scheme].get(self.normalize(prefix))
+        if node is None:
+            return {}
+        return {child_prefix: child.count for child_prefix, child in sorted(node.children.items())}
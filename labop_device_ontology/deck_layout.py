@@ -0,0 +1,265 @@
+"""_____________________________________________________________________
+
+:PROJECT: LabOP Device Ontology
+
+* Deck layout and labware placement solver *
+
+:details:  assignment of labware stacks to deck positions.
+
+           Every device record is reduced once to its placement bounds (stack height
+           with / without lid, gripping heights, tolerated gripping pressure, stackability).
+           Deck positions are sorted per constraint, so the positions satisfying one
+           constraint are a prefix of the sorted order, stored as an integer bitset (one bit
+           per deck position). The feasible positions of an item are the AND of a few of
+           these bitsets - bit-parallel over all positions, no pairwise checks - and are
+           cached per item, so a candidate layout is checked with one bit test per placed item.
+
+           The optimal assignment (minimal total cost, default: wasted head room)
+           of the placement items to feasible positions is computed with the
+           Hungarian algorithm.
+
+           records: DeviceRecords (read_device_records with EMMO, quantities in mm / kPa) or dicts
+           with the device property names (hasHeight, hasHightLidded, hasHightStacked, hasHightStackedLidded,
+           hasGrippingHeight, hasGrippingHeightWithLid, hasGrippingHeightLidding, hasGrippingPressure,
+           isStackable). A device without height data only fits positions without height limit,
+           a device without gripping data is not restricted by the gripper.
+
+.. note:: -
+.. todo:: - multiple items per position
+________________________________________________________________________
+"""
+
+import logging
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+
+from labop_device_ontology.class_closure import iter_bits
+
+logger = logging.getLogger(__name__)
+
+# max_height: clearance of the position, max_stack: number of labware in a stack,
+# min/max_gripping_height: range reachable by the gripper, gripping_pressure: pressure applied by the gripper,
+# lidding: lids are put on / taken off at the position (the gripper also has to reach the lidding gripping height)
+DeckPosition = namedtuple('DeckPosition', ['name', 'max_height', 'max_stack', 'min_gripping_height',
+                                           'max_gripping_height', 'gripping_pressure', 'lidding'],
+                          defaults=[float('inf'), 1, 0.0, float('inf'), 0.0, False])
+
+# labware to be placed: device iri, number of stacked labware, stacked with lids
+PlacementItem = namedtuple('PlacementItem', ['iri', 'count', 'lidded'], defaults=[1, False])
+
+PlacementBounds = namedtuple('PlacementBounds', ['height', 'height_lidded', 'stack_pitch', 'stack_pitch_lidded',
+                                                 'gripping_height', 'gripping_height_lidded',
+                                                 'gripping_height_lidding', 'max_gripping_pressure', 'stackable'])
+
+INFEASIBLE_COST = 1e12
+
+
+def _value(record, name: str):
+    value = record.get(name) if isinstance(record, dict) else getattr(record, name, None)
+    return value if value not in ('', 'N/A') else None
+
+
+def _number(record, name: str, default: float = None) -> float:
+    value = _value(record, name)
+    return default if value is None else float(value)
+
+
+def placement_bounds(record) -> PlacementBounds:
+    """placement bounds of a device record, missing values are replaced conservatively:
+    the height with lid bounds the height without lid, a missing height is infinite,
+    missing gripping values do not restrict the positions"""
+    height = _number(record, 'hasHeight', _number(record, 'hasHightLidded', float('inf')))
+    height_lidded = _number(record, 'hasHightLidded', height)
+    gripping_height = _number(record, 'hasGrippingHeight')
+    return PlacementBounds(
+        height=height,
+        height_lidded=height_lidded,
+        stack_pitch=_number(record, 'hasHightStacked', height_lidded),
+        stack_pitch_lidded=_number(record, 'hasHightStackedLidded', height_lidded),
+        gripping_height=gripping_height,
+        gripping_height_lidded=_number(record, 'hasGrippingHeightWithLid', gripping_height),
+        gripping_height_lidding=_number(record, 'hasGrippingHeightLidding'),
+        max_gripping_pressure=_number(record, 'hasGrippingPressure'),
+        stackable=str(_value(record, 'isStackable')).strip().lower() in ('true', 'yes', '1', 'y'))
+
+
+def stack_height(bounds: PlacementBounds, count: int = 1, lidded: bool = False) -> float:
+    """height of a stack of count labware (the top one lidded, if lidded)"""
+    height, pitch = (bounds.height_lidded, bounds.stack_pitch_lidded) if lidded else (bounds.height, bounds.stack_pitch)
+    # no multiplication for a single labware, 0 * inf is nan
+    return height + (count - 1) * pitch if count > 1 else height
+
+
+class _SortedBitsets:
+    """positions sorted by one attribute, the positions with attribute >= / <= x as bitset"""
+
+    def __init__(self, values: list) -> None:
+        order = sorted(range(len(values)), key=values.__getitem__)
+        self.values = [values[i] for i in order]
+        # prefix[k]: bitset of the first k positions in sorted order
+        self.prefix = [0]
+        for i in order:
+            self.prefix.append(self.prefix[-1] | 1 << i)
+        self.all = self.prefix[-1]
+
+    def at_least(self, x: float) -> int:
+        return self.all ^ self.prefix[bisect_left(self.values, x)]
+
+    def at_most(self, x: float) -> int:
+        return self.prefix[bisect_right(self.values, x)]
+
+
+def hungarian(cost: list) -> list:
+    """minimal cost assignment of the rows to distinct columns (rows <= columns)
+
+    :param cost: cost matrix (list of rows)
+    :return: column of each row
+    """
+    n, m = len(cost), len(cost[0]) if cost else 0
+    u, v = [0.0] * (n + 1), [0.0] * (m + 1)
+    p, way = [0] * (m + 1), [0] * (m + 1)
+    for i in range(1, n + 1):
+        _augment(cost, i, u, v, p, way)
+
+    assignment = [None] * n
+    for j in range(1, m + 1):
+        if p[j]:
+            assignment[p[j] - 1] = j - 1
+    return assignment
+
+
+def _augment(cost: list, i: int, u: list, v: list, p: list, way: list) -> None:
+    """assigning row i along a shortest augmenting path, updating the potentials u, v
+    and the row of each column p (1-based, column 0 is the virtual start column)"""
+    m = len(v) - 1
+    p[0] = i
+    j0 = 0
+    minv = [float('inf')] * (m + 1)
+    used = [False] * (m + 1)
+    while True:
+        used[j0] = True
+        j1, delta = _closest_column(cost[p[j0] - 1], p[j0], j0, u, v, minv, used, way)
+        for j in range(m + 1):
+            if used[j]:
+                u[p[j]] += delta
+                v[j] -= delta
+            else:
+                minv[j] -= delta
+        j0 = j1
+        if p[j0] == 0:
+            break
+    while j0:
+        j1 = way[j0]
+        p[j0] = p[j1]
+        j0 = j1
+
+
+def _closest_column(row: list, i0: int, j0: int, u: list, v: list, minv: list, used: list, way: list) -> tuple:
+    """relaxing the reduced costs of row i0 (reached via column j0)
+
+    :return: unused column with the minimal reduced cost, its reduced cost
+    """
+    delta, j1 = float('inf'), 0
+    for j in range(1, len(v)):
+        if not used[j]:
+            reduced = row[j - 1] - u[i0] - v[j]
+            if reduced < minv[j]:
+                minv[j], way[j] = reduced, j0
+            if minv[j] < delta:
+                delta, j1 = minv[j], j
+    return j1, delta
+
+
+class DeckLayoutSolver:
+    def __init__(self, records: dict = None, positions: list = None) -> None:
+        """Placement solver for one deck
+
+        :param records: dict device iri: device record (DeviceRecord or dict)
+        :param positions: list of DeckPosition
+        """
+        self.positions = list(positions)
+        self.bounds = {iri: placement_bounds(record) for iri, record in records.items()}
+
+        self._height = _SortedBitsets([position.max_height for position in self.positions])
+        self._stack = _SortedBitsets([position.max_stack for position in self.positions])
+        self._min_gripping = _SortedBitsets([position.min_gripping_height for position in self.positions])
+        self._max_gripping = _SortedBitsets([position.max_gripping_height for position in self.positions])
+        self._pressure = _SortedBitsets([position.gripping_pressure for position in self.positions])
+        self._not_lidding = sum(1 << i for i, position in enumerate(self.positions) if not position.lidding)
+        self._feasible = {}  # item: bitset of feasible positions
+
+    def update_records(self, records: dict) -> None:
+        """replacing the bounds of changed devices"""
+        self.bounds.update((iri, placement_bounds(record)) for iri, record in records.items())
+        self._feasible.clear()
+
+    def feasible_positions(self, item: PlacementItem) -> int:
+        """bitset of the positions that can hold the item"""
+        item = PlacementItem(*item) if not isinstance(item, PlacementItem) else item
+        mask = self._feasible.get(item)
+        if mask is not None:
+            return mask
+        bounds = self.bounds.get(item.iri)
+        if bounds is None or (item.count > 1 and not bounds.stackable):
+            mask = 0
+        else:
+            mask = (self._height.at_least(stack_height(bounds, item.count, item.lidded))
+                    & self._stack.at_least(item.count))
+            gripping_height = bounds.gripping_height_lidded if item.lidded else bounds.gripping_height
+            if gripping_height is not None:
+                mask &= self._reachable(gripping_height)
+            if bounds.gripping_height_lidding is not None:
+                mask &= self._not_lidding | self._reachable(bounds.gripping_height_lidding)
+            if bounds.max_gripping_pressure is not None:
+                mask &= self._pressure.at_most(bounds.max_gripping_pressure)
+        self._feasible[item] = mask
+        return mask
+
+    def _reachable(self, gripping_height: float) -> int:
+        """bitset of the positions, where the gripper reaches the gripping height"""
+        return self._min_gripping.at_most(gripping_height) & self._max_gripping.at_least(gripping_height)
+
+    def is_feasible(self, layout: dict) -> bool:
+        """layout: dict position index: PlacementItem"""
+        return all(self.feasible_positions(item) >> position & 1 for position, item in layout.items())
+
+    def check_layouts(self, layouts) -> list:
+        """feasibility of many candidate layouts"""
+        return [self.is_feasible(layout) for layout in layouts]
+
+    def cost(self, item: PlacementItem, position: int) -> float:
+        """default cost: wasted head room of the position"""
+        bounds = self.bounds[item.iri]
+        max_height = self.positions[position].max_height
+        if max_height == float('inf'):
+            return 0.0
+        return max_height - stack_height(bounds, item.count, item.lidded)
+
+    def solve(self, items: list, cost=None) -> dict:
+        """optimal assignment of the items to distinct positions
+
+        :param cost: optional cost function cost(item, position index), default: wasted head room
+        :return: dict item index: position index, None if there is no feasible assignment
+        """
+        items = [PlacementItem(*item) if not isinstance(item, PlacementItem) else item for item in items]
+        cost = cost or self.cost
+        masks = [self.feasible_positions(item) for item in items]
+
+        # pruning: items without positions, too few positions for all items
+        if not all(masks) or len(items) > len(self.positions):
+            return None
+        union = 0
+        for mask in masks:
+            union |= mask
+        if bin(union).count('1') < len(items):
+            return None
+
+        # only the positions feasible for any item are columns of the cost matrix
+        columns = list(iter_bits(union))
+        matrix = [[cost(item, position) if mask >> position & 1 else INFEASIBLE_COST for position in columns]
+                  for item, mask in zip(items, masks)]
+        assignment = hungarian(matrix)
+        if any(matrix[i][j] >= INFEASIBLE_COST for i, j in enumerate(assignment)):
+            logger.debug("deck layout: no feasible assignment")
+            return None
+        return {i: columns[j] for i, j in enumerate(assignment)}
@@ -0,0 +1,63 @@
+"""_____________________________________________________________________
+
+:PROJECT: LabOP Device Ontology
+
+* Assertion box of the Device Ontology *
+
+:details:  ABox ontology of the devices (individuals of the Device classes of the TBox),
+           created empty or loaded from an exported ABox file.
+           The serial CSV import is the parallel import with a single process,
+           so both write the same triples and change events.
+
+.. note:: -
+.. todo:: -
+________________________________________________________________________
+"""
+
+import logging
+
+from labop_device_ontology.export_ontology import export_ontology
+from labop_device_ontology.parallel_import import import_csv_parallel
+
+logger = logging.getLogger(__name__)
+
+
+class LOLabwareABox:
+    def __init__(self, lw_abox_filename: str = None, emmo_world=None, emmo=None, emmo_url: str = None,
+                 lw_tbox=None) -> None:
+        """Device Assertion Box
+
+        :param lw_abox_filename: exported ABox to load, default: new empty ABox
+        :param lw_tbox: LOLabwareTBox of the devices
+        """
+        self.emmo = emmo
+        self.emmo_url = emmo_url
+        self.lw_tbox = lw_tbox
+
+        self.base_iri = 'http://www.labop.org/labop_device_abox'
+
+        if lw_abox_filename is None:
+            self.lodeva = emmo_world.get_ontology(self.base_iri)
+        else:
+            self.lodeva = emmo_world.get_ontology(lw_abox_filename).load()
+
+        if lw_tbox.lodevt not in self.lodeva.imported_ontologies:
+            self.lodeva.imported_ontologies.append(lw_tbox.lodevt)
+
+    def import_csv(self, csv_filename: str = None, validator=None, change_feed=None, minter=None,
+                   progress=None, intern_values: bool = False) -> list:
+        """importing a device catalogue in the main process (see parallel_import.import_csv_parallel)
+
+        :param intern_values: intern repeated short values of the catalogue rows (low-memory mode)
+        :return: list of imported device IRIs
+        """
+        return import_csv_parallel(csv_filename=csv_filename, abox=self.lodeva, lw_tbox=self.lw_tbox, processes=1,
+                                   validator=validator, change_feed=change_feed, minter=minter, progress=progress,
+                                   intern_values=intern_values)
+
+    def export(self, path: str = ".", format='turtle', snapshot_store=None, minter=None,
+               minted_iris: dict = None) -> None:
+        """save ontology """
+        export_ontology(ontology=self.lodeva, path=path, onto_base_filename='labop_device_abox', format=format,
+                        emmo_url=self.emmo_url, snapshot_store=snapshot_store, minter=minter,
+                        minted_iris=minted_iris)
@@ -0,0 +1,275 @@
+"""_____________________________________________________________________
+
+:PROJECT: LabOP Device Ontology
+
+* Full-text and fuzzy search index for devices *
+
+:details:  embedded inverted index over device names, vendors and codes.
+
+           The index lives in the SQLite database of the owlready2 World (in memory or
+           persistent), next to the quadstore. Free text fields are indexed by an FTS5
+           table with trigram tokenizer (prefix, substring and fuzzy search), codes
+           (product IDs, EAN, UNSPSC, eCl@ss) are stored in a plain table for exact lookups.
+           The index is filled directly from the quadstore, without instantiating
+           owlready2 individuals, and kept current by the change feed (imports,
+           device_changed, delete_device). The FTS rows are keyed by the storid of the
+           device (rowid), so updates and deletes are rowid lookups, inserted devices
+           are only added.
+
+.. note:: trigram tokenizer requires SQLite >= 3.34, older versions fall back to unicode61
+.. todo:: -
+________________________________________________________________________
+"""
+
+import logging
+import re
+
+from labop_device_ontology.tbox_schema import rdfs_label
+
+logger = logging.getLogger(__name__)
+
+# device properties indexed for free text search
+TEXT_PROPERTIES = ['hasVendorName', 'hasManufacturer', 'hasVendorProductID', 'hasProductID', 'hasModelID']
+
+SKOS_PREF_LABEL = 'http://www.w3.org/2004/02/skos/core#prefLabel'
+
+# device properties indexed for exact code lookup, property name: code kind
+CODE_PROPERTIES = {'hasVendorProductID': 'vendor_product_id',
+                   'hasProductID': 'product_id',
+                   'hasEAN': 'ean',
+                   'hasUNSPSC': 'unspsc',
+                   'hasEClass': 'eclass'}
+
+
+# text columns of the FTS table
+SEARCH_FIELDS = ('name', 'vendor', 'manufacturer', 'product')
+
+# devices re-indexed per quadstore query (SQLite host parameter limit)
+INDEX_BATCH_SIZE = 500
+
+
+def normalize_code(code: str) -> str:
+    """remove separators and whitespace from a code, e.g. '32-01-01-01' -> '32010101' """
+    return re.sub(r'[\s\-\./]', '', str(code)).upper()
+
+
+def trigrams(text: str) -> set:
+    """set of character trigrams of a (lower case) text"""
+    text = f"  {text.lower()} "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class DeviceSearchIndex:
+    def __init__(self, emmo_world=None, lw_tbox=None, change_feed=None) -> None:
+        """Search index of devices, stored in the SQLite database of the emmo_world
+
+        :param emmo_world: owlready2 World holding the device ABox
+        :param lw_tbox: LOLabwareTBox, providing the device properties
+        :param change_feed: ChangeFeed, inserted and updated devices are re-indexed, deleted devices removed
+        """
+        self.emmo_world = emmo_world
+        self.lw_tbox = lw_tbox
+        self.db = emmo_world.graph.db
+
+        self.text_properties = TEXT_PROPERTIES
+        self.code_properties = CODE_PROPERTIES
+        self.name_storids = [storid for storid in (rdfs_label, emmo_world._abbreviate(SKOS_PREF_LABEL, False))
+                             if storid is not None]
+
+        self._create_tables()
+
+        if change_feed is not None:
+            change_feed.add_listener(self._on_changes)
+
+    def _on_changes(self, events) -> None:
+        self.remove_devices(event.iri for event in events if event.operation == 'delete')
+        self.index_iris((event.iri for event in events if event.operation == 'update'))
+        self.index_iris((event.iri for event in events if event.operation == 'insert'), new=True)
+
+    def _create_tables(self):
+        """create the FTS5 and code tables, if not existing"""
+        try:
+            self.db.execute("CREATE VIRTUAL TABLE IF NOT EXISTS lodev_search "
+                            "USING fts5(iri UNINDEXED, name, vendor, manufacturer, product, tokenize='trigram')")
+            self.tokenizer = 'trigram'
+        except Exception:  # sqlite3.OperationalError: no such tokenizer
+            logger.warning("SQLite without trigram tokenizer - substring and fuzzy search are restricted to prefixes")
+            self.db.execute("CREATE VIRTUAL TABLE IF NOT EXISTS lodev_search "
+                            "USING fts5(iri UNINDEXED, name, vendor, manufacturer, product, prefix='2 3 4')")
+            self.tokenizer = 'unicode61'
+
+        self.db.execute("CREATE TABLE IF NOT EXISTS lodev_codes "
+                        "(code TEXT NOT NULL, kind TEXT NOT NULL, iri TEXT NOT NULL)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS lodev_codes_code ON lodev_codes(code, kind)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS lodev_codes_iri ON lodev_codes(iri)")
+
+    # --- index maintenance
+
+    def _property_storids(self, names) -> dict:
+        """storid: property name of the given TBox properties"""
+        storids = {}
+        for name in names:
+            prop = getattr(self.lw_tbox.lodevt, name, None)
+            if prop is not None:
+                storids[prop.storid] = name
+        return storids
+
+    def _read_device_values(self, subject_storids=None) -> dict:
+        """reading all indexed property values and the name (rdfs:label, skos:prefLabel) from the quadstore
+
+        :return: dict device storid: {property name: value}
+        """
+        storids = self._property_storids(set(self.text_properties) | set(self.code_properties))
+        storids.update({storid: 'name' for storid in self.name_storids})
+        sql = f"SELECT s, p, o FROM datas WHERE p IN ({','.join('?' * len(storids))})"
+        params = list(storids)
+        if subject_storids is not None:
+            sql += f" AND s IN ({','.join('?' * len(subject_storids))})"
+            params += list(subject_storids)
+
+        devices = {}
+        for s, p, o in self.db.execute(sql, params):
+            values = devices.setdefault(s, {})
+            # the first label is the name (rdfs:label before skos:prefLabel)
+            if storids[p] != 'name' or p == rdfs_label or 'name' not in values:
+                values[storids[p]] = o
+        return devices
+
+    def _insert(self, storid: int, iri: str, values: dict):
+        """insert one device into the search tables, the FTS row is keyed by the device storid"""
+        self.db.execute("INSERT INTO lodev_search (rowid, iri, name, vendor, manufacturer, product) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (storid, iri,
+                         values.get('name') or iri.rsplit('#', 1)[-1].rsplit('/', 1)[-1],
+                         values.get('hasVendorName', ''),
+                         values.get('hasManufacturer', ''),
+                         ' '.join(str(values[prop]) for prop in ('hasVendorProductID', 'hasProductID', 'hasModelID')
+                                  if values.get(prop))))
+        self.db.executemany("INSERT INTO lodev_codes (code, kind, iri) VALUES (?, ?, ?)",
+                            [(normalize_code(values[prop]), kind, iri)
+                             for prop, kind in self.code_properties.items() if values.get(prop)])
+
+    def _delete(self, storids: dict):
+        """remove devices from the search tables
+
+        :param storids: dict device storid: iri
+        """
+        self.db.executemany("DELETE FROM lodev_search WHERE rowid = ?", [(storid,) for storid in storids])
+        self.db.executemany("DELETE FROM lodev_codes WHERE iri = ?", [(iri,) for iri in storids.values()])
+
+    def _storids(self, iris) -> dict:
+        """storid: iri of the devices known to the World"""
+        return {storid: iri for storid, iri in ((self.emmo_world._abbreviate(iri, False), iri) for iri in iris)
+                if storid is not None}
+
+    def index_iris(self, iris, new: bool = False) -> None:
+        """(re-)indexing devices by IRI, read from the quadstore (unknown IRIs are removed from the index)
+
+        :param new: the devices are not indexed yet (inserts), nothing to remove
+        """
+        iris = list(dict.fromkeys(iris))
+        for i in range(0, len(iris), INDEX_BATCH_SIZE):
+            storids = self._storids(iris[i:i + INDEX_BATCH_SIZE])
+            if not new:
+                self._delete(storids)
+            values = self._read_device_values(subject_storids=list(storids))
+            for storid, iri in storids.items():
+                self._insert(storid, iri, values.get(storid, {}))
+
+    def remove_devices(self, iris) -> None:
+        """removing deleted devices from the index
+
+        :param iris: iterable of device IRIs
+        """
+        iris = list(iris)
+        storids = self._storids(iris)
+        # devices already destroyed in the World: looked up by IRI
+        unknown = set(iris) - set(storids.values())
+        if unknown:
+            storids.update(self.db.execute(
+                f"SELECT rowid, iri FROM lodev_search WHERE iri IN ({','.join('?' * len(unknown))})", list(unknown)))
+        self._delete(storids)
+
+    # --- queries
+
+    @staticmethod
+    def _fts_phrase(text: str) -> str:
+        """quote text as FTS5 phrase"""
+        return '"' + text.replace('"', '""') + '"'
+
+    def prefix_search(self, text: str, limit: int = 20) -> list:
+        """devices with a word of an indexed text field starting with text (type-ahead),
+        e.g. 'well plate' matches the name 'Greiner Bio-One 96 well plate'
+
+        :return: list of device IRIs, best matches first
+        """
+        text = text.strip()
+        if not text:
+            return []
+        like = self._like_escape(text) + '%'
+        word_like = '% ' + like
+        prefix_filter = ' OR '.join(f"{field} LIKE ? ESCAPE '\\' OR {field} LIKE ? ESCAPE '\\'"
+                                    for field in SEARCH_FIELDS)
+        like_params = [like, word_like] * len(SEARCH_FIELDS)
+        if self.tokenizer == 'trigram' and len(text) < 3:
+            # trigrams need at least three characters, short prefixes are scanned
+            rows = self.db.execute(f"SELECT iri FROM lodev_search WHERE {prefix_filter} LIMIT ?",
+                                   (*like_params, limit))
+        elif self.tokenizer == 'trigram':
+            # trigram tokenizer matches substrings, the LIKE filter keeps (word) prefixes only
+            rows = self.db.execute(f"SELECT iri FROM lodev_search WHERE lodev_search MATCH ? AND ({prefix_filter}) "
+                                   "ORDER BY rank LIMIT ?", (self._fts_phrase(text), *like_params, limit))
+        else:
+            rows = self.db.execute("SELECT iri FROM lodev_search WHERE lodev_search MATCH ? ORDER BY rank LIMIT ?",
+                                   (self._fts_phrase(text) + '*', limit))
+        return [iri for (iri,) in rows]
+
+    @staticmethod
+    def _like_escape(text: str) -> str:
+        """escape LIKE wildcards"""
+        return re.sub(r'([%_\\])', r'\\\1', text)
+
+    def fuzzy_search(self, text: str, limit: int = 20, min_similarity: float = 0.3) -> list:
+        """tolerant search for misspelled vendor names or product numbers,
+        ranked by trigram (Jaccard) similarity
+
+        :return: list of (device IRI, similarity) tuples, best matches first
+        """
+        query_trigrams = trigrams(text.strip())
+        if not text.strip():
+            return []
+        candidate_query = ' OR '.join(self._fts_phrase(tri.strip()) for tri in query_trigrams if len(tri.strip()) == 3)
+        if not candidate_query:
+            return []
+        # candidate pool: devices sharing the most (and rarest) trigrams with the query first (bm25 rank)
+        rows = self.db.execute("SELECT iri, name, vendor, manufacturer, product FROM lodev_search "
+                               "WHERE lodev_search MATCH ? ORDER BY rank LIMIT ?", (candidate_query, limit * 50))
+        results = []
+        for iri, *fields in rows:
+            similarity = max((self._similarity(query_trigrams, field) for field in fields if field), default=0.0)
+            if similarity >= min_similarity:
+                results.append((iri, similarity))
+        results.sort(key=lambda result: -result[1])
+        return results[:limit]
+
+    @staticmethod
+    def _similarity(query_trigrams: set, field: str) -> float:
+        """best Jaccard similarity of query trigrams with field or any word of field"""
+        best = 0.0
+        for candidate in [field] + field.split():
+            field_trigrams = trigrams(candidate)
+            best = max(best, len(query_trigrams & field_trigrams) / len(query_trigrams | field_trigrams))
+        return best
+
+    def lookup_code(self, code: str, kind: str = None) -> list:
+        """exact lookup of product IDs, EAN, UNSPSC or eCl@ss codes
+
+        :param kind: restrict lookup to one code kind, e.g. 'ean' or 'unspsc'
+        :return: list of device IRIs
+        """
+        if kind is None:
+            rows = self.db.execute("SELECT DISTINCT iri FROM lodev_codes WHERE code = ?", (normalize_code(code),))
+        else:
+            rows = self.db.execute("SELECT DISTINCT iri FROM lodev_codes WHERE code = ? AND kind = ?",
+                                   (normalize_code(code), kind))
+        return [iri for (iri,) in rows]
@@ -0,0 +1,152 @@
+"""_____________________________________________________________________
+
+:PROJECT: LabOP Device Ontology
+
+* JSON / MessagePack device serialization *
+
+:details:  compact JSON representation of devices for web frontends and robot controllers.
+
+           The JSON schema of a device is generated from the TBox property schema.
+           Devices are read in bulk from the quadstore (no rdflib / JSON-LD round trip),
+           encoded once and cached per device; the cache is invalidated by the change feed.
+           Batch responses are concatenations of the cached payloads.
+
+           orjson and msgpack are optional, the standard json module is used as fallback
+           for JSON, MessagePack requires msgpack.
+
+.. note:: -
+.. todo:: -
+________________________________________________________________________
+"""
+
+import json
+import struct
+import logging
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional dependency
+    msgpack = None
+
+from labop_device_ontology.tbox_schema import (load_property_schema, record_datatype, is_quantity_property,
+                                               read_device_records, QUANTITY_UNITS)
+
+logger = logging.getLogger(__name__)
+
+# devices per bulk read (one IN (...) parameter list, below SQLite's host parameter limit)
+LOAD_BATCH_SIZE = 500
+
+JSON_TYPES = {float: 'number', int: 'integer', str: 'string', bool: 'boolean'}
+
+
+def device_json_schema(specs: list = None) -> dict:
+    """JSON schema of the device payload, generated from the TBox property schema"""
+    specs = specs if specs is not None else load_property_schema()
+    properties = {'iri': {'type': 'string', 'format': 'iri'}}
+    for spec in specs:
+        datatype = record_datatype(spec)
+        if datatype is None:
+            continue
+        json_property = {'type': JSON_TYPES[datatype], 'description': spec.description}
+        if not spec.functional:
+            json_property = {'type': 'array', 'items': {'type': JSON_TYPES[datatype]}, 'description': spec.description}
+        if spec.quantity:
+            json_property['x-quantity'] = spec.quantity
+        if is_quantity_property(spec):
+            json_property['x-unit'] = QUANTITY_UNITS[spec.quantity]
+        properties[spec.name] = json_property
+    return {'$schema': 'https://json-schema.org/draft/2020-12/schema',
+            'title': 'Device',
+            'type': 'object',
+            'properties': properties,
+            'required': ['iri'],
+            'additionalProperties': False}
+
+
+def device_dict(record) -> dict:
+    """compact dict of a DeviceRecord, without empty properties"""
+    return {name: list(value) if isinstance(value, tuple) else value
+            for name, value in record._asdict().items() if value is not None}
+
+
+def encode_json(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def encode_msgpack(obj) -> bytes:
+    if msgpack is None:
+        raise ImportError("MessagePack serialization requires the msgpack package")
+    return msgpack.packb(obj, use_bin_type=True)
+
+
+def msgpack_array_header(length: int) -> bytes:
+    """MessagePack array header, the array items are appended as already encoded payloads"""
+    if length < 16:
+        return bytes([0x90 | length])
+    if length < 2 ** 16:
+        return b'\xdc' + struct.pack('>H', length)
+    return b'\xdd' + struct.pack('>I', length)
+
+
+class DevicePayloadCache:
+    def __init__(self, emmo_world=None, lw_tbox=None, change_feed=None, format: str = 'json') -> None:
+        """Cache of pre-encoded device payloads
+
+        :param change_feed: ChangeFeed, changed or deleted devices are invalidated
+        :param format: 'json' or 'msgpack'
+        """
+        if format not in ('json', 'msgpack'):
+            raise ValueError(f"unknown payload format '{format}'")
+        self.emmo_world = emmo_world
+        self.lw_tbox = lw_tbox
+        self.format = format
+        self.encode = encode_json if format == 'json' else encode_msgpack
+
+        self.payloads = {}  # device iri: encoded payload
+
+        if change_feed is not None:
+            change_feed.add_listener(self._on_changes)
+
+    def _on_changes(self, events) -> None:
+        self.invalidate(event.iri for event in events)
+
+    def invalidate(self, iris=None) -> None:
+        """removing cached payloads (all, if no iris are given)"""
+        if iris is None:
+            self.payloads.clear()
+            return
+        for iri in iris:
+            self.payloads.pop(iri, None)
+
+    def _load(self, iris: list) -> None:
+        """encoding all uncached devices with one bulk read per LOAD_BATCH_SIZE devices"""
+        storids = [storid for storid in (self.emmo_world._abbreviate(iri, False) for iri in iris) if storid is not None]
+        for i in range(0, len(storids), LOAD_BATCH_SIZE):
+            records = read_device_records(emmo_world=self.emmo_world, ontology=self.lw_tbox.lodevt,
+                                          subject_storids=storids[i:i + LOAD_BATCH_SIZE], emmo=self.lw_tbox.emmo)
+            for iri, record in records.items():
+                self.payloads[iri] = self.encode(device_dict(record))
+
+    def get(self, iri: str) -> bytes:
+        """encoded payload of one device, None for unknown devices"""
+        if iri not in self.payloads:
+            self._load([iri])
+        return self.payloads.get(iri)
+
+    def encode_batch(self, iris) -> bytes:
+        """encoded array of devices, unknown devices are skipped"""
+        iris = list(iris)
+        missing = [iri for iri in iris if iri not in self.payloads]
+        if missing:
+            self._load(missing)
+        payloads = [self.payloads[iri] for iri in iris if iri in self.payloads]
+        if self.format == 'json':
+            return b'[' + b','.join(payloads) + b']'
+        return msgpack_array_header(len(payloads)) + b''.join(payloads)
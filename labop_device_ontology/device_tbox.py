@@ -6,43 +6,53 @@
 
 :details:  Main module implementation.
 
-            python module that defines an ontology of common device classes that are used in a scientific lab, based on EMMOntoPy
-            it should be possible to use this ontology to automatically get the right SI units for the properties of the device
-            and to automatically get the right EMMO classes for the device
-            as much as possible, the ontology should be based on EMMO, but it may be necessary to add some classes and properties
-            that are not in EMMO
+            python module that defines an ontology of common device classes that are used in a scientific lab,
+            based on EMMOntoPy
+            it should be possible to use this ontology to automatically get the right SI units for the properties
+            of the device and to automatically get the right EMMO classes for the device
+            as much as possible, the ontology should be based on EMMO, but it may be necessary to add some classes
+            and properties that are not in EMMO
             as much as possible should be inferred from EMMO, but it may be necessary to add some axioms
-            the ontology should be able to be used in a lab notebook, and should be able to be used to automatically generate
-            a device inventory
+            the ontology should be able to be used in a lab notebook, and should be able to be used to automatically
+            generate a device inventory
             the ontology should be able to be used to automatically generate a device database
 
+           The device properties are defined by the declarative schema data/device_tbox_properties.csv,
+           which is the source of truth (compiled by tbox_schema.compile_property_schema).
+           The class-by-class definition in define_properties() (bulk_schema=False) only exists as
+           comparison for benchmarks/bench_tbox_schema.py (and the consistency check in the tests),
+           changes of the schema go into the CSV file.
 
 .. note:: -
-.. todo:: - 
+.. todo:: -
 ________________________________________________________________________
 """
 
-
-import os
-import pathlib
 import logging
 
-from ontopy import World
-from ontopy.utils import write_catalog
-
-from labop_device_ontology.emmo_utils import en, pl
+from labop_device_ontology.emmo_utils import en, sync_python_names
 
-from owlready2 import DatatypeProperty, FunctionalProperty, ObjectProperty, AllDisjoint
+from owlready2 import Thing, DatatypeProperty, FunctionalProperty, ObjectProperty, AllDisjoint
 
-from labop_device_ontology import __version__ # Version of this ontology
 from labop_device_ontology.export_ontology import export_ontology
+from labop_device_ontology.tbox_schema import compile_property_schema, load_property_schema
+
 
 class LOLabwareTBox:
-    def __init__(self, lw_tbox_filename: str = None, emmo_world=None, emmo=None, emmo_url: str = None) -> None:
+    def __init__(self, lw_tbox_filename: str = None, emmo_world=None, emmo=None, emmo_url: str = None,
+                 schema_filename: str = None, bulk_schema: bool = True) -> None:
+        """Device Terminology Box
+
+        :param schema_filename: declarative property schema, default: data/device_tbox_properties.csv
+        :param bulk_schema: create the properties from the schema with one bulk insert,
+                            otherwise class by class (slower, kept for comparison)
+        """
 
         self.emmo = emmo
         self.emmo_url = emmo_url
-        
+        self.schema_filename = schema_filename
+        self.bulk_schema = bulk_schema
+
         self.base_iri = 'http://www.labop.org/labop_device_tbox'
 
         print("LOLabwareTBox:lw_tbox_filename:", lw_tbox_filename)
@@ -53,8 +63,8 @@ class LOLabwareTBox:
             self.lodevt = emmo_world.get_ontology(lw_tbox_filename).load()
 
         self.emmo.imported_ontologies.append(self.lodevt)
-        self.emmo.sync_python_names()
-        
+        sync_python_names(self.emmo)
+
         # --- ontology definition
 
         if lw_tbox_filename is None:
@@ -62,9 +72,12 @@ class LOLabwareTBox:
             print("++++++ defining ontology")
             self.define_ontology()
 
-    def export(self, path: str = ".", format='turtle') -> None:
+    def export(self, path: str = ".", format='turtle', snapshot_store=None, minter=None,
+               minted_iris: dict = None) -> None:
         """save ontology """
-        export_ontology(ontology=self.lodevt, path=path, onto_base_filename='labop_device_tbox', format=format, emmo_url=self.emmo_url)
+        export_ontology(ontology=self.lodevt, path=path, onto_base_filename='labop_device_tbox', format=format,
+                        emmo_url=self.emmo_url, snapshot_store=snapshot_store, minter=minter,
+                        minted_iris=minted_iris)
 
     def define_ontology(self):
         """defining the  labOP-device ontology Terminology Box (TBox) """
@@ -72,14 +85,12 @@ class LOLabwareTBox:
 
         with self.lodevt:
 
-            # Terminology Components (TBox) 
-
+            # Terminology Components (TBox)
 
             # device visual representation
-            
+
             class ModelIcon:
                 """Icon of the device in X format. SVG ?"""
-            
 
             class Model2D:
                 """2D model of the device in X format. SVG ?"""
@@ -88,10 +99,8 @@ class LOLabwareTBox:
                 """3D model of the device in X format. STL ?"""
                 wikipediaEntry = en("https://en.wikipedia.org/wiki/3D_modeling")
 
-            
             # AllDisjoint([ModelIcon, Model2D, Model3D])
-           
-           
+
             # multiwell device
             # =================
 
@@ -100,7 +109,7 @@ class LOLabwareTBox:
 
             class WellDistRow(self.emmo.Length):
                 """wWll-to-well distance in row direction"""
-            
+
             class WellDistCol(self.emmo.Length):
                 """"Well-to-well distance in column direction"""
 
@@ -109,10 +118,10 @@ class LOLabwareTBox:
             # Well properties of device with wells
             class DepthWell(self.emmo.Length):
                 """Well total well depth=hight"""
-            
+
             class ShapeWell:
                 """Well overall / top well shape,e.g. round, square, buffeled,..."""
-            
+
             class ShapeWellBottom:
                 """Well, bottom shape, flat, round, conical-"""
 
@@ -146,9 +155,9 @@ class LOLabwareTBox:
             class FirstInteractionPosition(self.emmo.Vector):
                 """Position of first interaction point of a pipette tip with a well or a needle with a septum, rel. to the upper left corner of the device. - what about round device?"""
 
-
-            #AllDisjoint([DepthWell, ShapeWell, ShapeWellBottom, TopRadiusXY, BottomRadiusXY, BottomRadiusZ, ConeAngle, ConeDepth, ShapePolygonXY, ShapePolygonZ, ShapeModel2D, ShapeModel3D, FirstInteractionPosition])
-
+            # AllDisjoint([DepthWell, ShapeWell, ShapeWellBottom, TopRadiusXY, BottomRadiusXY, BottomRadiusZ,
+            #              ConeAngle, ConeDepth, ShapePolygonXY, ShapePolygonZ, ShapeModel2D, ShapeModel3D,
+            #              FirstInteractionPosition])
 
             # Device Vendor related properties
             # =================================
@@ -169,13 +178,10 @@ class LOLabwareTBox:
                 """eCl@ss for device"""
                 wikipediaEntry = en("https://en.wikipedia.org/wiki/EClass")
 
-
             # Device Classes
             # ====================
-
             # Basic ------
-
-            class Device(self.lodevt.Device):
+            class Device(Thing):
                 """Device is a utility device that all experiments are done with and which is not actively measuring. Examples: a container, a pipette tip, a reactor, ... """
                 wikipediaEntry = en("https://en.wikipedia.org/wiki/Device")
 
@@ -185,16 +191,66 @@ class LOLabwareTBox:
 
             #  Relations / Properties
             # ========================
+            # the properties are defined declaratively in data/device_tbox_properties.csv
+            # and created with one bulk quadstore insert, the class-by-class definition
+            # in define_properties() is kept for comparison (bulk_schema=False)
+
+            if self.bulk_schema:
+                compile_property_schema(ontology=self.lodevt, specs=load_property_schema(self.schema_filename),
+                                        emmo=self.emmo, classes={'Device': Device})
+            else:
+                self.define_properties(Device)
+
+            # further properties:
+
+            # lengthAtEdge, lengthOverall, isSLAS1-2004complian
+
+            # isSLAS1-2004compliant
+
+            # all disjoined properties
+
+            # special device classes
+            # can be used for faster type testing
+            # ===================================================
+
+            lodevt = self.lodevt
+
+            class SLAS_4_2004_96_Well_Plate(Device):
+                """96 Well Microtiter Plate according to SLAS 4-2004 standard"""
+                equivalent_to = [Device & lodevt.hasNumCols.value(12) & lodevt.hasNumRows.value(8)
+                                 & lodevt.hasNumWells.value(96) & lodevt.hasWellVolume.value(100)
+                                 & lodevt.hasWellDistRow.value(9) & lodevt.hasWellDistCol.value(9)
+                                 & lodevt.hasDepthWell.value(14.5) & lodevt.hasShapeWell.value("round")
+                                 & lodevt.hasShapeWellBottom.value("flat") & lodevt.hasTopRadiusXY.value(4.5)
+                                 & lodevt.hasBottomRadiusXY.value(4.5) & lodevt.hasBottomRadiusZ.value(0)
+                                 & lodevt.hasConeAngle.value(0) & lodevt.hasConeDepth.value(0)
+                                 & lodevt.hasShapePolygonXY.value(0) & lodevt.hasShapePolygonZ.value(0)
+                                 & lodevt.hasShapeModel2D.value("circle") & lodevt.hasShapeModel3D.value("cylinder")
+                                 & lodevt.hasScrewCap.value(False) & lodevt.hasScrewCapMaterial.value("N/A")
+                                 & lodevt.hasScrewCapColor.value("N/A") & lodevt.hasColorRGB.value("#FFFFFF")
+                                 & lodevt.hasMaterial.value("polystyrene") & lodevt.hasMass.value(0)
+                                 & lodevt.hasMaxSheerForce.value(0) & lodevt.hasCoatingMaterial.value("N/A")
+                                 & lodevt.hasSetptum.value(False) & lodevt.hasSeptumMaterial.value("N/A")
+                                 & lodevt.hasSeptumPenetrationForce.value(0) & lodevt.isLiddable.value(False)
+                                 & lodevt.isStackable.value(True) & lodevt.isSealable.value(False)
+                                 & lodevt.hasManufacturer.value("N/A") & lodevt.isProductType.value("N/A")
+                                 & lodevt.hasModelID.value("N/A") & lodevt.hasProductID.value("N/A")]
+
+    def define_properties(self, Device):
+        """class-by-class definition of the device properties, benchmark comparison only:
+        the properties are defined by data/device_tbox_properties.csv"""
+
+        with self.lodevt:
 
             # Physical Properties
 
-            #class hasLength:
-                # """"Device total length """
-                # is_a = [
-                #     self.lodev.hasReferenceUnit.only(
-                #         self.lodev.hasPhysicalDimension.only(self.lodev.Length)
-                #     ),
-                #     hasType.exactly(1, self.lodev.Real), ]
+            # class hasLength:
+            #     """"Device total length """
+            #     is_a = [
+            #         self.lodev.hasReferenceUnit.only(
+            #             self.lodev.hasPhysicalDimension.only(self.lodev.Length)
+            #         ),
+            #         hasType.exactly(1, self.lodev.Real), ]
 
             # class hasWidth(FunctionalProperty):
             #     """Device total width, """
@@ -209,17 +265,16 @@ class LOLabwareTBox:
 
             class hasLength(Device >> self.emmo.Length, FunctionalProperty, ObjectProperty):
                 """Device total length, without  any additions, like lids etc."""
-                
 
             class hasLengthTolerance(self.emmo.Length >> float, FunctionalProperty, DatatypeProperty):
                 """Device relative length tolerance (= measured width/target width)."""
-            
+
             class hasWidth(Device >> self.emmo.Length, FunctionalProperty, ObjectProperty):
                 """Device total width, without  any additions, like lids etc."""
-            
+
             class hasWidthTolerance(self.emmo.Length >> float, FunctionalProperty, DatatypeProperty):
                 """Device relative width tolerance (= measured width/target width)."""
-            
+
             class hasHeight(Device >> self.emmo.Length, FunctionalProperty, ObjectProperty):
                 """Device total hight, without  any additions, like lids etc. """
 
@@ -231,7 +286,7 @@ class LOLabwareTBox:
 
             class hasGrippingHeightLidding(Device >> self.emmo.Length, FunctionalProperty, ObjectProperty):
                 """Device total hight, without  any additions, like lids etc. """
-            
+
             class hasGrippingHeightWithLid(Device >> self.emmo.Length, FunctionalProperty, ObjectProperty):
                 """Device total hight, without  any additions, like lids etc. """
 
@@ -265,7 +320,6 @@ class LOLabwareTBox:
             class hasCoatingMaterial(Device >> str, FunctionalProperty):
                 """Device coating material"""
 
-            
             class hasColorDescription(Device >> str, FunctionalProperty):
                 """Device color description, e.g. white, black, opaque, blue, transparent, ..."""
 
@@ -293,7 +347,6 @@ class LOLabwareTBox:
             class hasSeptumPenetrationForce(Device >> self.emmo.Force, FunctionalProperty):
                 """Septum penetration force"""
 
-
             # multiwell device
 
             class hasNumCols(Device >> int, FunctionalProperty):
@@ -308,8 +361,8 @@ class LOLabwareTBox:
             # Production Properties / Metadata
 
             class hasManufacturer(Device >> str, FunctionalProperty):
-                 """Name of the Manufacturer """
-            
+                """Name of the Manufacturer """
+
             class isProductType(Device >> str, FunctionalProperty):
                 """Device product Type"""
 
@@ -329,17 +382,17 @@ class LOLabwareTBox:
 
             class hasWellDistRow(Device >> float, FunctionalProperty):
                 """wWll-to-well distance in row direction"""
-            
+
             class hasWellDistCol(Device >> float, FunctionalProperty):
                 """"Well-to-well distance in column direction"""
 
             # Well properties of device with wells
             class hasDepthWell(Device >> float, FunctionalProperty):
                 """Well total well depth=hight"""
-            
+
             class hasShapeWell(Device >> str, FunctionalProperty):
                 """Well overall / top well shape,e.g. round, square, buffeled,..."""
-            
+
             class hasShapeWellBottom(Device >> str, FunctionalProperty):
                 """Well, bottom shape, flat, round, conical-"""
 
@@ -380,14 +433,12 @@ class LOLabwareTBox:
 
             class hasScrewCapMaterial(Device >> str, FunctionalProperty):
                 """Screw cap material"""
-            
+
             class hasScrewCapColor(Device >> str, FunctionalProperty):
                 """Screw cap color"""
 
-
             # device with snap cap
 
-
             # vendor specific properties
             class hasVendorName(Device >> str, FunctionalProperty):
                 """Vendor name"""
@@ -401,44 +452,3 @@ class LOLabwareTBox:
 
             class hasEAN(Device >> str, FunctionalProperty):
                 """EAN code"""
-
-            
-            # further properties:
-
-            # lengthAtEdge, lengthOverall, isSLAS1-2004complian
-
-            # isSLAS1-2004compliant
-
-            
-
-            # all disjoined properties
-
-            # special device classes
-            # can be used for faster type testing
-            # ===================================================
-
-            class SLAS_4_2004_96_Well_Plate(Device):
-                """96 Well Microtiter Plate according to SLAS 4-2004 standard"""
-                equivalent_to = [ Device & hasNumCols.value(12) &  hasNumRows.value(8) & hasNumWells.value(96) 
-                                & hasWellVolume.value(100) & hasWellDistRow.value(9) & hasWellDistCol.value(9) 
-                                & hasDepthWell.value(14.5) & hasShapeWell.value("round") & hasShapeWellBottom.value("flat") 
-                                & hasTopRadiusXY.value(4.5) & hasBottomRadiusXY.value(4.5) & hasBottomRadiusZ.value(0) 
-                                & hasConeAngle.value(0) & hasConeDepth.value(0) & hasShapePolygonXY.value(0) 
-                                & hasShapePolygonZ.value(0) & hasShapeModel2D.value("circle") & hasShapeModel3D.value("cylinder") 
-                                & hasScrewCap.value(False) & hasScrewCapMaterial.value("N/A") & hasScrewCapColor.value("N/A") 
-                                & hasColorRGB.value("#FFFFFF") & hasMaterial.value("polystyrene") & hasMass.value(0) 
-                                & hasMaxSheerForce.value(0) & hasCoatingMaterial.value("N/A") & hasSetptum.value(False) 
-                                & hasSeptumMaterial.value("N/A") & hasSeptumPenetrationForce.value(0) & isLiddable.value(False) & isStackable.value(True) 
-                                & isSealable.value(False) & hasManufacturer.value("N/A") & isProductType.value("N/A") & hasModelID.value("N/A") & hasProductID.value("N/A") ]
-                
-            
-
-            
-
-                
-
-            
-
-
-
-            
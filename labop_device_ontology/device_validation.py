@@ -0,0 +1,309 @@
+"""_____________________________________________________________________
+
+:PROJECT: LabOP Device Ontology
+
+* Data quality validation of devices *
+
+:details:  rule based validation of imported devices.
+
+           Rules are derived from the TBox property schema (datatypes, functional flags,
+           physical quantities) and completed by a few device specific consistency rules.
+           All rules are evaluated column-wise over the whole catalogue (one pass per
+           column instead of a reasoner run per device). The result is a report table,
+           failing catalogue rows can be quarantined before import. Of repeated device keys
+           the last row is valid, as the import keeps the last row (parallel_import.unique_rows).
+
+.. note:: -
+.. todo:: -
+________________________________________________________________________
+"""
+
+import re
+import csv
+import logging
+from operator import itemgetter
+from collections import namedtuple, Counter
+
+from labop_device_ontology.tbox_schema import load_property_schema, record_datatype, tolerance_quantity
+
+logger = logging.getLogger(__name__)
+
+ValidationIssue = namedtuple('ValidationIssue', ['iri', 'rule', 'property', 'value', 'message'])
+
+RGB_HEX_PATTERN = re.compile(r'^#[0-9A-Fa-f]{6}$')
+
+# quantities that cannot be negative
+NON_NEGATIVE_QUANTITIES = {'Length', 'Volume', 'Mass', 'Angle', 'Force', 'Pressure'}
+
+BOOL_VALUES = {'true': True, 'yes': True, 'y': True, '1': True,
+               'false': False, 'no': False, 'n': False, '0': False}
+
+# relative tolerances of the quantities (measured / target value)
+TOLERANCE_RANGE = (0.0, 2.0)
+
+# device key, that has to be unique in the catalogue (same key as iri_minting.device_key):
+# vendor and product ID, each the first non-empty of the alternative columns
+UNIQUE_KEY = (('hasVendorName', 'hasManufacturer'), ('hasVendorProductID', 'hasProductID'))
+
+EMPTY_VALUES = (None, '', 'N/A')
+
+
+class ValidationReport:
+    def __init__(self, issues: list = None, num_devices: int = 0) -> None:
+        """Result of a validation run"""
+        self.issues = issues or []
+        self.num_devices = num_devices
+
+    @property
+    def failing(self) -> set:
+        """identifiers (IRI or row index) of all failing devices"""
+        return {issue.iri for issue in self.issues}
+
+    @property
+    def valid(self) -> bool:
+        return not self.issues
+
+    def summary(self) -> dict:
+        """number of issues per rule"""
+        return dict(Counter(issue.rule for issue in self.issues))
+
+    def to_csv(self, filename: str) -> None:
+        """writing the report table"""
+        with open(filename, 'w', newline='', encoding='utf-8') as report_file:
+            writer = csv.writer(report_file)
+            writer.writerow(ValidationIssue._fields)
+            writer.writerows(self.issues)
+
+    def __repr__(self) -> str:
+        return f"ValidationReport({self.num_devices} devices, {len(self.failing)} failing, {self.summary()})"
+
+
+class DeviceValidator:
+    def __init__(self, specs: list = None) -> None:
+        """Column-wise validation of devices against the TBox property schema
+
+        :param specs: list of PropertySpec, default: data/device_tbox_properties.csv
+        """
+        self.specs = specs if specs is not None else load_property_schema()
+        # datatypes of the device record fields, quantities and tolerances are numbers
+        self.datatypes = {spec.name: record_datatype(spec) for spec in self.specs if record_datatype(spec) is not None}
+        self.non_negative = [spec.name for spec in self.specs
+                             if spec.quantity in NON_NEGATIVE_QUANTITIES
+                             and self.datatypes.get(spec.name) in (int, float)]
+        self.non_negative += [name for name, datatype in self.datatypes.items()
+                              if datatype is int and name.startswith('hasNum')]
+        self.tolerances = [spec.name for spec in self.specs if tolerance_quantity(spec) is not None]
+        # non-functional properties are read as tuples of values (see tbox_schema.read_device_records),
+        # so are the conflicting values of functional properties
+        self.multi_valued = {spec.name for spec in self.specs if not spec.functional}
+
+        # column rules: rule name, function(columns) -> list of (index, property, value, message)
+        self.rules = [
+            ('datatype', self._check_datatypes),
+            ('functional', self._check_functional),
+            ('non_negative', self._check_non_negative),
+            ('tolerance', self._check_tolerance),
+            ('color_rgb', self._check_color_rgb),
+            ('well_count', self._check_well_count),
+            ('unique', self._check_unique),
+        ]
+
+    # --- rules, evaluated on whole columns
+
+    def _check_datatypes(self, columns: dict) -> list:
+        failures = []
+        for name, values in columns.items():
+            datatype = self.datatypes.get(name)
+            if datatype is None:
+                continue
+            accepted = {datatype, type(None)} | ({int} if datatype is float else set())
+            types = set(map(type, values))
+            if types <= accepted:  # fast path: the whole column is valid
+                continue
+            # the number of values is checked by the functional rule, the datatype of each value here
+            failures += [(i, name, value, f"expected {datatype.__name__}") for i, value in enumerate(values)
+                         if type(value) not in accepted
+                         and not (type(value) is tuple and set(map(type, value)) <= accepted)]
+        return failures
+
+    def _check_functional(self, columns: dict) -> list:
+        failures = []
+        for name, values in columns.items():
+            if name in self.multi_valued or name not in self.datatypes or tuple not in set(map(type, values)):
+                continue
+            failures += [(i, name, value, f"{len(value)} values of a functional property")
+                         for i, value in enumerate(values) if type(value) is tuple]
+        return failures
+
+    def _check_non_negative(self, columns: dict) -> list:
+        failures = []
+        for name in self.non_negative:
+            try:
+                if min(filter(None, columns.get(name, ())), default=0) >= 0:  # fast path: all values >= 0
+                    continue
+            except TypeError:  # values of other types, reported by the datatype rule
+                pass
+            failures += [(i, name, value, "negative value") for i, value in enumerate(columns.get(name, ()))
+                         if isinstance(value, (int, float)) and value < 0]
+        return failures
+
+    def _check_tolerance(self, columns: dict) -> list:
+        low, high = TOLERANCE_RANGE
+        failures = []
+        for name in self.tolerances:
+            failures += [(i, name, value, f"tolerance outside ({low:g}, {high:g}]")
+                         for i, value in enumerate(columns.get(name, ()))
+                         if isinstance(value, (int, float)) and not low < value <= high]
+        return failures
+
+    def _check_color_rgb(self, columns: dict) -> list:
+        values = columns.get('hasColorRGB', ())
+        # few distinct colors: each distinct value is matched once
+        invalid = {value for value in set(values) if value is not None and not RGB_HEX_PATTERN.match(str(value))}
+        if not invalid:
+            return []
+        return [(i, 'hasColorRGB', value, "not a #RRGGBB hex color")
+                for i, value in enumerate(values) if value in invalid]
+
+    def _check_well_count(self, columns: dict) -> list:
+        if not {'hasNumWells', 'hasNumRows', 'hasNumCols'} <= set(columns):
+            return []
+        well_counts = zip(columns['hasNumWells'], columns['hasNumRows'], columns['hasNumCols'])
+        return [(i, 'hasNumWells', wells, f"{wells} != {rows} rows * {cols} cols")
+                for i, (wells, rows, cols) in enumerate(well_counts)
+                if isinstance(wells, int) and isinstance(rows, int) and isinstance(cols, int) and wells != rows * cols]
+
+    def _check_unique(self, columns: dict) -> list:
+        """the last device of a key is valid (as in parallel_import.unique_rows),
+        all previous devices with the same key are duplicates"""
+        num_devices = len(next(iter(columns.values()), ()))
+        (vendor_names, product_id_names) = UNIQUE_KEY
+        vendors = self._first_present(columns, vendor_names, num_devices, default='')
+        product_ids = self._first_present(columns, product_id_names, num_devices)
+        # normalized like iri_minting.device_key: stripped, lower case
+        try:
+            keys = list(zip(map(str.lower, map(str.strip, vendors)), map(str.lower, map(str.strip, product_ids))))
+            if len(set(keys)) == num_devices:  # fast path: all keys are distinct
+                return []
+        except TypeError:  # missing product IDs or values of other types
+            keys = list(zip((str(vendor).strip().lower() for vendor in vendors),
+                            (str(product_id).strip().lower() for product_id in product_ids)))
+        last = {key: i for i, (key, product_id) in enumerate(zip(keys, product_ids)) if product_id is not None}
+        return [(i, 'hasVendorProductID', product_id, f"duplicate device key (imported: index {last[key]})")
+                for i, (key, product_id) in enumerate(zip(keys, product_ids))
+                if product_id is not None and last[key] != i]
+
+    @staticmethod
+    def _first_present(columns: dict, names: tuple, num_devices: int, default=None) -> list:
+        """per device the first non-empty value of the alternative columns"""
+        present = [columns[name] for name in names if name in columns]
+        if not present:
+            return [default] * num_devices
+        if not any(empty in present[0] for empty in EMPTY_VALUES):  # fast path: the first column is complete
+            return present[0]
+        return [next((value for value in values if value not in EMPTY_VALUES), default) for values in zip(*present)]
+
+    # --- validation entry points
+
+    def validate_columns(self, columns: dict, ids: list, rules: list = None) -> ValidationReport:
+        """validating a column store
+
+        :param columns: property name: list of values, all of the length of ids
+        :param ids: device identifiers (IRIs or row numbers)
+        :param rules: list of (rule name, check), default: all rules
+        """
+        issues = []
+        for rule, check in rules if rules is not None else self.rules:
+            issues += [ValidationIssue(ids[i], rule, name, value, message)
+                       for i, name, value, message in check(columns)]
+        issues.sort(key=lambda issue: (issue.iri, issue.rule))
+        return ValidationReport(issues=issues, num_devices=len(ids))
+
+    def validate_records(self, records: dict) -> ValidationReport:
+        """validating device records, e.g. from tbox_schema.read_device_records()
+
+        :param records: dict iri: DeviceRecord
+        """
+        iris = list(records)
+        fields = next(iter(records.values()))._fields[1:] if records else ()
+        columns = {name: [getattr(records[iri], name) for iri in iris] for name in fields}
+        return self.validate_columns(columns, iris)
+
+    def validate_rows(self, rows: list) -> ValidationReport:
+        """validating catalogue CSV rows (dicts of strings) before the import, ids are row indices"""
+        names = [name for name in (rows[0] if rows else ()) if name in self.datatypes]
+        columns = {name: self._convert_column(values, self.datatypes[name])
+                   for name, values in zip(names, self._columns(rows, names))}
+        # a CSV cell is a single value, the functional rule only applies to records
+        rules = [(rule, check) for rule, check in self.rules if rule != 'functional']
+        return self.validate_columns(columns, list(range(len(rows))), rules=rules)
+
+    @staticmethod
+    def _columns(rows: list, names: list) -> list:
+        """values of the columns of the rows, transposed in one pass over the rows"""
+        if len(names) < 2:  # itemgetter of a single name returns values instead of tuples
+            return [[row.get(name) for row in rows] for name in names]
+        try:
+            return list(zip(*map(itemgetter(*names), rows)))
+        except KeyError:  # rows without some of the columns
+            return [[row.get(name) for row in rows] for name in names]
+
+    @staticmethod
+    def _convert_column(values: list, datatype) -> list:
+        """converting a CSV column, unconvertible values stay strings and are reported by the datatype rule"""
+        converted = DeviceValidator._convert_complete_column(values, datatype)
+        if converted is not None:
+            return converted
+        values = [value.strip() or None if value is not None else None for value in values]
+        if datatype is str:
+            return values
+        if datatype is bool:
+            return [BOOL_VALUES.get(value.lower(), value) if value is not None else None for value in values]
+        try:
+            return [datatype(value) if value is not None else None for value in values]
+        except ValueError:
+            return [DeviceValidator._convert(value, datatype) for value in values]
+
+    @staticmethod
+    def _convert_complete_column(values: list, datatype) -> list:
+        """fast paths of columns without missing cells, converted with map,
+        None if the column has missing, empty or unconvertible cells"""
+        if datatype in (int, float):
+            try:
+                return list(map(datatype, values))  # int() and float() ignore surrounding whitespace
+            except (ValueError, TypeError):  # TypeError: missing cells (None)
+                pass
+        try:
+            values = list(map(str.strip, values))
+        except TypeError:
+            return None
+        if '' in values:
+            return None
+        if datatype is str:
+            return values
+        if datatype is bool:
+            converted = list(map(BOOL_VALUES.get, map(str.lower, values)))
+            if None not in converted:
+                return converted
+        return None
+
+    @staticmethod
+    def _convert(value: str, datatype):
+        """converting a single (stripped) CSV cell"""
+        try:
+            return datatype(value) if value is not None else None
+        except ValueError:
+            return value
+
+    def quarantine(self, rows: list, report: ValidationReport = None) -> tuple:
+        """separating failing catalogue rows
+
+        :return: valid rows, quarantined rows, report
+        """
+        report = report or self.validate_rows(rows)
+        failing = report.failing
+        valid_rows = [row for i, row in enumerate(rows) if i not in failing]
+        quarantined_rows = [row for i, row in enumerate(rows) if i in failing]
+        if quarantined_rows:
+            logger.warning(f"validation: {len(quarantined_rows)} of {len(rows)} rows quarantined: {report.summary()}")
+        return valid_rows, quarantined_rows, report
@@ -48,9 +48,12 @@ class EMMOExtensionTBox:
             self.define_ontology()
 
 
-    def export(self, path: str = ".", format='turtle') -> None:
+    def export(self, path: str = ".", format='turtle', snapshot_store=None, minter=None,
+               minted_iris: dict = None) -> None:
         """save ontology """
-        export_ontology(ontology=self.emmo, path=path, onto_base_filename='labop_device_emmo', format=format, emmo_url=self.emmo_url)
+        export_ontology(ontology=self.emmo, path=path, onto_base_filename='labop_device_emmo', format=format,
+                        emmo_url=self.emmo_url, snapshot_store=snapshot_store, minter=minter,
+                        minted_iris=minted_iris)
     
 
     def define_ontology(self):
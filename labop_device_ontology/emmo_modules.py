@@ -0,0 +1,248 @@
+"""_____________________________________________________________________
+
+:PROJECT: LabOP Device Ontology
+
+* Minimal EMMO module extraction *
+
+:details:  extraction of the part of EMMO that is required by the device ontology.
+
+           The device TBox and the EMMO extension only refer to a small set of EMMO
+           classes (quantities, units, ChemicalSubstance) and annotation properties
+           (prefLabel, elucidation), the import of quantity values additionally requires
+           the units of QUANTITY_UNITS / UNIT_FACTORS and the quantity vocabulary
+           (hasNumericalPart, hasReferenceUnit, hasNumericalValue, Real). Starting from this signature,
+           the module extraction collects all axioms that describe these entities:
+           superclasses, equivalent classes, class restrictions (blank nodes, rdf lists),
+           the properties used in them with their domains and ranges, disjointness axioms
+           (pairwise and owl:AllDisjointClasses) and the annotations (labels) of all
+           collected entities. The module is extracted from EMMO loaded into a fresh World
+           (load_emmo) and restricted to the contexts of EMMO and its imports, so classes
+           of the EMMO extension, that are defined in the EMMO namespace of a running
+           LabwareInterface, do not leak into the module.
+
+           The module is written as N-Triples file and can be loaded instead of the
+           full EMMO import closure (LabwareInterface(emmo_module_filename=...)).
+           verify_emmo_module() checks that all entities of the signature are contained and that
+           the hierarchy, disjointness and domain / range axioms of the signature and of all
+           module properties are preserved.
+
+.. note:: -
+.. todo:: -
+________________________________________________________________________
+"""
+
+import logging
+
+from ontopy import World
+from owlready2 import PropertyClass
+
+from owlready2.base import (rdf_type, rdfs_subclassof, rdfs_subpropertyof, owl_equivalentclass,
+                            owl_equivalentproperty, owl_inverse_property, rdf_domain, rdf_range,
+                            owl_disjointwith, owl_propdisjointwith, owl_members, rdf_first, rdf_rest)
+
+from labop_device_ontology.tbox_schema import load_property_schema, QUANTITY_UNITS, UNIT_FACTORS
+from labop_device_ontology.emmo_utils import save_ntriples, sync_python_names
+
+logger = logging.getLogger(__name__)
+
+# EMMO classes, that are used by the device TBox (besides the property ranges of the schema)
+EMMO_TBOX_CLASSES = ['Volume', 'Length', 'Angle', 'Vector']
+
+# EMMO classes and units, that are extended / referenced by EMMOExtensionTBox
+EMMO_EXTENSION_CLASSES = ['Length', 'Area', 'Volume', 'Mass', 'Density', 'Force', 'Pressure', 'Torque',
+                          'ElectricConductance', 'Energy', 'ThermodynamicTemperature', 'ChemicalSubstance',
+                          'Metre', 'SquareMetre', 'CubicMetre', 'Kilogram', 'Newton', 'Pascal', 'NewtonMetre',
+                          'Kelvin']
+
+# EMMO properties and datatypes of the quantity individuals, written by the import and read by read_device_records
+EMMO_QUANTITY_VOCABULARY = ['hasNumericalPart', 'hasReferenceUnit', 'hasNumericalValue', 'Real']
+
+# EMMO annotation properties, that annotate the entities of the device TBox and the exports
+EMMO_ANNOTATIONS = ['prefLabel', 'elucidation']
+
+# predicates followed from named entities to other entities: hierarchy, domain / range, disjointness
+FOLLOWED_PREDICATES = (rdf_type, rdfs_subclassof, rdfs_subpropertyof, owl_equivalentclass,
+                       owl_equivalentproperty, owl_inverse_property, rdf_domain, rdf_range,
+                       owl_disjointwith, owl_propdisjointwith)
+
+# symmetric axioms, also followed from the object to the subject
+SYMMETRIC_PREDICATES = (owl_equivalentclass, owl_equivalentproperty, owl_inverse_property,
+                        owl_disjointwith, owl_propdisjointwith)
+
+
+def load_emmo(emmo_source: str = None):
+    """EMMO (file or url) loaded into a fresh World, without extensions or device TBox"""
+    emmo = World().get_ontology(emmo_source).load()
+    sync_python_names(emmo)
+    return emmo
+
+
+def emmo_contexts(emmo=None) -> list:
+    """quadstore contexts of EMMO and its import closure"""
+    contexts = set()
+    queue = [emmo]
+    while queue:
+        ontology = queue.pop()
+        if ontology.graph.c in contexts:
+            continue
+        contexts.add(ontology.graph.c)
+        queue.extend(ontology.imported_ontologies)
+    return sorted(contexts)
+
+
+def required_emmo_names(specs: list = None) -> list:
+    """names (labels) of all EMMO entities referenced by the device ontology"""
+    specs = specs if specs is not None else load_property_schema()
+    names = set(EMMO_TBOX_CLASSES) | set(EMMO_EXTENSION_CLASSES) | set(EMMO_ANNOTATIONS)
+    names |= set(QUANTITY_UNITS) | set(QUANTITY_UNITS.values()) | set(UNIT_FACTORS) | set(EMMO_QUANTITY_VOCABULARY)
+    names |= {value[5:] for spec in specs for value in (spec.domain, spec.range) if value.startswith('emmo:')}
+    return sorted(names)
+
+
+def module_signature_closure(emmo_world=None, seed_storids=None, contexts: list = None) -> set:
+    """storids of all entities and blank nodes reachable from the seed entities within the EMMO contexts
+
+    named entities: via FOLLOWED_PREDICATES (both directions for SYMMETRIC_PREDICATES) and the
+    n-ary disjointness axioms (owl:AllDisjointClasses, ...) they are member of,
+    blank nodes (restrictions, lists, axioms): via all predicates
+    """
+    db = emmo_world.graph.db
+    in_contexts = f"c IN ({','.join('?' * len(contexts))})"
+    followed = f"p IN ({','.join('?' * len(FOLLOWED_PREDICATES))})"
+    symmetric = f"p IN ({','.join('?' * len(SYMMETRIC_PREDICATES))})"
+    closure = set()
+    queue = list(seed_storids)
+    while queue:
+        storid = queue.pop()
+        if storid in closure:
+            continue
+        closure.add(storid)
+        if storid < 0:  # blank node: restriction, class expression, rdf list or axiom
+            for p, o in db.execute(f"SELECT p, o FROM objs WHERE s = ? AND {in_contexts}", (storid, *contexts)):
+                queue.append(o)
+                if p > 0:
+                    queue.append(p)  # e.g. owl:onProperty targets are objects, other predicates are vocabulary
+            continue
+        queue += [o for (o,) in db.execute(f"SELECT o FROM objs WHERE s = ? AND {followed} AND {in_contexts}",
+                                           (storid, *FOLLOWED_PREDICATES, *contexts))]
+        queue += [s for (s,) in db.execute(f"SELECT s FROM objs WHERE o = ? AND {symmetric} AND {in_contexts}",
+                                           (storid, *SYMMETRIC_PREDICATES, *contexts))]
+        queue += n_ary_axioms(db, storid, in_contexts, contexts)
+    return closure
+
+
+def n_ary_axioms(db, storid: int, in_contexts: str, contexts: list) -> list:
+    """blank nodes of the n-ary axioms (owl:members lists, e.g. owl:AllDisjointClasses) containing the entity"""
+    axioms = []
+    for (cell,) in db.execute(f"SELECT s FROM objs WHERE p = ? AND o = ? AND {in_contexts}",
+                              (rdf_first, storid, *contexts)):
+        head, visited = cell, set()
+        while head not in visited:  # walking back to the head of the rdf list
+            visited.add(head)
+            previous = db.execute(f"SELECT s FROM objs WHERE p = ? AND o = ? AND {in_contexts}",
+                                  (rdf_rest, head, *contexts)).fetchone()
+            if previous is None:
+                break
+            head = previous[0]
+        axioms += [s for (s,) in db.execute(f"SELECT s FROM objs WHERE p = ? AND o = ? AND {in_contexts}",
+                                            (owl_members, head, *contexts))]
+    return axioms
+
+
+def extract_emmo_module(emmo=None, filename: str = None, names: list = None) -> int:
+    """extracting the EMMO module required by the device ontology into an N-Triples file
+
+    :param emmo: loaded (full) EMMO ontology, only the triples of EMMO and its imports are extracted
+                 (use load_emmo() for an EMMO without the extension / device TBox entities)
+    :param filename: output N-Triples file
+    :param names: signature (EMMO labels), default: required_emmo_names()
+    :return: number of triples in the module
+    """
+    names = names if names is not None else required_emmo_names()
+    world = emmo.world
+    contexts = emmo_contexts(emmo)
+
+    seeds = []
+    for name in names:
+        entity = getattr(emmo, name, None)
+        if entity is None:
+            logger.warning(f"EMMO module: '{name}' not found in EMMO")
+            continue
+        seeds.append(entity.storid)
+    closure = module_signature_closure(world, seeds, contexts)
+
+    # copying the triples of the closure into the module ontology of a fresh world
+    module_world = World()
+    module = module_world.get_ontology(emmo.base_iri)
+    c = module.graph.c
+    blank_nodes = {}
+
+    def translate(storid):
+        if storid < 0:
+            if storid not in blank_nodes:
+                blank_nodes[storid] = module_world.new_blank_node()
+            return blank_nodes[storid]
+        return module_world._abbreviate(world._unabbreviate(storid))
+
+    objs = []  # the ontology triple (module rdf:type owl:Ontology) is created by get_ontology()
+    datas = []
+    closure_list = list(closure)
+    in_contexts = f"c IN ({','.join('?' * len(contexts))})"
+    for i in range(0, len(closure_list), 500):
+        chunk = closure_list[i:i + 500]
+        placeholders = ','.join('?' * len(chunk))
+        objs += [(c, translate(s), translate(p), translate(o)) for s, p, o in world.graph.db.execute(
+            f"SELECT DISTINCT s, p, o FROM objs WHERE s IN ({placeholders}) AND {in_contexts}", chunk + contexts)
+            if o in closure or o < 0 or s < 0 or p == rdf_type]
+        datas += [(c, translate(s), translate(p), o, translate(d) if isinstance(d, int) and d > 0 else d)
+                  for s, p, o, d in world.graph.db.execute(
+                      f"SELECT DISTINCT s, p, o, d FROM datas WHERE s IN ({placeholders}) AND {in_contexts}",
+                      chunk + contexts)]
+
+    module_world.graph.db.executemany("INSERT OR IGNORE INTO objs (c, s, p, o) VALUES (?, ?, ?, ?)", objs)
+    module_world.graph.db.executemany("INSERT OR IGNORE INTO datas (c, s, p, o, d) VALUES (?, ?, ?, ?, ?)", datas)
+    save_ntriples(module, filename)
+    logger.info(f"EMMO module: {len(closure)} entities, {len(objs) + len(datas)} triples -> {filename}")
+    return len(objs) + len(datas)
+
+
+def entity_axioms(entity) -> set:
+    """axioms of a named entity as comparable strings:
+    ancestors, disjoint entities, domains and ranges (properties)"""
+    axioms = set()
+    if hasattr(entity, 'ancestors'):  # not for individuals, e.g. units modelled as individuals
+        axioms |= {f"ancestor {ancestor.iri}" for ancestor in entity.ancestors() if ancestor is not entity}
+    if hasattr(entity, 'disjoints'):
+        axioms |= {f"disjoint {other.iri}" for disjoint in entity.disjoints() for other in disjoint.entities
+                   if other is not entity and hasattr(other, 'iri')}
+    if isinstance(entity, PropertyClass):
+        axioms |= {f"domain {value.iri}" for value in entity.domain if hasattr(value, 'iri')}
+        axioms |= {f"range {value.iri}" for value in entity.range if hasattr(value, 'iri')}
+    return axioms
+
+
+def verify_emmo_module(emmo=None, emmo_module=None, names: list = None) -> dict:
+    """verifying that the module preserves the axioms of the signature and of all module properties:
+    class hierarchy, disjointness, domains and ranges
+
+    :param emmo: full EMMO ontology
+    :param emmo_module: ontology loaded from the extracted module
+    :return: dict name: set of missing axioms ('ancestor <iri>', 'disjoint <iri>', 'domain <iri>', 'range <iri>')
+             or {'<missing>'}, empty dict if the module is complete
+    """
+    names = names if names is not None else required_emmo_names()
+    pairs = [(name, getattr(emmo, name, None), getattr(emmo_module, name, None)) for name in names]
+    pairs += [(prop.name, emmo.world[prop.iri], prop) for prop in emmo_module.properties()]
+    missing = {}
+    for name, entity, module_entity in pairs:
+        if entity is None:
+            continue
+        if module_entity is None:
+            missing[name] = {'<missing>'}
+            continue
+        missing_axioms = entity_axioms(entity) - entity_axioms(module_entity)
+        if missing_axioms:
+            missing[name] = missing_axioms
+    if missing:
+        logger.error(f"EMMO module incomplete: {missing}")
+    return missing
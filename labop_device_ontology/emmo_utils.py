@@ -7,12 +7,13 @@
 :details:  ontology definition helper functions.
 
 .. note:: -
-.. todo:: - 
+.. todo:: -
 ________________________________________________________________________
 """
 
 import owlready2
 
+
 def en(s):
     """Returns `s` as an English location string."""
     return owlready2.locstr(s, lang='en')
@@ -20,4 +21,26 @@ def en(s):
 
 def pl(s):
     """Returns `s` as a plain literal string."""
-    return owlready2.locstr(s, lang='')
\ No newline at end of file
+    return owlready2.locstr(s, lang='')
+
+
+def sync_python_names(ontology) -> None:
+    """ontology.sync_python_names() with plain string python names
+
+    EMMOntoPy takes the python names from the (language tagged) prefLabels, owlready2 then
+    registers the properties under the locstr, so that they are not found by name (cls.elucidation).
+    """
+    ontology.sync_python_names()
+    for name, prop in list(ontology.world._props.items()):
+        if isinstance(name, owlready2.locstr):
+            prop.python_name = str(name)
+
+
+def save_ntriples(ontology, filename: str) -> None:
+    """saving the triples of an ontology as N-Triples file
+
+    EMMOntoPy's Ontology.save hands ontologies without an IRI (e.g. created by get_ontology()
+    and filled via the quadstore) to owlready2 with the format 'nt', that owlready2 does not
+    write, so owlready2's own save is used.
+    """
+    owlready2.Ontology.save(ontology, filename, format='ntriples')
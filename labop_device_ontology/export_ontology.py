@@ -16,94 +16,174 @@ ________________________________________________________________________
 """
 
 import os
-import logging
+import re
 import rdflib
 
 from labop_device_ontology import __author__, __contributors__, __version__  # Version of this ontology
-from labop_device_ontology.emmo_utils import en, pl
-
-def export_ontology(ontology = None, path: str = None, 
-                    onto_base_filename: str = None, 
-                    format='owl', emmo_url: str = "http://emmo.info/emmo#") -> None:
-        """Export/save the ontology to file.
-
-        :param filename: Filename to save the ontology to.
-        :param format: Format to save the ontology in [turtle, rdfxml, owlxml, ntriples, json-ld].
-
-        :TODO: add prefix mapping
-        """
-
-        # output_filename_base = os.path.join('..', 'ontologies', 'labop_device_tbox')
-        # self.lodev_owl_filename = f'{output_filename_base}-v{__version__}.owl'
-        # self.lodev_ttl_filename = f'{output_filename_base}-v{__version__}.ttl'
-
-        # ontology file ending dictionary, based on rdflib formats
-        onto_file_ending = { 'turtle': '.ttl', 'xml': '.rdf', 'owl': '.owl', 'ntriples': '.nt', 'json-ld': '.jsonld' }
-
-        onto_filename_full = os.path.join(path, onto_base_filename) + onto_file_ending[format]
-        
-        print("base / ver. iri: ---->", onto_filename_full, ontology.base_iri)
-
-        # Save new ontology as owl
-        ontology.sync_attributes(name_policy='uuid', 
-                                 class_docstring='elucidation',
-                                 name_prefix='labop_')
-        
-        version_iri = f"http://www.labop.org/{__version__}/{onto_base_filename}"
-
-        ontology.set_version(version_iri=version_iri)
-        ontology.dir_label = False
-
-        #! reactivate ontology.catalog_mappings[self.lodev_version_iri] = self.lodev_ttl_filename 
-
-        #################################################################
-        # Annotate the ontology metadata
-        #################################################################
-
-        ontology.metadata.abstract.append(en(
-                'An EMMO-based domain ontology for scientific device.'
-                'labop-device is released under the Creative Commons Attribution 4.0 '
-                'International license (CC BY 4.0).'))
-
-        ontology.metadata.title.append(en('LabOP-Device'))
-        ontology.metadata.creator.append(en(__author__))
-        ontology.metadata.contributor.append(en(__contributors__))
-        ontology.metadata.publisher.append(en(__author__))
-        ontology.metadata.license.append(en(
-            'https://creativecommons.org/licenses/by/4.0/legalcode'))
-        ontology.metadata.versionInfo.append(en(__version__))
-        ontology.metadata.comment.append(en(
-            'The EMMO requires FaCT++ reasoner plugin in order to visualize all'
-            'inferences and class hierarchy (ctrl+R hotkey in Protege).'))
-        ontology.metadata.comment.append(en(
-            'This ontology is generated with data from the EMMOntoPy Python package.'))
-        ontology.metadata.comment.append(en(
-            'Contacts:\n'
-            'mark doerr\n'
-            'University Greifswald\n'
-            'email: mark.doerr@suni-greifswald.de\n'
-            '\n'
-            ))
-        
-       
-        ontology.save(onto_filename_full, overwrite=True, format=format)
-        #olw.save(labop_measurement_owl_filename, overwrite=True)
-        #!write_catalog(self.lodev_tbox.catalog_mappings)
-        # olw.sync_reasoner()
-        # olw.save('olw-measurement-inferred.ttl', overwrite=True)
-        # ...and to the sqlite3 database.
-        # world.save()
-
-
-        # Manually change url of EMMO to `emmo_url` when importing it to make
-        # it resolvable without consulting the catalog file.  This makes it possible
-        # to open the ontology from url in Protege
-        
-        g = rdflib.Graph()
-        g.parse(onto_filename_full, format='turtle')
-        for s, p, o in g.triples(
-                (None, rdflib.URIRef('http://www.w3.org/2002/07/owl#imports'), None)):
-            if 'emmo-inferred' in o:
-                g.remove((s, p, o))
-                g.add((s, p, rdflib.URIRef(emmo_url)))
-        g.serialize(destination=onto_filename_full, format='turtle')
\ No newline at end of file
+from labop_device_ontology.emmo_utils import en
+from labop_device_ontology.iri_minting import IRIMinter
+
+OWL_VERSION_IRI = 'http://www.w3.org/2002/07/owl#versionIRI'
+
+# ontology file ending dictionary, based on rdflib formats
+onto_file_ending = {'turtle': '.ttl', 'xml': '.rdf', 'owl': '.owl', 'ntriples': '.nt', 'json-ld': '.jsonld'}
+
+# prefixes generated by owlready2 and rdflib for namespaces without prefix
+GENERATED_PREFIX_PATTERN = re.compile(r'ns\d+$')
+
+# rdflib serializer of each export format ('owl': RDF/XML)
+rdflib_format = {'turtle': 'turtle', 'xml': 'xml', 'owl': 'xml', 'ntriples': 'nt', 'json-ld': 'json-ld'}
+
+
+def rename_graph(graph: rdflib.Graph, iris: dict) -> rdflib.Graph:
+    """copy of an rdflib graph with renamed IRIs
+
+    :param iris: dict old IRI: new IRI
+    """
+    if not iris:
+        return graph
+
+    def rename(term):
+        if isinstance(term, rdflib.URIRef) and str(term) in iris:
+            return rdflib.URIRef(iris[str(term)])
+        return term
+
+    renamed = rdflib.Graph()
+    for prefix, namespace in graph.namespaces():
+        renamed.bind(prefix, namespace)
+    for s, p, o in graph:
+        renamed.add((rename(s), rename(p), rename(o)))
+    return renamed
+
+
+def sorted_generated_prefixes(graph: rdflib.Graph) -> rdflib.Graph:
+    """copy of an rdflib graph with the generated prefixes (ns1, ns2, ...) bound in the sorted order
+    of the namespaces of its predicates and classes (rdf:type objects)
+
+    owlready2 and rdflib generate these prefixes in the order they meet the namespaces,
+    which depends on the (hash seed dependent) order of the triples
+    """
+    sorted_graph = rdflib.Graph()
+    for prefix, namespace in graph.namespaces():
+        if not GENERATED_PREFIX_PATTERN.match(prefix):
+            sorted_graph.bind(prefix, namespace)
+    terms = set(graph.predicates()) | set(graph.objects(None, rdflib.RDF.type))
+    for term in sorted(term for term in terms if isinstance(term, rdflib.URIRef)):
+        try:
+            sorted_graph.namespace_manager.compute_qname(term)
+        except ValueError:  # IRIs, that can not be split into namespace and name
+            pass
+    sorted_graph += graph
+    return sorted_graph
+
+
+def sync_export_attributes(ontology) -> None:
+    """labels / elucidations of the entities, synced before the export names are minted
+    (name_policy=None instead of 'uuid': the names are minted deterministically, see IRIMinter.export_iris)"""
+    ontology.sync_attributes(name_policy=None,
+                             class_docstring='elucidation',
+                             name_prefix='labop_')
+
+
+def export_ontology(ontology=None, path: str = None,
+                    onto_base_filename: str = None,
+                    format='owl', emmo_url: str = "http://emmo.info/emmo#",
+                    snapshot_store=None, minter=None, minted_iris: dict = None) -> None:
+    """Export/save the ontology to file.
+
+    :param filename: Filename to save the ontology to.
+    :param format: Format to save the ontology in [turtle, rdfxml, owlxml, ntriples, json-ld].
+    :param snapshot_store: optional SnapshotStore, the exported graph is recorded as snapshot of this version
+    :param minter: IRIMinter for deterministic entity names, default: IRIMinter without persisted map
+    :param minted_iris: minted IRIs of all exported ontologies (see IRIMinter.export_iris),
+                        default: the minted IRIs of this ontology only
+
+    :TODO: add prefix mapping
+    """
+
+    # output_filename_base = os.path.join('..', 'ontologies', 'labop_device_tbox')
+    # self.lodev_owl_filename = f'{output_filename_base}-v{__version__}.owl'
+    # self.lodev_ttl_filename = f'{output_filename_base}-v{__version__}.ttl'
+
+    onto_filename_full = os.path.join(path, onto_base_filename) + onto_file_ending[format]
+
+    print("base / ver. iri: ---->", onto_filename_full, ontology.base_iri)
+
+    # Save new ontology as owl
+    # labels / elucidations are synced, entity names are minted deterministically
+    # (instead of name_policy='uuid'), so that repeated exports are identical -
+    # the minted names are only applied to the exported graph, not to the World
+    sync_export_attributes(ontology)
+    if minted_iris is None:
+        minter = minter if minter is not None else IRIMinter()
+        minted_iris = minter.entity_iris(ontology)
+
+    version_iri = f"http://www.labop.org/{__version__}/{onto_base_filename}"
+
+    def annotate(values, value):
+        if value not in values:
+            values.append(value)
+
+    # set_version requires a version of the ontology (versionInfo of new ontologies),
+    # the version IRI is not below the base IRI of EMMO, so versionInfo is not derived from it
+    annotate(ontology.metadata.versionInfo, en(__version__))
+    # the version IRI of an earlier export is replaced, its version can not be inferred from EMMO's base IRI
+    ontology._del_obj_triple_spo(s=ontology.storid, p=ontology._abbreviate(OWL_VERSION_IRI))
+    ontology.set_version(version_iri=version_iri, set_priorVersion=False, set_versionInfo=False)
+    ontology.dir_label = False
+
+    # ! reactivate ontology.catalog_mappings[self.lodev_version_iri] = self.lodev_ttl_filename
+
+    #################################################################
+    # Annotate the ontology metadata
+    #################################################################
+
+    annotate(ontology.metadata.abstract, en(
+        'An EMMO-based domain ontology for scientific device.'
+        'labop-device is released under the Creative Commons Attribution 4.0 '
+        'International license (CC BY 4.0).'))
+
+    annotate(ontology.metadata.title, en('LabOP-Device'))
+    annotate(ontology.metadata.creator, en(__author__))
+    annotate(ontology.metadata.contributor, en(__contributors__))
+    annotate(ontology.metadata.publisher, en(__author__))
+    annotate(ontology.metadata.license, en(
+        'https://creativecommons.org/licenses/by/4.0/legalcode'))
+    annotate(ontology.metadata.comment, en(
+        'The EMMO requires FaCT++ reasoner plugin in order to visualize all'
+        'inferences and class hierarchy (ctrl+R hotkey in Protege).'))
+    annotate(ontology.metadata.comment, en(
+        'This ontology is generated with data from the EMMOntoPy Python package.'))
+    annotate(ontology.metadata.comment, en(
+        'Contacts:\n'
+        'mark doerr\n'
+        'University Greifswald\n'
+        'email: mark.doerr@suni-greifswald.de\n'
+        '\n'))
+
+    # saved as turtle, re-read and serialized in the export format below
+    # (EMMOntoPy writes empty 'owl' / 'ntriples' files of ontologies loaded into the quadstore)
+    ontology.save(onto_filename_full, overwrite=True, format='turtle')
+    # olw.save(labop_measurement_owl_filename, overwrite=True)
+    # !write_catalog(self.lodev_tbox.catalog_mappings)
+    # olw.sync_reasoner()
+    # olw.save('olw-measurement-inferred.ttl', overwrite=True)
+    # ...and to the sqlite3 database.
+    # world.save()
+
+    # Manually change url of EMMO to `emmo_url` when importing it to make
+    # it resolvable without consulting the catalog file.  This makes it possible
+    # to open the ontology from url in Protege
+
+    g = rdflib.Graph()
+    g.parse(onto_filename_full, format='turtle')
+    for s, p, o in g.triples(
+            (None, rdflib.URIRef('http://www.w3.org/2002/07/owl#imports'), None)):
+        if 'emmo-inferred' in o:
+            g.remove((s, p, o))
+            g.add((s, p, rdflib.URIRef(emmo_url)))
+    g = sorted_generated_prefixes(rename_graph(g, minted_iris))
+    g.serialize(destination=onto_filename_full, format=rdflib_format[format], encoding='utf-8')
+
+    if snapshot_store is not None:
+        snapshot_store.record(version=__version__, ontology_name=onto_base_filename, graph=g)
@@ -0,0 +1,224 @@
+"""_____________________________________________________________________
+
+:PROJECT: LabOP Device Ontology
+
+* Catalogue version federation *
+
+:details:  several catalogue releases served from one World with one EMMO.
+
+           Earlier releases are loaded from their exported TBox / ABox files into the
+           World of the current LabwareInterface. Their LabOP IRIs are moved into a
+           versioned namespace (http://www.labop.org/<version>/..., the same scheme as
+           the version IRIs of the exports), so all releases coexist next to each other
+           and share the EMMO ontology (and the EMMO extension) of the World.
+           An additional release costs all triples of its exported TBox and ABox
+           (plus one owl:imports of EMMO per ontology), not a delta to the current
+           release: the exports of a release are as large as the release itself
+           (200 synthetic devices: 17225 triples current, 17227 loaded export),
+           only EMMO and the EMMO extension are shared (see version_sizes).
+
+           Exports mint the names of the TBox entities (labop_<hash>, see
+           IRIMinter.entity_iris). They get their stable names back from their prefLabels
+           when they are loaded, so a release is queried like the current one:
+           lodev:hasNumWells in SPARQL and device records by property name.
+           Names minted for the EMMO extension (e.g. units) are mapped to the shared
+           extension entities of the World.
+
+           Queries are routed by version to a query planner, that knows the namespace
+           of the release (prefix lodev:). The planner of an earlier release only matches
+           the triples of its own ontologies, the planner of the current release none of the
+           earlier releases, so also shared, unversioned predicates (e.g. rdfs:label) are not
+           joined across releases. Queries, that the planners pass to the SPARQL engine of
+           owlready2, are not restricted to a release.
+
+.. note:: the EMMO extension of the current release is shared by all versions.
+          Deviation from the "one EMMO plus N small deltas" goal: a release is stored as a
+          full copy of its exports (see above), not as the triples changed against the
+          current release - its IRIs are moved into the version namespace, so no triple
+          is shared with the current release, and a delta store would need an overlay
+          query layer on top of the owlready2 World.
+.. todo:: -
+________________________________________________________________________
+"""
+
+import io
+import re
+import logging
+from collections import namedtuple
+
+import rdflib
+from rdflib.namespace import OWL, RDF, SKOS
+
+from labop_device_ontology import __version__
+from labop_device_ontology.iri_minting import stable_name, entity_key
+from labop_device_ontology.query_planner import DeviceQueryPlanner
+from labop_device_ontology.tbox_schema import read_device_records
+
+logger = logging.getLogger(__name__)
+
+LABOP_NAMESPACE = 'http://www.labop.org/'
+
+# IRIs, that already contain a version, e.g. the version IRIs of the exported ontologies
+VERSIONED_PATTERN = re.compile(r'\d+(\.\d+)*/')
+
+CatalogueVersion = namedtuple('CatalogueVersion', ['version', 'ontologies', 'tbox', 'planner'])
+
+
+def versioned_iri(iri: str, version: str) -> str:
+    """IRI in the namespace of a catalogue version, non LabOP IRIs are unchanged"""
+    if not iri.startswith(LABOP_NAMESPACE):
+        return iri
+    local = iri[len(LABOP_NAMESPACE):]
+    if VERSIONED_PATTERN.match(local):
+        return iri
+    return f"{LABOP_NAMESPACE}{version}/{local}"
+
+
+def load_graph(filename: str, format: str = None) -> rdflib.Graph:
+    """graph of an exported file, the rdflib format defaults to the one of the file ending"""
+    graph = rdflib.Graph()
+    graph.parse(filename, format=format or rdflib.util.guess_format(filename))
+    return graph
+
+
+def stable_entity_iris(graph: rdflib.Graph) -> dict:
+    """IRIs with the stable (prefLabel) names of the entities, whose names were minted by the export
+
+    :return: dict minted IRI: IRI with the prefLabel as name
+    """
+    iris = {}
+    for entity, label in graph.subject_objects(SKOS.prefLabel):
+        iri = str(entity)
+        namespace = iri[:max(iri.rfind('#'), iri.rfind('/')) + 1]
+        # only names minted from this label, not e.g. devices with a label
+        if iri == namespace + stable_name(entity_key(namespace, str(label))):
+            iris[iri] = namespace + str(label)
+    return iris
+
+
+def versioned_graph(graph: rdflib.Graph, version: str, stable_iris: dict = None) -> rdflib.Graph:
+    """exported ontology with all LabOP IRIs moved into the version namespace,
+    imports of non LabOP ontologies (EMMO) are removed - they are provided by the World
+
+    :param stable_iris: minted IRI: stable IRI (see stable_entity_iris)
+    """
+    stable_iris = stable_iris or {}
+
+    def rewrite(term):
+        if isinstance(term, rdflib.URIRef):
+            return rdflib.URIRef(versioned_iri(stable_iris.get(str(term), str(term)), version))
+        return term
+
+    versioned = rdflib.Graph()
+    for s, p, o in graph:
+        if p == OWL.imports and not str(o).startswith(LABOP_NAMESPACE):
+            continue
+        versioned.add((rewrite(s), rewrite(p), rewrite(o)))
+    return versioned
+
+
+class CatalogueFederation:
+    def __init__(self, lodev=None) -> None:
+        """Catalogue versions sharing the World (and EMMO) of a LabwareInterface
+
+        :param lodev: LabwareInterface of the current release
+        """
+        self.lodev = lodev
+        self.versions = {__version__: CatalogueVersion(
+            version=__version__, ontologies=[lodev.lodev_tbox.lodevt, lodev.lodev_abox.lodeva],
+            tbox=lodev.lodev_tbox.lodevt, planner=lodev.query_planner)}
+
+    def add_version(self, version: str, tbox_filename: str, abox_filenames: list = None,
+                    format: str = None) -> CatalogueVersion:
+        """loading an earlier release from its exported files
+
+        :param tbox_filename: exported TBox of the release
+        :param abox_filenames: exported ABox (or ABox partition) files of the release
+        :param format: rdflib format of the files, default: from the file endings
+        """
+        if version in self.versions:
+            raise ValueError(f"catalogue version {version} is already loaded")
+        world = self.lodev.emmo_world
+        filenames = [tbox_filename] + list(abox_filenames or [])
+        graphs = [load_graph(filename, format=format) for filename in filenames]
+        # the ABoxes refer to the TBox entities by their (minted) TBox IRIs,
+        # and to the shared EMMO extension (e.g. units) by the names minted for its entities
+        stable_iris = stable_entity_iris(graphs[0])
+        stable_iris.update(self.shared_entity_iris())
+        ontologies = []
+        for filename, graph in zip(filenames, graphs):
+            graph = versioned_graph(graph, version, stable_iris)
+            ontology_iri = next(graph.subjects(RDF.type, OWL.Ontology), None)
+            if ontology_iri is None:
+                raise ValueError(f"{filename} does not contain an ontology declaration")
+            ontology = world.get_ontology(str(ontology_iri))
+            ontology.load(fileobj=io.BytesIO(graph.serialize(format='nt', encoding='utf-8')), format='ntriples')
+            if self.lodev.emmo not in ontology.imported_ontologies:
+                ontology.imported_ontologies.append(self.lodev.emmo)
+            ontologies.append(ontology)
+            logger.info(f"catalogue version {version}: {len(graph)} triples from {filename}")
+
+        planner = DeviceQueryPlanner(emmo_world=world, prefixes={'lodev': ontologies[0].base_iri}, create_index=False)
+        planner.set_contexts(contexts=[ontology.graph.c for ontology in ontologies])
+        self.versions[version] = CatalogueVersion(version=version, ontologies=ontologies, tbox=ontologies[0],
+                                                  planner=planner)
+        self._exclude_earlier_versions()
+        return self.versions[version]
+
+    def _exclude_earlier_versions(self) -> None:
+        """the planner of the current release does not match the triples of the earlier releases"""
+        self.get().planner.set_contexts(excluded_contexts=[
+            ontology.graph.c for version, catalogue_version in self.versions.items() if version != __version__
+            for ontology in catalogue_version.ontologies])
+
+    def shared_entity_iris(self) -> dict:
+        """IRIs of the EMMO extension entities of the World, by the names minted for them in exports
+
+        :return: dict minted IRI: IRI
+        """
+        return {minted_iri: iri for iri, minted_iri in self.lodev.iri_minter.entity_iris(self.lodev.emmo).items()}
+
+    def remove_version(self, version: str) -> None:
+        """removing an earlier release from the World"""
+        if version == __version__:
+            raise ValueError("the current catalogue version can not be removed")
+        world = self.lodev.emmo_world
+        for ontology in reversed(self.get(version).ontologies):
+            ontology.destroy()
+            # owlready2 keeps the subgraph of destroyed ontologies, a reloaded version would be compared to them
+            world.graph.onto_2_subgraph.pop(ontology, None)
+        del self.versions[version]
+        self._exclude_earlier_versions()
+
+    def get(self, version: str = None) -> CatalogueVersion:
+        """catalogue version, default: current release"""
+        version = version or __version__
+        if version not in self.versions:
+            raise ValueError(f"unknown catalogue version {version}, loaded versions: {', '.join(self.versions)}")
+        return self.versions[version]
+
+    # --- version routed queries
+
+    def query(self, sparql: str, version: str = None, raw: bool = False) -> list:
+        """SPARQL query against one catalogue version (prefix lodev: is the TBox of the version)"""
+        return self.get(version).planner.query(sparql, raw=raw)
+
+    def device_records(self, version: str = None, subject_storids=None) -> dict:
+        """device records of one catalogue version (see read_device_records)"""
+        catalogue_version = self.get(version)
+        return read_device_records(emmo_world=self.lodev.emmo_world, ontology=catalogue_version.tbox,
+                                   subject_storids=subject_storids, emmo=self.lodev.lodev_tbox.emmo)
+
+    def version_sizes(self) -> dict:
+        """number of triples of each catalogue version (without the shared EMMO)"""
+        db = self.lodev.emmo_world.graph.db
+        sizes = {}
+        for version, catalogue_version in self.versions.items():
+            ontologies = list(catalogue_version.ontologies)
+            if version == __version__ and self.lodev.abox_partitions is not None:
+                ontologies += list(self.lodev.abox_partitions.loaded.values())
+            contexts = [ontology.graph.c for ontology in ontologies]
+            placeholders = ','.join('?' * len(contexts))
+            sizes[version] = sum(db.execute(f"SELECT COUNT(*) FROM {table} WHERE c IN ({placeholders})",
+                                            contexts).fetchone()[0] for table in ('objs', 'datas'))
+        return sizes
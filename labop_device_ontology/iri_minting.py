@@ -0,0 +1,191 @@
+"""_____________________________________________________________________
+
+:PROJECT: LabOP Device Ontology
+
+* Deterministic IRI minting *
+
+:details:  stable entity names derived from hashes of stable keys.
+
+           individuals (devices):  key = vendor + product ID
+           TBox entities:          key = ontology base IRI + schema / label name
+
+           name = <prefix><first 24 hex digits of sha1(key)>
+
+           Repeated exports therefore produce identical IRIs and parallel importers mint
+           the same IRIs without coordination. The (namespace, key) <-> IRI map can be
+           persisted in a SQLite table (World database or separate file), lookups are
+           cached in memory.
+
+           TBox entity names are only minted in the exported files (see export_iris:
+           one map over all exported ontologies, so that the files reference each other
+           consistently), the entities of the World keep their (python) names.
+           EMMO entities have stable UUID names (EMMO_<uuid>) and are never renamed.
+
+.. note:: -
+.. todo:: -
+________________________________________________________________________
+"""
+
+import re
+import sqlite3
+import hashlib
+import logging
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PREFIX = 'labop_'
+HASH_DIGITS = 24
+
+# stable names of EMMO entities
+EMMO_NAME_PATTERN = re.compile(r'EMMO_[0-9a-f]{8}_[0-9a-f]{4}_[0-9a-f]{4}_[0-9a-f]{4}_[0-9a-f]{12}$')
+
+
+@lru_cache(maxsize=2 ** 16)
+def stable_name(key: str, prefix: str = DEFAULT_PREFIX) -> str:
+    """deterministic entity name of a key"""
+    return prefix + hashlib.sha1(key.encode('utf-8')).hexdigest()[:HASH_DIGITS]
+
+
+# values of empty catalogue cells, not used for device keys
+EMPTY_KEY_VALUES = ('', 'N/A')
+
+
+def _first_key_value(row: dict, names: tuple) -> str:
+    """first non-empty (stripped) value of the alternative columns, '' if there is none"""
+    for name in names:
+        value = str(row.get(name) or '').strip()
+        if value not in EMPTY_KEY_VALUES:
+            return value
+    return ''
+
+
+def device_key(row: dict) -> str:
+    """stable key of a device (catalogue row or dict of properties): vendor + product ID,
+    all values as fallback"""
+    product_id = _first_key_value(row, ('hasVendorProductID', 'hasProductID'))
+    if product_id:
+        return f"{_first_key_value(row, ('hasVendorName', 'hasManufacturer')).lower()}|{product_id.lower()}"
+    return '|'.join(f"{k}={v}" for k, v in sorted(row.items()))
+
+
+def entity_key(base_iri: str, name: str) -> str:
+    """stable key of a TBox entity"""
+    return f"entity|{base_iri}|{name}"
+
+
+class IRIMinter:
+    def __init__(self, emmo_world=None, map_filename: str = None, prefix: str = DEFAULT_PREFIX) -> None:
+        """Deterministic IRI minting service with optional persisted (namespace, key) <-> IRI map
+
+        :param emmo_world: owlready2 World, the map is stored in its database
+        :param map_filename: separate SQLite file for the map (used instead of the World database)
+        """
+        self.prefix = prefix
+        self.name_pattern = re.compile(re.escape(prefix) + r'[0-9a-f]{%d}$' % HASH_DIGITS)
+        self.db = None
+        if map_filename is not None:
+            self.db = sqlite3.connect(map_filename, isolation_level=None, check_same_thread=False)
+        elif emmo_world is not None:
+            self.db = emmo_world.graph.db
+        if self.db is not None:
+            self._create_table()
+        self._cache = {}  # (namespace, key): iri
+
+    def _create_table(self) -> None:
+        self.db.execute("CREATE TABLE IF NOT EXISTS lodev_iri_map "
+                        "(namespace TEXT NOT NULL, key TEXT NOT NULL, iri TEXT NOT NULL, PRIMARY KEY (namespace, key))")
+        self.db.execute("CREATE INDEX IF NOT EXISTS lodev_iri_map_iri ON lodev_iri_map(iri)")
+
+    def _record(self, entries: list) -> None:
+        if self.db is not None and entries:
+            self.db.executemany("INSERT OR REPLACE INTO lodev_iri_map (namespace, key, iri) VALUES (?, ?, ?)", entries)
+
+    def mint(self, namespace_iri: str, key: str) -> str:
+        """IRI of a key in a namespace, recorded in the map"""
+        return self.mint_many(namespace_iri, [key])[0]
+
+    def mint_many(self, namespace_iri: str, keys) -> list:
+        """IRIs of many keys in a namespace, recorded in the map with one batch insert"""
+        new_entries = []
+        iris = []
+        for key in keys:
+            iri = self._cache.get((namespace_iri, key))
+            if iri is None:
+                iri = self._cache[namespace_iri, key] = namespace_iri + stable_name(key, self.prefix)
+                new_entries.append((namespace_iri, key, iri))
+            iris.append(iri)
+        self._record(new_entries)
+        return iris
+
+    def mint_device(self, namespace_iri: str, row: dict) -> str:
+        return self.mint(namespace_iri, device_key(row))
+
+    def mint_devices(self, namespace_iri: str, rows) -> list:
+        """IRIs of many devices, recorded in the map with one batch insert"""
+        return self.mint_many(namespace_iri, (device_key(row) for row in rows))
+
+    def mint_entity(self, namespace_iri: str, name: str) -> str:
+        return self.mint(namespace_iri, entity_key(namespace_iri, name))
+
+    def resolve(self, namespace_iri: str, key: str) -> str:
+        """IRI of a recorded key in a namespace, None if unknown"""
+        iri = self._cache.get((namespace_iri, key))
+        if iri is None and self.db is not None:
+            row = self.db.execute("SELECT iri FROM lodev_iri_map WHERE namespace = ? AND key = ?",
+                                  (namespace_iri, key)).fetchone()
+            if row is not None:
+                iri = self._cache[namespace_iri, key] = row[0]
+        return iri
+
+    def key_of(self, iri: str) -> str:
+        """recorded key of an IRI, None if unknown"""
+        if self.db is None:
+            return next((key for (_, key), cached_iri in self._cache.items() if cached_iri == iri), None)
+        row = self.db.execute("SELECT key FROM lodev_iri_map WHERE iri = ?", (iri,)).fetchone()
+        return row[0] if row is not None else None
+
+    def clear_cache(self) -> None:
+        """dropping the in-memory lookups, e.g. after a rollback of the World database"""
+        self._cache.clear()
+
+    def is_minted(self, name: str) -> bool:
+        """name has the form of a minted name"""
+        return bool(self.name_pattern.match(name))
+
+    def is_stable(self, name: str) -> bool:
+        """name is minted or an EMMO UUID name"""
+        return self.is_minted(name) or bool(EMMO_NAME_PATTERN.match(name))
+
+    def entity_iris(self, ontology) -> dict:
+        """minted IRIs of all not yet minted entities in the namespace of an ontology, for the export
+        (replaces the random 'uuid' name policy of sync_attributes),
+        the entities of the World keep their names, so that lookups by name keep working
+
+        the key is the first prefLabel (set by sync_attributes from the python name) or the name,
+        all new map entries of the ontology are recorded with one batch insert
+
+        :return: dict current IRI: minted IRI
+        """
+        entities = []
+        keys = []
+        for entity in ontology.get_entities():
+            if (entity.namespace.ontology is not ontology or not entity.iri.startswith(ontology.base_iri)
+                    or self.is_stable(entity.name)):
+                continue  # imported, foreign vocabulary (e.g. skos:prefLabel), already minted or EMMO
+            labels = getattr(entity, 'prefLabel', None) or []
+            entities.append(entity)
+            keys.append(entity_key(ontology.base_iri, str(labels[0]) if labels else entity.name))
+        iris = self.mint_many(ontology.base_iri, keys)
+        return {entity.iri: iri for entity, iri in zip(entities, iris) if entity.iri != iri}
+
+    def export_iris(self, ontologies: list) -> dict:
+        """one map of minted IRIs of all entities of the exported ontologies (TBoxes first),
+        applied to every exported graph, so that the ABox files reference the minted TBox names
+
+        :return: dict current IRI: minted IRI
+        """
+        iris = {}
+        for ontology in ontologies:
+            iris.update(self.entity_iris(ontology))
+        return iris
@@ -0,0 +1,285 @@
+"""_____________________________________________________________________
+
+:PROJECT: LabOP Device Ontology
+
+* Background jobs *
+
+:details:  asynchronous, cancellable import, classification and export jobs.
+
+           Jobs run in a worker thread (one at a time, the World is not shared between
+           concurrent writers), the heavy CSV conversion of an import runs in the worker
+           processes of the parallel importer.
+           A job holds the World lock of the LabwareInterface (lodev.world_lock) for its
+           whole run, so writes of other threads wait for the job instead of becoming part
+           of its savepoint (and of its rollback). The writing methods of the LabwareInterface
+           take the lock, direct writes (owlready2 entities, SQL) of other threads have to
+           hold it: with lodev.world_lock: ... Jobs can be awaited from asyncio
+           (await job) or waited for from synchronous code (job.wait()).
+
+           Progress (rows processed, triples written, ETA) is reported by the progress
+           callback of the parallel importer. A cancelled import raises JobCancelled at the
+           next progress report before its triples are written, the partially imported
+           ABox is rolled back to the savepoint taken at the start of the job and the
+           in-memory caches of the LabwareInterface are reset. Once the triples are
+           written, the import is completed and a late cancel is ignored.
+
+           With a status file, the runner writes the status of all jobs as JSON on every
+           change, read_status reads it from another process (CLI: --job-status).
+
+           runner = JobRunner(lodev)
+           job = runner.submit_import('catalogue.csv', processes=8)
+           ...
+           print(job.status())
+           job.cancel()
+
+.. note:: export and classification jobs can only be cancelled before they start,
+          import jobs do not use bulk loading (it commits the open transaction)
+.. todo:: -
+________________________________________________________________________
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+import itertools
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+JOB_STATES = ('pending', 'running', 'done', 'failed', 'cancelled')
+
+JobStatus = namedtuple('JobStatus', ['job_id', 'kind', 'state', 'rows', 'total_rows', 'triples', 'elapsed', 'eta',
+                                     'error'])
+
+
+class JobCancelled(Exception):
+    """raised inside a job, when it is cancelled"""
+
+
+def status_line(status: JobStatus) -> str:
+    """one line summary of a job status"""
+    line = f"job {status.job_id} ({status.kind}): {status.state}, {status.rows}"
+    if status.total_rows:
+        line += f"/{status.total_rows}"
+    line += f" rows, {status.triples} triples"
+    if status.eta is not None:
+        line += f", ETA {status.eta:.0f} s"
+    if status.error:
+        line += f", error: {status.error}"
+    return line
+
+
+def write_status(status_filename: str, statuses: list) -> None:
+    """writing job statuses as JSON, replaced atomically (readers never see a partial file)"""
+    tmp_filename = status_filename + '.tmp'
+    with open(tmp_filename, 'w', encoding='utf-8') as status_file:
+        json.dump([status._asdict() for status in statuses], status_file)
+    os.replace(tmp_filename, status_filename)
+
+
+def read_status(status_filename: str) -> list:
+    """job statuses written by a JobRunner with status_filename"""
+    with open(status_filename, encoding='utf-8') as status_file:
+        return [JobStatus(**status) for status in json.load(status_file)]
+
+
+def count_catalogue_rows(csv_filename: str) -> int:
+    """number of data rows of a catalogue (lines without header), used for the ETA"""
+    with open(csv_filename, 'rb') as csv_file:
+        return max(sum(1 for _ in csv_file) - 1, 0)
+
+
+class Job:
+    def __init__(self, job_id: int = None, kind: str = None, total_rows: int = None) -> None:
+        """Background job with progress and cancellation
+
+        :param kind: 'import', 'classify' or 'export'
+        :param total_rows: expected number of rows, for the ETA
+        """
+        self.job_id = job_id
+        self.kind = kind
+        self.state = 'pending'
+        self.total_rows = total_rows
+        self.rows = 0
+        self.triples = 0
+        self.started = None
+        self.finished = None
+        self.error = None
+        self.future = None
+        self.on_change = None  # optional callback on_change(job)
+        self._cancel = threading.Event()
+
+    # --- progress / cancellation, called from the job
+
+    def progress(self, rows_processed: int, triples_written: int) -> None:
+        """progress callback (see import_csv_parallel), raises JobCancelled after cancel(),
+        as long as no triples are written (the final report after the write does not cancel)"""
+        self.rows = rows_processed
+        self.triples = triples_written
+        self.changed()
+        if not triples_written:
+            self.check_cancelled()
+
+    def check_cancelled(self) -> None:
+        if self._cancel.is_set():
+            raise JobCancelled(f"job {self.job_id} cancelled")
+
+    def changed(self) -> None:
+        if self.on_change is not None:
+            self.on_change(self)
+
+    # --- control / status
+
+    def cancel(self) -> bool:
+        """requesting cancellation
+
+        :return: False, if the job is already finished
+        """
+        if self.state in ('done', 'failed', 'cancelled'):
+            return False
+        self._cancel.set()
+        if self.future is not None and self.future.cancel():
+            self.state = 'cancelled'
+            self.changed()
+        return True
+
+    def done(self) -> bool:
+        return self.state in ('done', 'failed', 'cancelled')
+
+    def eta(self) -> float:
+        """estimated remaining time in seconds, None if unknown"""
+        if self.state != 'running' or not self.total_rows or not self.rows:
+            return None
+        elapsed = time.monotonic() - self.started
+        return elapsed * (self.total_rows - self.rows) / self.rows
+
+    def status(self) -> JobStatus:
+        elapsed = None
+        if self.started is not None:
+            elapsed = (self.finished or time.monotonic()) - self.started
+        return JobStatus(job_id=self.job_id, kind=self.kind, state=self.state, rows=self.rows,
+                         total_rows=self.total_rows, triples=self.triples, elapsed=elapsed, eta=self.eta(),
+                         error=str(self.error) if self.error is not None else None)
+
+    def status_line(self) -> str:
+        return status_line(self.status())
+
+    def wait(self, timeout: float = None):
+        """waiting for the job
+
+        :return: result of the job
+        """
+        return self.future.result(timeout=timeout)
+
+    def __await__(self):
+        return asyncio.wrap_future(self.future).__await__()
+
+
+class JobRunner:
+    def __init__(self, lodev=None, status_filename: str = None) -> None:
+        """Runner of background jobs on a LabwareInterface
+
+        :param lodev: LabwareInterface
+        :param status_filename: optional JSON file, the status of all jobs is written to on every change
+        """
+        self.lodev = lodev
+        self.status_filename = status_filename
+        self._status_lock = threading.Lock()  # status changes are reported from the job and the caller thread
+        self.jobs = {}  # job id: Job
+        self._job_ids = itertools.count(1)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='lodev-job')
+
+    def _submit(self, kind: str, function, total_rows: int = None, rollback: bool = False) -> Job:
+        job = Job(job_id=next(self._job_ids), kind=kind, total_rows=total_rows)
+        self.jobs[job.job_id] = job
+        if self.status_filename is not None:
+            job.on_change = self._write_status
+        job.future = self._executor.submit(self._run, job, function, rollback)
+        job.changed()
+        return job
+
+    def _write_status(self, job: Job = None) -> None:
+        with self._status_lock:
+            write_status(self.status_filename, self.status())
+
+    def _run(self, job: Job, function, rollback: bool):
+        if job._cancel.is_set():
+            job.state = 'cancelled'
+            job.changed()
+            raise JobCancelled(f"job {job.job_id} cancelled")
+        with self.lodev.world_lock:
+            job.state = 'running'
+            job.started = time.monotonic()
+            job.changed()
+            db = self.lodev.emmo_world.graph.db
+            savepoint = f"lodev_job_{job.job_id}"
+            try:
+                if rollback:
+                    db.execute(f"SAVEPOINT {savepoint}")
+                result = function(job)
+                if rollback:
+                    db.execute(f"RELEASE SAVEPOINT {savepoint}")
+                job.state = 'done'
+                return result
+            except BaseException as err:
+                if rollback:
+                    db.execute(f"ROLLBACK TO SAVEPOINT {savepoint}")
+                    db.execute(f"RELEASE SAVEPOINT {savepoint}")
+                    self.lodev.reset_caches()
+                job.state = 'cancelled' if isinstance(err, JobCancelled) else 'failed'
+                job.error = err
+                logger.info(f"job {job.job_id} ({job.kind}) {job.state}: {err}")
+                raise
+            finally:
+                job.finished = time.monotonic()
+                job.changed()
+
+    # --- jobs
+
+    def submit_import(self, csv_filename: str, processes: int = None, validate: bool = False) -> Job:
+        """importing a catalogue (see LabwareInterface.import_csv_parallel), rolled back on cancellation
+
+        :return: Job, its result is the list of imported device IRIs
+        """
+        def run(job):
+            partitions = self.lodev.abox_partitions
+            loaded_before = set(partitions.loaded) if partitions is not None else set()
+            try:
+                return self.lodev.import_csv_parallel(csv_filename, processes=processes, validate=validate,
+                                                      progress=job.progress)
+            except BaseException:
+                # partitions created by the job are rolled back with the database
+                if partitions is not None:
+                    for partition in set(partitions.loaded) - loaded_before:
+                        ontology = partitions.loaded.pop(partition)
+                        self.lodev.emmo_world.ontologies.pop(ontology.base_iri, None)
+                raise
+        return self._submit('import', run, total_rows=count_catalogue_rows(csv_filename), rollback=True)
+
+    def submit_classification(self) -> Job:
+        """classifying the ontologies with the reasoner (see LabwareInterface.classify)"""
+        def run(job):
+            return self.lodev.classify()
+        return self._submit('classify', run)
+
+    def submit_export(self, path: str = ".", format='owl', snapshot_dir: str = None) -> Job:
+        """exporting all ontologies (see LabwareInterface.export_ontologies)"""
+        def run(job):
+            return self.lodev.export_ontologies(path=path, format=format, snapshot_dir=snapshot_dir)
+        return self._submit('export', run)
+
+    # --- status
+
+    def status(self) -> list:
+        """JobStatus of all jobs"""
+        return [job.status() for job in self.jobs.values()]
+
+    def shutdown(self, cancel: bool = True) -> None:
+        if cancel:
+            for job in self.jobs.values():
+                job.cancel()
+        self._executor.shutdown(wait=True)
@@ -14,32 +14,73 @@ ________________________________________________________________________
 import os
 import pathlib
 import logging
+import threading
+import functools
 
 from ontopy import World
 from ontopy.utils import write_catalog
 
-from owlready2 import onto_path
+from owlready2 import onto_path, destroy_entity, sync_reasoner
 
 
 from labop_device_ontology.labop_device_ontology_interface import LOLabwareInterface
 from labop_device_ontology import __version__  # Version of this ontology
 
+from labop_device_ontology.emmo_utils import sync_python_names
 from labop_device_ontology.emmo_extension_tbox import EMMOExtensionTBox
-from labop_device_ontology.labware_tbox import LOLabwareTBox
-from labop_device_ontology.labware_abox import LOLabwareABox
+from labop_device_ontology.device_tbox import LOLabwareTBox
+from labop_device_ontology.device_abox import LOLabwareABox
 
-from labop_device_ontology.export_ontology import export_ontology
+from labop_device_ontology.export_ontology import export_ontology, sync_export_attributes
+from labop_device_ontology.device_search_index import DeviceSearchIndex
+from labop_device_ontology.code_hierarchy_index import CodeHierarchyIndex
+from labop_device_ontology.parallel_import import import_csv_parallel, quantity_individuals
+from labop_device_ontology.device_validation import DeviceValidator
+from labop_device_ontology.tbox_schema import read_device_records
+from labop_device_ontology.catalogue_snapshots import SnapshotStore
+from labop_device_ontology.change_feed import ChangeFeed
+from labop_device_ontology.abox_partitions import PartitionedABox
+from labop_device_ontology.device_serialization import DevicePayloadCache
+from labop_device_ontology import world_storage
+from labop_device_ontology.class_closure import ClassHierarchyClosure
+from labop_device_ontology.emmo_modules import extract_emmo_module, verify_emmo_module, load_emmo
+from labop_device_ontology.iri_minting import IRIMinter
+from labop_device_ontology.deck_layout import DeckLayoutSolver
+from labop_device_ontology.material_compatibility import CompatibilityMatrix
+from labop_device_ontology.low_memory import bound_entity_cache, memory_report, DEFAULT_MAX_ENTITIES
+from labop_device_ontology.query_planner import DeviceQueryPlanner
+from labop_device_ontology.federation import CatalogueFederation
 
 logger = logging.getLogger(__name__)
 
+
+def holding_world_lock(method):
+    """method of LabwareInterface, that writes to the World: runs while holding the World lock"""
+    @functools.wraps(method)
+    def locked(self, *args, **kwargs):
+        with self.world_lock:
+            return method(self, *args, **kwargs)
+    return locked
+
+
 class LabwareInterface(LOLabwareInterface):
     def __init__(self, db_path: str = None, 
                  db_name: str = None,
                  ontology_path: str = None,
                  emmo_filename: str = None,
                  lw_tbox_filename: str = None,
-                 lw_abox_filename: str = None) -> None:
+                 lw_abox_filename: str = None,
+                 emmo_module_filename: str = None,
+                 storage_profile: str = 'default',
+                 low_memory: bool = False,
+                 max_entities: int = DEFAULT_MAX_ENTITIES) -> None:
         """Implementation of the LOLabwareInterface
+
+        :param emmo_module_filename: extracted minimal EMMO module (see extract_emmo_module),
+                                     loaded instead of the full EMMO import closure
+        :param storage_profile: SQLite profile of the World database: 'default', 'bulk_load' or 'wal'
+        :param low_memory: bounded entity cache (max_entities, for all Worlds of the process, restored by close),
+                           interned literal strings, 'low_memory' storage profile (if no other profile is given)
         """
         db_name_full = None
 
@@ -78,19 +119,37 @@ class LabwareInterface(LOLabwareInterface):
             if not os.path.exists(db_path):
                 os.makedirs(db_path)
             db_name_full = os.path.join(db_path, db_name) 
+        # held by the writers of the World: jobs for their whole run, the methods marked holding_world_lock,
+        # other threads writing to the World directly have to hold it as well
+        self.world_lock = threading.RLock()
+
         if db_name_full is not None:
-            self.emmo_world = World(filename=db_name_full)
+            # owlready2 locks the database file exclusively, unless other processes read it concurrently (WAL)
+            self.emmo_world = World(filename=db_name_full, exclusive=storage_profile != 'wal')
         else:  # in memory SQLITE database
             self.emmo_world = World()
+        self.low_memory = low_memory
+        # previous size of owlready2's process wide entity ring buffer, restored by close
+        self._previous_entity_cache_size = None
+        if low_memory:
+            self._previous_entity_cache_size = bound_entity_cache(max_entities)
+            if storage_profile == 'default':
+                storage_profile = 'low_memory'
+        world_storage.apply_profile(self.emmo_world, storage_profile)
 
         # create EMMO ontology object 
         print("Loading EMMO ontology from: ", self.emmo_url, " ...")
-        if emmo_filename is not None and os.path.isfile(emmo_filename):
-            self.emmo = self.emmo_world.get_ontology(emmo_filename)
+        self.emmo_module_filename = emmo_module_filename
+        if emmo_module_filename is not None:
+            print("  using minimal EMMO module: ", emmo_module_filename)
+            self.emmo_source = emmo_module_filename
+        elif emmo_filename is not None and os.path.isfile(emmo_filename):
+            self.emmo_source = emmo_filename
         else:
-            self.emmo = self.emmo_world.get_ontology(self.emmo_url)
+            self.emmo_source = self.emmo_url
+        self.emmo = self.emmo_world.get_ontology(self.emmo_source)
         self.emmo.load()               # reload_if_newer = True
-        self.emmo.sync_python_names()  # synchronize annotations
+        sync_python_names(self.emmo)  # synchronize annotations
         self.emmo.base_iri = self.emmo.base_iri.rstrip('/#')
         self.catalog_mappings = {self.emmo.base_iri: self.emmo_url}
 
@@ -111,12 +170,277 @@ class LabwareInterface(LOLabwareInterface):
 
         #self.lodev.sync_python_names()
 
-    def export_ontologies(self, path: str = ".", format='owl') -> None:
-        """save all ontologies """
+        # log of device mutations for downstream caches
+        self.change_feed = ChangeFeed(emmo_world=self.emmo_world)
+
+        # full-text / code search index of the devices, stored next to the quadstore, updated by the change feed
+        self.search_index = DeviceSearchIndex(emmo_world=self.emmo_world, lw_tbox=self.lodev_tbox,
+                                              change_feed=self.change_feed)
+        # UNSPSC / eCl@ss classification browsing, updated by the change feed
+        self.code_index = CodeHierarchyIndex(emmo_world=self.emmo_world, lw_tbox=self.lodev_tbox,
+                                             change_feed=self.change_feed)
+        self.code_index.rebuild()
+
+        # pre-encoded JSON payloads of the devices for API responses, invalidated by the change feed
+        self.payload_cache = DevicePayloadCache(emmo_world=self.emmo_world, lw_tbox=self.lodev_tbox,
+                                                change_feed=self.change_feed)
+
+        # precomputed class hierarchy closure, built on first use (see class_hierarchy),
+        # rebuilt after devices of (lazily loaded) partitions or catalogue versions are added
+        self._class_hierarchy = None
+        self.change_feed.add_listener(self._reset_class_hierarchy)
+
+        # optional partitioning of the ABox by vendor, site or product type (see enable_partitioning)
+        self.abox_partitions = None
+
+        # deterministic entity IRIs, key <-> IRI map stored in the World database
+        self.iri_minter = IRIMinter(emmo_world=self.emmo_world)
+
+        # star pattern device searches compiled to SQL, other queries via world.sparql
+        self.query_planner = DeviceQueryPlanner(emmo_world=self.emmo_world,
+                                                prefixes={'lodev': self.lodev_tbox.lodevt.base_iri},
+                                                change_feed=self.change_feed)
+
+        # earlier catalogue releases served from the same World (see add_catalogue_version)
+        self.federation = CatalogueFederation(lodev=self)
+
+        # substance x device compatibility matrix, built on first use, rebuilt after device changes
+        self._material_compatibility = None
+        self.change_feed.add_listener(self._reset_material_compatibility)
+
+    def _reset_material_compatibility(self, events) -> None:
+        self._material_compatibility = None
+
+    def _reset_class_hierarchy(self, events) -> None:
+        self._class_hierarchy = None
+
+    @property
+    def class_hierarchy(self) -> ClassHierarchyClosure:
+        """transitive closure of the EMMO + device class hierarchy for O(1) subclass / instance tests"""
+        if self._class_hierarchy is None:
+            self._class_hierarchy = ClassHierarchyClosure(emmo_world=self.emmo_world)
+        return self._class_hierarchy
+
+    @property
+    def material_compatibility(self) -> CompatibilityMatrix:
+        """chemical resistance ratings of all devices, e.g. material_compatibility.compatible('acetone', iris)"""
+        if self._material_compatibility is None:
+            records = read_device_records(emmo_world=self.emmo_world, ontology=self.lodev_tbox.lodevt,
+                                          intern_strings=self.low_memory, emmo=self.lodev_tbox.emmo)
+            self._material_compatibility = CompatibilityMatrix(records=records)
+        return self._material_compatibility
+
+    def query(self, sparql: str, raw: bool = False) -> list:
+        """SPARQL query, star patterns over device properties are answered by the query planner
+        (prefix lodev: is predefined), of a partitioned ABox only the partitions of the query are loaded
+
+        :param raw: subjects as IRIs instead of entities (planner queries only)
+        """
+        if self.abox_partitions is not None:
+            with self.world_lock:  # loading partitions writes to the World
+                self.abox_partitions.load_query_partitions(sparql, prefixes=self.query_planner.prefixes)
+        return self.query_planner.query(sparql, raw=raw)
+
+    @holding_world_lock
+    def add_catalogue_version(self, version: str, tbox_filename: str, abox_filenames: list = None):
+        """serving an earlier catalogue release from its exported files next to the current one,
+        sharing the loaded EMMO (see federation.CatalogueFederation)"""
+        catalogue_version = self.federation.add_version(version, tbox_filename, abox_filenames)
+        self._class_hierarchy = None
+        return catalogue_version
+
+    @holding_world_lock
+    def remove_catalogue_version(self, version: str) -> None:
+        """removing an earlier catalogue release (see add_catalogue_version) from the World"""
+        self.federation.remove_version(version)
+        self._class_hierarchy = None
+        self.query_planner.invalidate()
+
+    def query_version(self, version: str, sparql: str, raw: bool = False) -> list:
+        """SPARQL query against one catalogue release (prefix lodev: is the TBox of the release)"""
+        return self.federation.query(sparql, version=version, raw=raw)
+
+    def devices_of_class(self, device_class) -> list:
+        """all devices of device_class, including its subclasses (asserted types)"""
+        return self.class_hierarchy.entities(self.class_hierarchy.instances_of(device_class))
+
+    def extract_emmo_module(self, filename: str, verify: bool = True) -> dict:
+        """extracting the EMMO module required by the device ontology from the full EMMO,
+        loaded into a fresh World (without the EMMO extension and the device TBox)
+
+        :param verify: reload the module into a fresh World and check the preserved axioms
+        :return: dict of missing axioms (see verify_emmo_module), empty if the module is complete
+        """
+        if self.emmo_module_filename is not None:
+            raise ValueError("the EMMO module is extracted from the full EMMO, not from an EMMO module")
+        emmo = load_emmo(self.emmo_source)
+        extract_emmo_module(emmo=emmo, filename=filename)
+        if not verify:
+            return {}
+        emmo_module = load_emmo(filename)
+        return verify_emmo_module(emmo=emmo, emmo_module=emmo_module)
+
+    def enable_partitioning(self, key: str = 'vendor', partition_dir: str = None) -> PartitionedABox:
+        """splitting the ABox into partitions (one ontology per vendor, site or product type),
+        partitions in partition_dir are loaded lazily on first access
+
+        :param key: partition key: 'vendor', 'site' or 'class'
+        """
+        self.abox_partitions = PartitionedABox(emmo_world=self.emmo_world, lw_tbox=self.lodev_tbox,
+                                               emmo_url=self.emmo_url, key=key, partition_dir=partition_dir,
+                                               change_feed=self.change_feed)
+        return self.abox_partitions
+
+    @holding_world_lock
+    def import_csv_parallel(self, csv_filename: str, processes: int = None, validate: bool = False,
+                            bulk_load: bool = False, progress=None) -> list:
+        """importing a device catalogue with several worker processes into the ABox
+        (into its partitions, if partitioning is enabled)
+
+        :param processes: number of worker processes, default: number of cores
+        :param validate: quarantine rows that fail the data quality rules
+        :param bulk_load: import with deferred indexes in one transaction (see world_storage.bulk_load)
+        :param progress: optional callback progress(rows_processed, triples_written)
+        :return: list of imported device IRIs
+        """
+        if bulk_load:
+            with world_storage.bulk_load(self.emmo_world):
+                return self.import_csv_parallel(csv_filename, processes=processes, validate=validate,
+                                                progress=progress)
+
+        validator = DeviceValidator() if validate else None
+        if self.abox_partitions is not None:
+            partition_iris = self.abox_partitions.import_csv(csv_filename, processes=processes, validator=validator,
+                                                             change_feed=self.change_feed, minter=self.iri_minter,
+                                                             progress=progress, intern_values=self.low_memory)
+            device_iris = [iri for iris in partition_iris.values() for iri in iris]
+        else:
+            device_iris = import_csv_parallel(csv_filename=csv_filename, abox=self.lodev_abox.lodeva,
+                                              lw_tbox=self.lodev_tbox, processes=processes,
+                                              validator=validator, change_feed=self.change_feed,
+                                              minter=self.iri_minter, progress=progress,
+                                              intern_values=self.low_memory)
+        self.query_planner.invalidate()
+        self._class_hierarchy = None
+        return device_iris
+
+    def reset_caches(self) -> None:
+        """dropping all derived in-memory data, e.g. after a rollback of the World database"""
+        self._class_hierarchy = None
+        self._material_compatibility = None
+        self.payload_cache.invalidate()
+        self.iri_minter.clear_cache()
+        self.query_planner.invalidate()
+        self.code_index.rebuild()
+
+    @holding_world_lock
+    def classify(self) -> None:
+        """classification of all ontologies of the World with the reasoner (HermiT, requires java)"""
+        sync_reasoner(self.emmo_world, infer_property_values=False)
+        self.reset_caches()
+
+    @holding_world_lock
+    def device_changed(self, device, operation: str = 'update') -> int:
+        """announcing a device insert or update made via the ABox,
+        appends the change to the change feed (which updates the search indices)
+
+        :return: sequence number of the change
+        """
+        self._class_hierarchy = None
+        return self.change_feed.append(operation, device.iri)
+
+    @holding_world_lock
+    def delete_device(self, device) -> int:
+        """deleting a device and its quantity individuals from the ABox
+
+        :return: sequence number of the change
+        """
+        iri = device.iri
+        quantities = [self.emmo_world._get_by_storid(storid)
+                      for storid in quantity_individuals(self.emmo_world, self.lodev_tbox, [device.storid])]
+        destroy_entity(device)
+        for quantity in quantities:
+            destroy_entity(quantity)
+        self._class_hierarchy = None
+        return self.change_feed.append('delete', iri)
+
+    def devices_json(self, iris) -> bytes:
+        """JSON array of the given devices (see device_serialization.device_json_schema)"""
+        return self.payload_cache.encode_batch(iris)
+
+    def validate_devices(self, report_filename: str = None):
+        """validating all devices of the ABox against the data quality rules
+
+        :param report_filename: optional CSV file for the report table
+        :return: ValidationReport
+        """
+        records = read_device_records(emmo_world=self.emmo_world, ontology=self.lodev_tbox.lodevt,
+                                      intern_strings=self.low_memory, emmo=self.lodev_tbox.emmo)
+        report = DeviceValidator().validate_records(records)
+        if report_filename is not None:
+            report.to_csv(report_filename)
+        logger.info(f"validation: {report}")
+        return report
+
+    def deck_layout_solver(self, positions: list) -> DeckLayoutSolver:
+        """placement solver for a deck, using the records of all devices of the ABox
+
+        :param positions: list of DeckPosition
+        """
+        records = read_device_records(emmo_world=self.emmo_world, ontology=self.lodev_tbox.lodevt,
+                                      intern_strings=self.low_memory, emmo=self.lodev_tbox.emmo)
+        return DeckLayoutSolver(records=records, positions=positions)
+
+    def memory_report(self) -> dict:
+        """approximate memory usage per component in bytes (see low_memory.memory_report)"""
+        return memory_report(self)
+
+    def close(self) -> None:
+        """restoring the process wide settings of the interface: the size of owlready2's entity ring buffer
+        before low_memory bounded it (interfaces with low_memory are closed in reverse order of creation)"""
+        if self._previous_entity_cache_size is not None:
+            bound_entity_cache(self._previous_entity_cache_size)
+            self._previous_entity_cache_size = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    @holding_world_lock
+    def compact_database(self) -> tuple:
+        """ANALYZE, REINDEX and VACUUM of the World database
+
+        :return: database size in bytes before and after compaction
+        """
+        self.emmo_world.save()
+        return world_storage.compact(self.emmo_world)
+
+    @holding_world_lock
+    def export_ontologies(self, path: str = ".", format='owl', snapshot_dir: str = None) -> None:
+        """save all ontologies
+
+        :param snapshot_dir: optional snapshot store directory, the exports are recorded as snapshot of this version
+        """
+        snapshot_store = SnapshotStore(snapshot_dir) if snapshot_dir is not None else None
+
+        # one map of minted names over all exported ontologies (TBoxes first),
+        # so that the ABox files reference the minted names of the TBox files
+        ontologies = [self.emmo_ext_tbox.emmo, self.lodev_tbox.lodevt, self.lodev_abox.lodeva]
+        if self.abox_partitions is not None:
+            ontologies += [self.abox_partitions.get(partition) for partition in self.abox_partitions.partitions()]
+        for ontology in ontologies:
+            sync_export_attributes(ontology)
+        minted_iris = self.iri_minter.export_iris(ontologies)
 
-        self.emmo_ext_tbox.export(path=path, format=format)
-        self.lodev_tbox.export(path=path, format=format)
-        self.lodev_abox.export(path=path, format=format)
+        export_args = dict(path=path, format=format, snapshot_store=snapshot_store, minter=self.iri_minter,
+                           minted_iris=minted_iris)
+        self.emmo_ext_tbox.export(**export_args)
+        self.lodev_tbox.export(**export_args)
+        self.lodev_abox.export(**export_args)
+        if self.abox_partitions is not None:
+            self.abox_partitions.export(**export_args)
 
 
 
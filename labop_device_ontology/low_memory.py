@@ -0,0 +1,158 @@
+"""_____________________________________________________________________
+
+:PROJECT: LabOP Device Ontology
+
+* Low-memory mode *
+
+:details:  bounding the memory footprint of large in-memory Worlds.
+
+           - owlready2 keeps the last 65536 loaded entities alive in a ring buffer,
+             the entity cache of a World only holds weak references;
+             bound_entity_cache() shrinks the ring buffer to max_entities, so only the
+             most recently loaded entities and the referenced ones stay in memory
+             (FIFO, not LRU: entities leave the buffer in load order, also if they are
+             used again; restored by bounded_entity_cache / LabwareInterface.close)
+             (2000 synthetic devices, all loaded once: 4138 live entities / 6.1 MB
+             retained by default, 217 / 4.2 MB with max_entities=100)
+           - repeated short literal strings (materials, shapes, 'N/A' placeholders, ...)
+             of catalogue rows and device records are interned
+             (100000 synthetic catalogue rows: 227 MB plain, 122 MB interned,
+             see benchmarks/bench_low_memory.py)
+           - bulk imports and reads bypass the owlready2 entities (parallel_import,
+             read_device_records: plain records, no individuals)
+           - memory_report() lists the memory usage per component
+
+.. note:: the 'low_memory' storage profile limits the SQLite page cache,
+          the ring buffer is shared by all Worlds of the process
+.. todo:: -
+________________________________________________________________________
+"""
+
+import sys
+import logging
+import tracemalloc
+from contextlib import contextmanager
+
+from owlready2 import namespace as owlready_namespace
+
+from labop_device_ontology.world_storage import database_size
+
+logger = logging.getLogger(__name__)
+
+# longer strings are rarely repeated (names, descriptions, links)
+MAX_INTERN_LENGTH = 64
+
+DEFAULT_MAX_ENTITIES = 10000
+
+
+def intern_value(value):
+    """interned short string, other values unchanged"""
+    if type(value) is str and len(value) <= MAX_INTERN_LENGTH:
+        return sys.intern(value)
+    return value
+
+
+def intern_rows(rows: list) -> list:
+    """interning the short values of catalogue rows (dicts) in place"""
+    for row in rows:
+        for key, value in row.items():
+            row[key] = intern_value(value)
+    return rows
+
+
+def entity_cache_size() -> int:
+    """size of owlready2's entity ring buffer"""
+    return len(owlready_namespace._cache)
+
+
+def num_cached_entities() -> int:
+    """number of entities kept alive by owlready2's entity ring buffer (all Worlds)"""
+    return sum(1 for entity in owlready_namespace._cache if entity is not None)
+
+
+def bound_entity_cache(max_entities: int = DEFAULT_MAX_ENTITIES) -> int:
+    """resizing owlready2's entity ring buffer, the most recently loaded entities are kept
+
+    owlready2 keeps strong references to the last 2 ** 16 loaded entities in a module level
+    ring buffer (owlready2.namespace._cache, shared by all Worlds of the process),
+    the entity cache of a World itself only holds weak references.
+    The buffer is FIFO, not LRU: an entity is dropped max_entities loads after it was loaded,
+    also if it was used in the meantime (owlready2 only appends on loading).
+    The size stays changed for the whole process, restore it with the returned size
+    (or use bounded_entity_cache)
+
+    :return: previous size of the ring buffer
+    """
+    if max_entities < 1:
+        raise ValueError(f"the entity cache needs room for at least one entity, not {max_entities}")
+    previous, index = owlready_namespace._cache, owlready_namespace._cache_index
+    recent = [entity for entity in previous[index:] + previous[:index] if entity is not None][-max_entities:]
+    owlready_namespace._cache = recent + [None] * (max_entities - len(recent))
+    owlready_namespace._cache_index = len(recent) % max_entities
+    logger.debug(f"entity cache bounded to {max_entities} entities")
+    return len(previous)
+
+
+@contextmanager
+def bounded_entity_cache(max_entities: int = DEFAULT_MAX_ENTITIES):
+    """owlready2's entity ring buffer bounded to max_entities, the previous size is restored on exit"""
+    previous_size = bound_entity_cache(max_entities)
+    try:
+        yield
+    finally:
+        bound_entity_cache(previous_size)
+
+
+def approximate_size(obj, seen: set = None) -> int:
+    """approximate deep size of plain python containers (dict, list, tuple, set, namedtuple, array) in bytes"""
+    seen = seen if seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(approximate_size(key, seen) + approximate_size(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(approximate_size(item, seen) for item in obj)
+    return size
+
+
+def _entity_size(entity, seen: set) -> int:
+    return sys.getsizeof(entity) + approximate_size(getattr(entity, '__dict__', {}), seen)
+
+
+def memory_report(lodev) -> dict:
+    """approximate memory usage per component of a LabwareInterface in bytes
+
+    components: sqlite (World database incl. search indices), entities (reachable owlready2 python objects,
+    num_cached_entities of all Worlds kept alive by owlready2's ring buffer),
+    payload_cache, class_hierarchy, material_compatibility, iri_minter, python_total (tracemalloc, if tracing)
+    """
+    world = lodev.emmo_world
+    seen = set()
+    entities = list(world._entities.values())
+    report = {
+        'sqlite': database_size(world),
+        'entities': sum(_entity_size(entity, seen) for entity in entities),
+        'num_entities': len(entities),
+        'num_cached_entities': num_cached_entities(),
+        'payload_cache': approximate_size(lodev.payload_cache.payloads, seen),
+        'iri_minter': approximate_size(lodev.iri_minter._cache, seen),
+    }
+    if lodev._class_hierarchy is not None:
+        closure = lodev._class_hierarchy
+        report['class_hierarchy'] = sum(approximate_size(value, seen) for value in (
+            closure.storids, closure.index, closure.ancestors, closure.descendants,
+            closure.direct_instances, closure.instance_types))
+    if lodev._material_compatibility is not None:
+        compatibility = lodev._material_compatibility
+        report['material_compatibility'] = sum(approximate_size(value, seen) for value in (
+            compatibility.matrix, compatibility.complete, compatibility.device_iris, compatibility.device_index))
+    if tracemalloc.is_tracing():
+        report['python_total'] = tracemalloc.get_traced_memory()[0]
+    return report
+
+
+def format_memory_report(report: dict) -> str:
+    return '\n'.join(f"{component:24s} {value:>12d}" if component.startswith('num_')
+                     else f"{component:24s} {value / 2 ** 20:>9.2f} MB" for component, value in report.items())
@@ -0,0 +1,236 @@
+"""_____________________________________________________________________
+
+:PROJECT: LabOP Device Ontology
+
+* Substance - material compatibility *
+
+:details:  chemical resistance of device materials against substances.
+
+           The resistance table (data/material_resistance.csv) rates substance x material
+           pairs: A (resistant), B (good), C (limited), D (not resistant).
+           Substance and material names of the catalogue are normalized and mapped
+           to the names of the table by aliases ('PP', 'Polypropylene (PP)', ...).
+           Substances are names or EMMO ChemicalSubstance entities (classes or individuals,
+           e.g. subclasses of the Substance class of the EMMO extension TBox), which are
+           mapped by their first prefLabel / label, their name as fallback.
+
+           CompatibilityMatrix precomputes a dense rating matrix substances x devices:
+           the rating of a device is the worst rating of all its wetted materials
+           (hasMaterial, hasCoatingMaterial, hasSeptumMaterial). Placeholder values
+           ('N/A', 'none', ...) of missing coatings / septa are no materials.
+           Materials without resistance data do not hide the known ratings: the matrix keeps
+           the worst known rating and whether all materials are rated, a device with a known
+           rating below the threshold is not compatible, even if other materials are unknown.
+           Batched queries are array lookups, no ontology traversal per pair.
+
+.. note:: the ratings are indicative values for room temperature,
+          check the vendor data for critical applications
+.. todo:: - temperature / exposure time dependent ratings
+________________________________________________________________________
+"""
+
+import os
+import re
+import csv
+import pathlib
+import logging
+from array import array
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RESISTANCE_FILENAME = os.path.join(pathlib.Path(__file__).parent.resolve(), 'data',
+                                           'material_resistance.csv')
+
+RATINGS = {'A': 3, 'B': 2, 'C': 1, 'D': 0}
+RATING_NAMES = {value: name for name, value in RATINGS.items()}
+UNKNOWN = -1
+
+# device properties of wetted materials
+MATERIAL_PROPERTIES = ('hasMaterial', 'hasCoatingMaterial', 'hasSeptumMaterial')
+
+# catalogue values of missing materials (normalized)
+PLACEHOLDER_VALUES = {'', 'n/a', 'na', 'none', 'no', '-', '--', 'unknown', 'null'}
+
+MATERIAL_ALIASES = {
+    'pp': 'polypropylene',
+    'ps': 'polystyrene',
+    'pe': 'polyethylene', 'hdpe': 'polyethylene', 'ldpe': 'polyethylene',
+    'ptfe': 'polytetrafluoroethylene', 'teflon': 'polytetrafluoroethylene',
+    'pc': 'polycarbonate',
+    'coc': 'cyclic olefin copolymer', 'cop': 'cyclic olefin copolymer',
+    'cyclic olefin polymer': 'cyclic olefin copolymer',
+    'borosilicate glass': 'glass', 'borosilicate': 'glass', 'quartz': 'glass',
+    'pmma': 'polymethyl methacrylate', 'acrylic': 'polymethyl methacrylate',
+    'silicon': 'silicone', 'silicone rubber': 'silicone',
+}
+
+SUBSTANCE_ALIASES = {
+    'h2o': 'water', 'etoh': 'ethanol', 'meoh': 'methanol',
+    'ipa': 'isopropanol', '2-propanol': 'isopropanol', 'isopropyl alcohol': 'isopropanol',
+    'acn': 'acetonitrile', 'dimethyl sulfoxide': 'dmso',
+    'dcm': 'dichloromethane', 'methylene chloride': 'dichloromethane',
+    'etoac': 'ethyl acetate', 'ether': 'diethyl ether',
+    'thf': 'tetrahydrofuran', 'dmf': 'dimethylformamide',
+    'formalin': 'formaldehyde 37%', 'hcl': 'hydrochloric acid 10%', 'naoh': 'sodium hydroxide 10%',
+}
+
+
+def normalize_name(name: str, aliases: dict = None) -> str:
+    """lower case name without abbreviations in brackets, mapped by aliases
+    e.g. 'Polypropylene (PP)' -> 'polypropylene', 'PP' -> 'polypropylene' """
+    name = re.sub(r'\s+', ' ', str(name).strip().lower())
+    aliases = aliases or {}
+    if name in aliases:
+        return aliases[name]
+    match = re.match(r'^(.*?)\s*\((.*)\)$', name)
+    if match:
+        base, abbreviation = match.group(1), match.group(2)
+        return aliases.get(base, aliases.get(abbreviation, base))
+    return name
+
+
+def substance_name(substance) -> str:
+    """table name of a substance name or EMMO ChemicalSubstance entity"""
+    if not isinstance(substance, str):
+        labels = list(getattr(substance, 'prefLabel', None) or []) + list(getattr(substance, 'label', None) or [])
+        substance = labels[0] if labels else substance.name
+    return normalize_name(substance, SUBSTANCE_ALIASES)
+
+
+def load_resistance_table(resistance_filename: str = None) -> dict:
+    """reading the resistance table
+
+    :param resistance_filename: CSV file (substance, material, rating), default: data/material_resistance.csv
+    :return: dict (substance, material): rating (0 - 3)
+    """
+    with open(resistance_filename or DEFAULT_RESISTANCE_FILENAME, newline='', encoding='utf-8') as resistance_file:
+        return {(normalize_name(row['substance'], SUBSTANCE_ALIASES),
+                 normalize_name(row['material'], MATERIAL_ALIASES)): RATINGS[row['rating'].strip().upper()]
+                for row in csv.DictReader(resistance_file)}
+
+
+def _values(record, name: str) -> tuple:
+    """material values of a record property, without placeholders"""
+    value = record.get(name) if isinstance(record, dict) else getattr(record, name, None)
+    if value is None:
+        return ()
+    values = value if isinstance(value, (tuple, list)) else (value,)
+    return tuple(value for value in values if str(value).strip().lower() not in PLACEHOLDER_VALUES)
+
+
+class CompatibilityMatrix:
+    def __init__(self, resistance: dict = None, records: dict = None) -> None:
+        """Dense substance x device rating matrix
+
+        :param resistance: resistance table (see load_resistance_table), default: data/material_resistance.csv
+        :param records: dict device iri: device record (DeviceRecord or dict)
+        """
+        resistance = resistance if resistance is not None else load_resistance_table()
+        self.substances = sorted({substance for substance, _ in resistance})
+        self.materials = sorted({material for _, material in resistance})
+        self.substance_index = {substance: i for i, substance in enumerate(self.substances)}
+        self.material_index = {material: i for i, material in enumerate(self.materials)}
+
+        # substance x material ratings
+        self.material_ratings = [array('b', [UNKNOWN] * len(self.materials)) for _ in self.substances]
+        for (substance, material), rating in resistance.items():
+            self.material_ratings[self.substance_index[substance]][self.material_index[material]] = rating
+
+        self.set_records(records or {})
+
+    def set_records(self, records: dict) -> None:
+        """(re-)building the device materials and the substance x device matrix"""
+        self.device_iris = list(records)
+        self.device_index = {iri: i for i, iri in enumerate(self.device_iris)}
+        self.unknown_materials = set()
+
+        # distinct material combinations (material indices, None: material without resistance data),
+        # most catalogue devices share a few combinations
+        material_indices = {}
+        combinations = {}
+        device_combinations = []
+        for record in records.values():
+            indices = set()
+            for name in MATERIAL_PROPERTIES:
+                for material in _values(record, name):
+                    if material not in material_indices:
+                        material_indices[material] = self.material_index.get(normalize_name(material, MATERIAL_ALIASES))
+                        if material_indices[material] is None:
+                            self.unknown_materials.add(material)
+                    indices.add(material_indices[material])
+            device_combinations.append(combinations.setdefault(frozenset(indices), len(combinations)))
+        self.material_combinations = list(combinations)
+        if self.unknown_materials:
+            logger.debug("compatibility: materials without resistance data: "
+                         f"{sorted(map(str, self.unknown_materials))}")
+
+        # worst known rating and complete (1: all materials rated) of the substance x device pairs
+        self.matrix = []
+        self.complete = []
+        for material_ratings in self.material_ratings:
+            combination_ratings = [self._combination_rating(material_ratings, combination)
+                                   for combination in self.material_combinations]
+            self.matrix.append(array('b', [combination_ratings[k][0] for k in device_combinations]))
+            self.complete.append(array('b', [combination_ratings[k][1] for k in device_combinations]))
+
+    @staticmethod
+    def _combination_rating(material_ratings: array, combination: frozenset) -> tuple:
+        """worst known rating of the materials (UNKNOWN if no material is rated)
+        and 1 if all materials are rated, 0 if a material is unknown or there are none"""
+        known = [material_ratings[index] for index in combination
+                 if index is not None and material_ratings[index] != UNKNOWN]
+        return (min(known) if known else UNKNOWN), int(bool(combination) and len(known) == len(combination))
+
+    def material_rating(self, substance: str, material: str) -> int:
+        """rating of a substance x material pair, UNKNOWN (-1) without data"""
+        i = self.substance_index.get(substance_name(substance))
+        j = self.material_index.get(normalize_name(material, MATERIAL_ALIASES))
+        return UNKNOWN if i is None or j is None else self.material_ratings[i][j]
+
+    def ratings(self, substance: str, device_iris) -> list:
+        """ratings of devices for one substance, UNKNOWN (-1) for unknown substances or devices
+        and for devices with unknown materials, unless a known material is not resistant (D)
+
+        :param substance: substance name or EMMO ChemicalSubstance entity
+        """
+        i = self.substance_index.get(substance_name(substance))
+        if i is None:
+            return [UNKNOWN] * len(device_iris)
+        row, complete = self.matrix[i], self.complete[i]
+        return [UNKNOWN if j is None or not (complete[j] or row[j] == RATINGS['D']) else row[j]
+                for j in map(self.device_index.get, device_iris)]
+
+    def check(self, queries) -> list:
+        """batched ratings of (substance, device iri list) queries"""
+        return [self.ratings(substance, device_iris) for substance, device_iris in queries]
+
+    def compatible(self, substance: str, device_iris, min_rating: str = 'B', allow_unknown: bool = False) -> list:
+        """compatibility of devices with a substance
+
+        :param min_rating: minimal rating (A - D)
+        :param allow_unknown: devices without resistance data are regarded as compatible,
+                              unless a known material is rated below min_rating
+        """
+        threshold = RATINGS[min_rating]
+        i = self.substance_index.get(substance_name(substance))
+        if i is None:
+            return [allow_unknown] * len(device_iris)
+        row, complete = self.matrix[i], self.complete[i]
+        return [allow_unknown if j is None else self._compatible(row[j], complete[j], threshold, allow_unknown)
+                for j in map(self.device_index.get, device_iris)]
+
+    @staticmethod
+    def _compatible(rating: int, complete: int, threshold: int, allow_unknown: bool) -> bool:
+        """a known rating below the threshold decides, unknown materials could only be worse"""
+        if UNKNOWN < rating < threshold:
+            return False
+        return bool(complete) or allow_unknown
+
+    def compatible_devices(self, substance: str, min_rating: str = 'B') -> list:
+        """iris of all devices with at least min_rating for the substance (all materials rated)"""
+        i = self.substance_index.get(substance_name(substance))
+        if i is None:
+            return []
+        threshold = RATINGS[min_rating]
+        return [iri for iri, rating, complete in zip(self.device_iris, self.matrix[i], self.complete[i])
+                if complete and rating >= threshold]
@@ -0,0 +1,338 @@
+"""_____________________________________________________________________
+
+:PROJECT: LabOP Device Ontology
+
+* Parallel device catalogue import *
+
+:details:  sharded CSV import of the device catalogue.
+
+           The catalogue is partitioned into chunks, worker processes convert the rows
+           into plain triples (IRIs and encoded literals, no owlready2 objects) and the main
+           process merges all triples into the quadstore of the World with one bulk insert.
+           Rows of the same device (vendor name and product ID) are imported once, the last
+           row wins.
+           Device IRIs are derived from vendor name and product ID, so the result does
+           not depend on the partitioning or the number of processes.
+
+           CSV columns are the names of the Device datatype properties
+           (see data/device_tbox_properties.csv), an optional 'name' column becomes
+           the rdfs:label of the device.
+           Columns of quantity properties (hasLength, ...) become EMMO quantity individuals
+           <device IRI>_<property> with the value in the unit of tbox_schema.QUANTITY_UNITS
+           (numerical part <device IRI>_<property>_value), tolerance columns
+           (hasLengthTolerance, ...) properties of the quantity individual.
+
+.. note:: a tolerance without a value of its quantity is not imported
+.. todo:: -
+________________________________________________________________________
+"""
+
+import os
+import csv
+import logging
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from owlready2.base import to_literal, rdf_type, owl_named_individual
+
+from labop_device_ontology.tbox_schema import (load_property_schema, python_datatype, rdfs_label,
+                                               is_quantity_property, tolerance_quantity, QUANTITY_UNITS)
+from labop_device_ontology.iri_minting import stable_name, device_key
+from labop_device_ontology.low_memory import intern_rows
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 5000
+
+RDF_TYPE_IRI = 'http://www.w3.org/1999/02/22-rdf-syntax-ns#type'
+OWL_NAMED_INDIVIDUAL_IRI = 'http://www.w3.org/2002/07/owl#NamedIndividual'
+
+# IRIs for the quantity individuals of the quantity columns (see importable_quantities)
+# classes / units: quantity property name: IRI of the EMMO quantity class / unit,
+# tolerances: tolerance property name: quantity property name
+QuantityColumns = namedtuple('QuantityColumns', ['classes', 'units', 'tolerances', 'has_numerical_part',
+                                                 'has_reference_unit', 'has_numerical_value', 'real'])
+
+
+def device_iri(base_iri: str, row: dict) -> str:
+    """deterministic device IRI from vendor name and product ID (whole row as fallback),
+    same names as IRIMinter.mint_device"""
+    return base_iri + stable_name(device_key(row))
+
+
+def convert_value(value: str, datatype):
+    """converting a CSV cell to the python datatype of the property, None for empty cells"""
+    value = value.strip()
+    if value == '':
+        return None
+    if datatype is bool:
+        return value.lower() in ('true', 'yes', '1', 'y')
+    return datatype(value)
+
+
+def rows_to_triples(rows: list, abox_base_iri: str, tbox_base_iri: str, datatypes: dict,
+                    quantities: QuantityColumns = None) -> tuple:
+    """worker: converting catalogue rows into plain triples with encoded literals
+
+    :param datatypes: property name: python datatype of all importable columns
+    :param quantities: optional QuantityColumns of the catalogue
+    :return: device IRIs, data triples (s_iri, p_iri, o, d), object triples (s_iri, p_iri, o_iri),
+             errors (row, message)
+    """
+    device_iris, data_triples, obj_triples, errors = [], [], [], []
+    for row in rows:
+        iri = device_iri(abox_base_iri, row)
+        try:
+            values = [(tbox_base_iri + name, convert_value(row[name], datatype))
+                      for name, datatype in datatypes.items() if row.get(name) is not None]
+            quantity_values = {name: convert_value(row[name], float) for name in quantities.classes
+                               if row.get(name) is not None} if quantities is not None else {}
+            tolerance_values = [(name, quantity, convert_value(row[name], float))
+                                for name, quantity in quantities.tolerances.items()
+                                if row.get(name) is not None] if quantities is not None else []
+        except ValueError as err:
+            errors.append((row, str(err)))
+            continue
+        device_iris.append(iri)
+        data_triples.extend((iri, p_iri, *to_literal(value)) for p_iri, value in values if value is not None)
+        if row.get('name'):
+            data_triples.append((iri, None, *to_literal(row['name'].strip())))  # None: rdfs:label
+
+        for name, value in quantity_values.items():
+            if value is None:
+                continue
+            quantity_iri = f"{iri}_{name}"
+            value_iri = f"{quantity_iri}_value"
+            obj_triples += [(iri, tbox_base_iri + name, quantity_iri),
+                            (quantity_iri, RDF_TYPE_IRI, OWL_NAMED_INDIVIDUAL_IRI),
+                            (quantity_iri, RDF_TYPE_IRI, quantities.classes[name]),
+                            (quantity_iri, quantities.has_reference_unit, quantities.units[name]),
+                            (quantity_iri, quantities.has_numerical_part, value_iri),
+                            (value_iri, RDF_TYPE_IRI, OWL_NAMED_INDIVIDUAL_IRI),
+                            (value_iri, RDF_TYPE_IRI, quantities.real)]
+            data_triples.append((value_iri, quantities.has_numerical_value, *to_literal(value)))
+        data_triples.extend((f"{iri}_{quantity}", tbox_base_iri + name, *to_literal(value))
+                            for name, quantity, value in tolerance_values
+                            if value is not None and quantity_values.get(quantity) is not None)
+    return device_iris, data_triples, obj_triples, errors
+
+
+def unique_rows(rows: list) -> list:
+    """rows with distinct device keys, the last row of a device wins
+    (duplicates would add second values to functional properties)"""
+    unique = {device_key(row): row for row in rows}
+    if len(unique) < len(rows):
+        logger.warning(f"parallel import: {len(rows) - len(unique)} duplicate device rows, the last row is imported")
+    return list(unique.values())
+
+
+def imported_rows(abox_base_iri: str, rows: list, device_iris: list) -> list:
+    """rows, that were converted into devices (without the rows skipped by conversion errors)"""
+    imported = set(device_iris)
+    return [row for row in rows if device_iri(abox_base_iri, row) in imported]
+
+
+def importable_datatypes(specs: list, columns) -> dict:
+    """property name: python datatype of the Device datatype properties among the catalogue columns"""
+    datatypes = {spec.name: python_datatype(spec) for spec in specs
+                 if spec.domain == 'Device' and python_datatype(spec) is not None and spec.name in columns}
+    skipped = sorted(spec.name for spec in specs if spec.name in columns and spec.name not in datatypes
+                     and not is_quantity_property(spec) and tolerance_quantity(spec) is None)
+    if skipped:
+        logger.warning(f"parallel import: object property columns are not imported: {', '.join(skipped)}")
+    return datatypes
+
+
+def importable_quantities(specs: list, columns, emmo=None) -> QuantityColumns:
+    """IRIs for the quantity individuals of the quantity and tolerance columns of the catalogue,
+    None if there are no quantity columns
+
+    :param emmo: EMMO ontology
+    """
+    quantity_specs = [spec for spec in specs if is_quantity_property(spec) and spec.name in columns]
+    if not quantity_specs:
+        return None
+    if emmo is None:
+        logger.warning("parallel import: quantity columns are not imported without EMMO")
+        return None
+    return QuantityColumns(
+        classes={spec.name: getattr(emmo, spec.range[len('emmo:'):]).iri for spec in quantity_specs},
+        units={spec.name: getattr(emmo, QUANTITY_UNITS[spec.quantity]).iri for spec in quantity_specs},
+        tolerances={spec.name: tolerance_quantity(spec) for spec in specs
+                    if spec.name in columns and tolerance_quantity(spec) in columns},
+        has_numerical_part=emmo.hasNumericalPart.iri,
+        has_reference_unit=emmo.hasReferenceUnit.iri,
+        has_numerical_value=emmo.hasNumericalValue.iri,
+        real=emmo.Real.iri)
+
+
+def quantity_property_storids(world, tbox_base_iri: str, specs: list = None) -> list:
+    """storids of the quantity properties (Device -> quantity individual)"""
+    specs = specs if specs is not None else load_property_schema()
+    storids = (world._abbreviate(tbox_base_iri + spec.name, False) for spec in specs if is_quantity_property(spec))
+    return [storid for storid in storids if storid is not None]
+
+
+def quantity_individuals(world, lw_tbox, device_storids: list) -> list:
+    """storids of the quantity individuals of devices and of their numerical parts"""
+    properties = quantity_property_storids(world, lw_tbox.lodevt.base_iri)
+    storids = []
+    subjects = list(device_storids)
+    for _ in range(2):  # device -> quantity -> numerical part
+        if not properties or not subjects:
+            break
+        subjects = [o for (o,) in world.graph.db.execute(
+            f"SELECT o FROM objs WHERE s IN ({','.join('?' * len(subjects))}) "
+            f"AND p IN ({','.join('?' * len(properties))})", subjects + properties)]
+        storids += subjects
+        properties = [lw_tbox.emmo.hasNumericalPart.storid]
+    return storids
+
+
+def convert_parallel(groups: list, tbox_base_iri: str, datatypes: dict, processes: int = None,
+                     chunk_size: int = DEFAULT_CHUNK_SIZE, progress=None, quantities: QuantityColumns = None) -> list:
+    """converting the rows of one or more target ABoxes with one pool of worker processes,
+    all rows are sharded into chunks of chunk_size rows
+
+    :param groups: list of (ABox base IRI, rows)
+    :param progress: optional callback progress(rows_processed, 0) after every chunk
+    :param quantities: optional QuantityColumns (see importable_quantities)
+    :return: list of (device IRIs, data triples, object triples) per group
+    """
+    tasks = [(group, base_iri, rows[i:i + chunk_size])
+             for group, (base_iri, rows) in enumerate(groups) for i in range(0, len(rows), chunk_size)]
+    processes = processes or os.cpu_count() or 1
+
+    args = ([chunk for _, _, chunk in tasks], [base_iri for _, base_iri, _ in tasks],
+            [tbox_base_iri] * len(tasks), [datatypes] * len(tasks), [quantities] * len(tasks))
+    executor = ProcessPoolExecutor(max_workers=processes) if processes > 1 and len(tasks) > 1 else None
+    results = executor.map(rows_to_triples, *args) if executor is not None else map(rows_to_triples, *args)
+
+    converted = [([], [], []) for _ in groups]
+    rows_processed = 0
+    try:
+        for (group, _, _), (chunk_iris, chunk_triples, chunk_obj_triples, errors) in zip(tasks, results):
+            for row, message in errors:
+                logger.error(f"parallel import: row skipped ({message}): {row}")
+            converted[group][0].extend(chunk_iris)
+            converted[group][1].extend(chunk_triples)
+            converted[group][2].extend(chunk_obj_triples)
+            rows_processed += len(chunk_iris) + len(errors)
+            if progress is not None:
+                progress(rows_processed, 0)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)  # pending chunks are dropped, e.g. on cancellation
+    return converted
+
+
+def read_catalogue(csv_filename: str, delimiter: str = None, intern_values: bool = False) -> list:
+    """reading all rows of the device catalogue CSV file
+
+    :param intern_values: intern repeated short values (low-memory mode)
+    """
+    with open(csv_filename, newline='', encoding='utf-8') as csv_file:
+        if delimiter is None:
+            delimiter = csv.Sniffer().sniff(csv_file.read(4096), delimiters=',;\t').delimiter
+            csv_file.seek(0)
+        rows = list(csv.DictReader(csv_file, delimiter=delimiter))
+    return intern_rows(rows) if intern_values else rows
+
+
+def import_csv_parallel(csv_filename: str = None, abox=None, lw_tbox=None, processes: int = None,
+                        chunk_size: int = DEFAULT_CHUNK_SIZE, specs: list = None, progress=None,
+                        validator=None, change_feed=None, rows: list = None, minter=None,
+                        intern_values: bool = False) -> list:
+    """importing a device catalogue with worker processes into the ABox ontology
+
+    :param abox: target ABox ontology
+    :param lw_tbox: LOLabwareTBox
+    :param processes: number of worker processes, default: number of cores
+    :param progress: optional callback progress(rows_processed, triples_written)
+    :param validator: optional DeviceValidator, failing rows are quarantined and not imported
+    :param change_feed: optional ChangeFeed, receiving an insert/update event per imported device
+    :param rows: already read catalogue rows (used instead of csv_filename)
+    :param minter: optional IRIMinter, the device keys and IRIs are recorded in its map
+    :param intern_values: intern repeated short values of the catalogue rows (low-memory mode)
+    :return: list of imported device IRIs
+    """
+    specs = specs if specs is not None else load_property_schema()
+    rows = rows if rows is not None else read_catalogue(csv_filename, intern_values=intern_values)
+    if validator is not None:
+        rows, _, _ = validator.quarantine(rows)
+    if not rows:
+        return []
+    rows = unique_rows(rows)
+
+    datatypes = importable_datatypes(specs, set(rows[0]))
+    quantities = importable_quantities(specs, set(rows[0]), emmo=lw_tbox.emmo)
+    [(device_iris, data_triples, obj_triples)] = convert_parallel(
+        [(abox.base_iri, rows)], lw_tbox.lodevt.base_iri, datatypes, processes=processes, chunk_size=chunk_size,
+        progress=progress, quantities=quantities)
+
+    if minter is not None:
+        minter.mint_devices(abox.base_iri, imported_rows(abox.base_iri, rows, device_iris))
+
+    num_triples = insert_triples(abox, lw_tbox, device_iris, data_triples, change_feed=change_feed,
+                                 obj_triples=obj_triples)
+    if progress is not None:
+        progress(len(rows), num_triples)
+    logger.info(f"parallel import: {len(device_iris)} devices, {num_triples} triples "
+                f"from {csv_filename or 'catalogue rows'}")
+    return device_iris
+
+
+def insert_triples(abox=None, lw_tbox=None, device_iris: list = None, data_triples: list = None,
+                   change_feed=None, obj_triples: list = None) -> int:
+    """bulk insert of devices and their data triples into the ABox context of the quadstore
+
+    :param obj_triples: object triples (s_iri, p_iri, o_iri) of the quantity individuals
+    :return: number of inserted triples
+    """
+    world = abox.world
+    c = abox.graph.c
+    device_class = lw_tbox.lodevt.Device.storid
+
+    storids = {}
+
+    def abbreviate(iri):
+        storid = storids.get(iri)
+        if storid is None:
+            storid = storids[iri] = world._abbreviate(iri)
+        return storid
+
+    # devices already in the store are replaced (re-import is idempotent),
+    # a temporary subject table keeps this a single pass, also without quadstore indexes (bulk load)
+    db = world.graph.db
+    device_storids = [abbreviate(iri) for iri in dict.fromkeys(device_iris)]
+    db.execute("CREATE TEMP TABLE IF NOT EXISTS lodev_import_subjects (s INTEGER PRIMARY KEY)")
+    db.execute("DELETE FROM lodev_import_subjects")
+    db.executemany("INSERT OR IGNORE INTO lodev_import_subjects (s) VALUES (?)", [(s,) for s in device_storids])
+    existing = set()
+    if change_feed is not None:
+        existing = {s for (s,) in db.execute(
+            "SELECT DISTINCT s FROM objs WHERE c = ? AND s IN (SELECT s FROM lodev_import_subjects)", (c,))}
+    # the quantity individuals of the devices and their numerical parts are replaced as well
+    replaced_properties = quantity_property_storids(world, lw_tbox.lodevt.base_iri)
+    if replaced_properties:
+        replaced_properties.append(lw_tbox.emmo.hasNumericalPart.storid)
+        for _ in range(2):  # device -> quantity -> numerical part
+            db.execute("INSERT OR IGNORE INTO lodev_import_subjects (s) SELECT o FROM objs WHERE c = ? "
+                       "AND s IN (SELECT s FROM lodev_import_subjects) "
+                       f"AND p IN ({','.join('?' * len(replaced_properties))})", [c] + replaced_properties)
+    db.execute("DELETE FROM objs WHERE c = ? AND s IN (SELECT s FROM lodev_import_subjects)", (c,))
+    db.execute("DELETE FROM datas WHERE c = ? AND s IN (SELECT s FROM lodev_import_subjects)", (c,))
+
+    objs = [(c, s, rdf_type, o) for s in device_storids for o in (owl_named_individual, device_class)]
+    objs += [(c, abbreviate(s_iri), abbreviate(p_iri), abbreviate(o_iri)) for s_iri, p_iri, o_iri in obj_triples or ()]
+    datas = [(c, abbreviate(s_iri), rdfs_label if p_iri is None else abbreviate(p_iri), o, d)
+             for s_iri, p_iri, o, d in data_triples]
+
+    db.executemany("INSERT INTO objs (c, s, p, o) VALUES (?, ?, ?, ?)", objs)
+    db.executemany("INSERT INTO datas (c, s, p, o, d) VALUES (?, ?, ?, ?, ?)", datas)
+
+    # change events in the same transaction, after the triples are written
+    if change_feed is not None:
+        change_feed.append_many(('update' if s in existing else 'insert', iri, None)
+                                for iri, s in zip(dict.fromkeys(device_iris), device_storids))
+    return len(objs) + len(datas)
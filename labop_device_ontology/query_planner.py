@@ -0,0 +1,567 @@
+"""_____________________________________________________________________
+
+:PROJECT: LabOP Device Ontology
+
+* Query planner for device searches *
+
+:details:  star / filter patterns over device datatype properties compiled to SQL.
+
+           Most device searches are star patterns: one subject variable, an optional
+           rdf:type, datatype properties with literal values or variables and FILTERs
+           comparing these variables with literals, e.g.
+
+             SELECT ?d ?vendor WHERE {
+               ?d a lodev:Device ;
+                  lodev:hasNumWells ?wells ;
+                  lodev:hasMaterial "polystyrene" ;
+                  lodev:hasVendorName ?vendor .
+               FILTER(?wells >= 96 && ?wells <= 384)
+             }
+
+           These queries are compiled into one SQL join over the datas table, starting
+           with the most selective pattern, using a (p, o, s) index for value lookups,
+           range scans and the subject joins. Compiled plans are cached, until the schema
+           changes (device changes only reset the predicate statistics). All other
+           queries are passed to the general SPARQL engine of owlready2 (world.sparql),
+           also queries with object properties (their values are not in the datas table).
+
+           Literals are matched like rdflib: a literal of a triple pattern only matches
+           literals of the same datatype and language ("96" is no "96"@en, 96 no 96.0e0),
+           FILTER comparisons compare numbers of all numeric datatypes by value and strings
+           with strings of the same language only - SQLite would order all strings after
+           all numbers.
+
+           A planner can be restricted to the triples of some contexts (ontologies), e.g. to
+           one catalogue version of a federation (see set_contexts): every table of the plan,
+           including shared predicates like rdfs:label, only matches triples of these contexts.
+
+.. note:: the type pattern uses the asserted rdf:type (no subclasses, no reasoning)
+.. todo:: - OPTIONAL, ORDER BY
+________________________________________________________________________
+"""
+
+import re
+import logging
+from collections import namedtuple, OrderedDict
+
+from owlready2.util import locstr
+from owlready2.base import to_literal, from_literal, rdf_type, owl_data_property, owl_object_property
+
+logger = logging.getLogger(__name__)
+
+PO_INDEX_SQL = "CREATE INDEX IF NOT EXISTS lodev_datas_pos ON datas(p, o, s)"
+
+DEFAULT_PREFIXES = {
+    'rdf': 'http://www.w3.org/1999/02/22-rdf-syntax-ns#',
+    'rdfs': 'http://www.w3.org/2000/01/rdf-schema#',
+    'xsd': 'http://www.w3.org/2001/XMLSchema#',
+    'owl': 'http://www.w3.org/2002/07/owl#',
+}
+
+RDF_TYPE_IRI = DEFAULT_PREFIXES['rdf'] + 'type'
+XSD = DEFAULT_PREFIXES['xsd']
+XSD_STRING = to_literal('')[1]  # owlready2 datatype of xsd:string, plain literals: 0
+
+COMPARISON_OPERATORS = {'=': '=', '!=': '!=', '<': '<', '<=': '<=', '>': '>', '>=': '>='}
+MIRRORED_OPERATORS = {'=': '=', '!=': '!=', '<': '>', '<=': '>=', '>': '<', '>=': '<='}
+
+TOKEN_PATTERN = re.compile(r'''
+      (?P<iri><[^\s<>"]*>)
+    | (?P<string>"(?:[^"\\]|\\.)*"(?:@[\w-]+|\^\^\S+)?)
+    | (?P<number>[+-]?(?:\d+\.\d*|\.\d+|\d+)(?:[eE][+-]?\d+)?)
+    | (?P<var>[?$]\w+)
+    | (?P<op>&&|\|\||<=|>=|!=|=|<|>)
+    | (?P<punct>[{}().;,*])
+    | (?P<name>[A-Za-z_][\w-]*(?::(?:[\w-]|\.(?=[\w-]))*)?|:(?:[\w-]|\.(?=[\w-]))*)
+    | (?P<space>\s+|\#[^\n]*)
+''', re.VERBOSE)
+
+# escape sequences of SPARQL string literals: ECHAR and UCHAR (\uXXXX, \UXXXXXXXX)
+ESCAPE_PATTERN = re.compile(r'\\[tnrbf"\'\\]|\\u[0-9A-Fa-f]{4}|\\U[0-9A-Fa-f]{8}')
+ECHARS = {'t': '\t', 'n': '\n', 'r': '\r', 'b': '\b', 'f': '\f', '"': '"', "'": "'", '\\': '\\'}
+
+# pattern: predicate IRI, object variable (or None), object literal (or None)
+# datatypes: per pattern the datatype IRI / '@language' of its literal (or None)
+StarPattern = namedtuple('StarPattern', ['subject', 'types', 'patterns', 'filters', 'select', 'distinct', 'limit',
+                                         'datatypes'])
+# raw_sql: the same query with the IRIs of the subjects (resources table) instead of their storids
+QueryPlan = namedtuple('QueryPlan', ['sql', 'params', 'columns', 'raw_sql'])
+
+
+class UnsupportedQuery(Exception):
+    """the query is not a star / filter pattern over datatype properties"""
+
+
+def tokenize(query: str) -> list:
+    tokens = []
+    position = 0
+    while position < len(query):
+        match = TOKEN_PATTERN.match(query, position)
+        if match is None:
+            raise UnsupportedQuery(f"unexpected character at {position}: {query[position:position + 10]!r}")
+        position = match.end()
+        if match.lastgroup != 'space':
+            tokens.append((match.lastgroup, match.group()))
+    return tokens
+
+
+def literal_type_condition(alias: str, value, datatype=None) -> tuple:
+    """SQL condition restricting the literals of a datas alias to the type of value, like rdflib:
+    a triple pattern literal only matches literals of its datatype / language (RDF term equality),
+    FILTERs compare numbers of all numeric datatypes by value and strings only with strings of
+    the same language (no language: plain and xsd:string literals)
+
+    :param datatype: owlready2 datatype (storid or '@language') of a triple pattern literal, None: FILTER
+    :return: SQL, params
+    """
+    if datatype is None:
+        if isinstance(value, bool):
+            return f"{alias}.d = ?", [to_literal(value)[1]]
+        if isinstance(value, (int, float)):  # integer, double, decimal, ... compare by value
+            return f"typeof({alias}.o) IN ('integer', 'real')", []
+        datatype = to_literal(value)[1]
+    if isinstance(datatype, str):  # language tags are case insensitive
+        return f"lower({alias}.d) = ?", [datatype.lower()]
+    if datatype == XSD_STRING:
+        return f"{alias}.d IN (0, ?)", [datatype]
+    return f"{alias}.d = ?", [datatype]
+
+
+def unescape(match) -> str:
+    """character of a SPARQL escape sequence (ECHAR or UCHAR, see ESCAPE_PATTERN)"""
+    escape = match.group()
+    return ECHARS[escape[1]] if escape[1] in ECHARS else chr(int(escape[2:], 16))
+
+
+def parse_literal(kind: str, text: str):
+    """python value of a SPARQL literal token, language tagged strings as locstr"""
+    if kind == 'number':
+        return float(text) if any(c in text for c in '.eE') else int(text)
+    if kind == 'name' and text in ('true', 'false'):
+        return text == 'true'
+    if kind == 'string':
+        match = re.match(r'"((?:[^"\\]|\\.)*)"(?:@([\w-]+)|\^\^(\S+))?$', text)
+        value = ESCAPE_PATTERN.sub(unescape, match.group(1)) if '\\' in match.group(1) else match.group(1)
+        datatype = match.group(3) or ''
+        if match.group(2):
+            return locstr(value, match.group(2))
+        if datatype.endswith(('integer>', ':integer', 'int>', ':int')):
+            return int(value)
+        if datatype.endswith(('double>', ':double', 'float>', ':float', 'decimal>', ':decimal')):
+            return float(value)
+        if datatype.endswith(('boolean>', ':boolean')):
+            return value == 'true'
+        return value
+    raise UnsupportedQuery(f"not a literal: {text}")
+
+
+def literal_datatype(kind: str, text: str, prefixes: dict) -> str:
+    """datatype IRI of a SPARQL literal token, '@language' for language tagged strings"""
+    if kind == 'number':
+        return XSD + ('double' if any(c in text for c in 'eE') else 'decimal' if '.' in text else 'integer')
+    if kind == 'name':
+        return XSD + 'boolean'
+    match = re.match(r'"(?:[^"\\]|\\.)*"(?:@([\w-]+)|\^\^(\S+))?$', text)
+    if match.group(1):
+        return '@' + match.group(1)
+    datatype = match.group(2)
+    if datatype is None:
+        return XSD + 'string'
+    if datatype.startswith('<'):
+        return datatype[1:-1]
+    prefix, local = datatype.split(':', 1)
+    if prefix not in prefixes:
+        raise UnsupportedQuery(f"unknown prefix {prefix}")
+    return prefixes[prefix] + local
+
+
+class _Parser:
+    def __init__(self, tokens: list, prefixes: dict) -> None:
+        self.tokens = tokens
+        self.position = 0
+        self.prefixes = dict(prefixes)
+        self.datatypes = []  # per pattern: datatype of its literal (see literal_datatype) or None
+
+    def peek(self, offset: int = 0):
+        index = self.position + offset
+        return self.tokens[index] if index < len(self.tokens) else (None, None)
+
+    def next(self):
+        token = self.peek()
+        if token[0] is None:
+            raise UnsupportedQuery("unexpected end of query")
+        self.position += 1
+        return token
+
+    def expect(self, text: str) -> None:
+        kind, value = self.next()
+        if value.upper() != text.upper():
+            raise UnsupportedQuery(f"expected {text}, found {value}")
+
+    def accept(self, text: str) -> bool:
+        if (self.peek()[1] or '').upper() == text.upper():
+            self.position += 1
+            return True
+        return False
+
+    def iri(self, kind: str, text: str) -> str:
+        if kind == 'iri':
+            return text[1:-1]
+        if kind == 'name' and ':' in text:
+            prefix, local = text.split(':', 1)
+            if prefix not in self.prefixes:
+                raise UnsupportedQuery(f"unknown prefix {prefix}")
+            return self.prefixes[prefix] + local
+        if kind == 'name' and text == 'a':
+            return RDF_TYPE_IRI
+        raise UnsupportedQuery(f"not an IRI: {text}")
+
+    def parse(self) -> StarPattern:
+        self.prefix_declarations()
+        distinct, select = self.select_clause()
+        self.accept('WHERE')
+        self.expect('{')
+        subject, types, patterns, filters = self.group_pattern()
+        limit = self.solution_modifiers()
+        if subject is None or not (patterns or types):
+            raise UnsupportedQuery("empty pattern")
+        if select == ['*']:
+            select = [subject] + [var for _, var, _ in patterns if var is not None]
+        return StarPattern(subject, types, patterns, filters, select, distinct, limit, self.datatypes)
+
+    def prefix_declarations(self) -> None:
+        while self.accept('PREFIX'):
+            kind, name = self.next()
+            kind, iri = self.next()
+            self.prefixes[name.rstrip(':')] = iri[1:-1]
+
+    def select_clause(self) -> tuple:
+        """distinct, list of select variables (or ['*'])"""
+        self.expect('SELECT')
+        distinct = self.accept('DISTINCT')
+        select = []
+        while self.peek()[0] == 'var' or self.peek()[1] == '*':
+            select.append(self.next()[1].lstrip('?$'))
+        if not select:
+            raise UnsupportedQuery("no select variables")
+        return distinct, select
+
+    def group_pattern(self) -> tuple:
+        """triple patterns and filters up to the closing brace: subject, types, patterns, filters"""
+        subject, types, patterns, filters = None, [], [], []
+        while not self.accept('}'):
+            if self.accept('FILTER'):
+                self.expect('(')
+                filters.extend(self.filter_expression())
+                self.expect(')')
+                self.accept('.')
+                continue
+            kind, text = self.next()
+            if kind != 'var' or (subject is not None and text[1:] != subject):
+                raise UnsupportedQuery("not a star pattern")
+            subject = text[1:]
+            self.predicate_object_list(types, patterns)
+            self.accept('.')
+        return subject, types, patterns, filters
+
+    def predicate_object_list(self, types: list, patterns: list) -> None:
+        """predicate-object list of the subject ('p1 o1, o2 ; p2 o3'), appended to types and patterns"""
+        while True:
+            predicate = self.iri(*self.next())
+            while True:
+                kind, text = self.next()
+                if predicate == RDF_TYPE_IRI:
+                    types.append(self.iri(kind, text))
+                elif kind == 'var':
+                    patterns.append((predicate, text[1:], None))
+                    self.datatypes.append(None)
+                else:
+                    patterns.append((predicate, None, parse_literal(kind, text)))
+                    self.datatypes.append(literal_datatype(kind, text, self.prefixes))
+                if not self.accept(','):
+                    break
+            if not self.accept(';') or self.peek()[1] in ('.', '}'):
+                break
+
+    def solution_modifiers(self) -> int:
+        """LIMIT (or None), other modifiers are not supported"""
+        limit = None
+        if self.accept('LIMIT'):
+            limit = int(self.next()[1])
+        if self.peek()[0] is not None:
+            raise UnsupportedQuery(f"unsupported solution modifier: {self.peek()[1]}")
+        return limit
+
+    def filter_expression(self) -> list:
+        """conjunction of comparisons: list of (variable, operator, value)"""
+        comparisons = [self.comparison()]
+        while self.accept('&&'):
+            comparisons.append(self.comparison())
+        return [c for group in comparisons for c in group]
+
+    def comparison(self) -> list:
+        if self.accept('('):
+            comparisons = self.filter_expression()
+            self.expect(')')
+            return comparisons
+        left, (op_kind, op), right = self.next(), self.next(), self.next()
+        if op_kind != 'op' or op not in COMPARISON_OPERATORS:
+            raise UnsupportedQuery(f"unsupported filter operator {op}")
+        if left[0] == 'var' and right[0] != 'var':
+            return [(left[1][1:], op, parse_literal(*right))]
+        if right[0] == 'var' and left[0] != 'var':
+            return [(right[1][1:], MIRRORED_OPERATORS[op], parse_literal(*left))]
+        raise UnsupportedQuery("unsupported filter")
+
+
+def parse_star_query(query: str, prefixes: dict = None) -> StarPattern:
+    """parsing a star / filter SPARQL query, raises UnsupportedQuery for other queries"""
+    return _Parser(tokenize(query), {**DEFAULT_PREFIXES, **(prefixes or {})}).parse()
+
+
+class DeviceQueryPlanner:
+    def __init__(self, emmo_world=None, prefixes: dict = None, max_plans: int = 256,
+                 create_index: bool = True, change_feed=None) -> None:
+        """Star pattern query compiler with plan cache and SPARQL fallback
+
+        :param prefixes: additional prefixes, e.g. {'lodev': TBox base IRI}
+        :param create_index: create the (p, o) index of the datas table
+        :param change_feed: ChangeFeed, device changes drop the predicate statistics of the next compiled plans
+        """
+        self.emmo_world = emmo_world
+        self.prefixes = {**DEFAULT_PREFIXES, **(prefixes or {})}
+        self.max_plans = max_plans
+        self.plans = OrderedDict()  # query text: QueryPlan (None: fallback)
+        self._predicate_counts = None
+        self._datatype_predicates = {}  # predicate storid: datatype property (values in datas)
+        self.contexts = None  # contexts (ontology graph c) of all matched triples, None: all
+        self.excluded_contexts = ()  # contexts of triples, that are never matched
+        if create_index:
+            emmo_world.graph.db.execute(PO_INDEX_SQL)
+        if change_feed is not None:
+            change_feed.add_listener(self._on_changes)
+
+    def _on_changes(self, events) -> None:
+        """statistics are recounted when the next query is compiled, the cached plans are kept:
+        they only depend on the TBox (predicates, datatypes), see invalidate for schema changes"""
+        self._predicate_counts = None
+
+    def set_contexts(self, contexts=None, excluded_contexts=()) -> None:
+        """restricting the planned queries to the triples of some contexts (not the SPARQL fallback)
+
+        :param contexts: contexts (ontology.graph.c) of the matched triples, None: all contexts
+        :param excluded_contexts: contexts of triples, that are never matched
+        """
+        self.contexts = None if contexts is None else tuple(contexts)
+        self.excluded_contexts = tuple(excluded_contexts)
+        self.plans.clear()
+
+    def _context_condition(self, alias: str) -> tuple:
+        """SQL conditions restricting a table alias to the contexts of the planner: list of SQL, params"""
+        clauses, params = [], []
+        if self.contexts is not None:
+            clauses.append(f"{alias}.c IN ({','.join('?' * len(self.contexts))})" if self.contexts else '0')
+            params.extend(self.contexts)
+        if self.excluded_contexts:
+            clauses.append(f"{alias}.c NOT IN ({','.join('?' * len(self.excluded_contexts))})")
+            params.extend(self.excluded_contexts)
+        return clauses, params
+
+    def _selectivity(self, pattern: tuple, filtered: set) -> tuple:
+        """sort key: literal values first, then filtered variables, then the rarest predicates"""
+        if self._predicate_counts is None:
+            self._predicate_counts = dict(self.emmo_world.graph.db.execute("SELECT p, COUNT(*) FROM datas GROUP BY p"))
+        predicate_storid, var, value, _ = pattern
+        rank = 0 if value is not None else 1 if var in filtered else 2
+        return rank, self._predicate_counts.get(predicate_storid, 0)
+
+    def _is_datatype_predicate(self, storid: int) -> bool:
+        """declared owl:DatatypeProperty, or a property with literal values that is no owl:ObjectProperty
+        (e.g. annotations)"""
+        if storid not in self._datatype_predicates:
+            db = self.emmo_world.graph.db
+            types = {o for (o,) in db.execute("SELECT o FROM objs WHERE s = ? AND p = ?", (storid, rdf_type))}
+            if owl_data_property in types:
+                self._datatype_predicates[storid] = True
+            else:
+                self._datatype_predicates[storid] = owl_object_property not in types and db.execute(
+                    "SELECT 1 FROM datas WHERE p = ? LIMIT 1", (storid,)).fetchone() is not None
+        return self._datatype_predicates[storid]
+
+    def compile(self, star: StarPattern) -> QueryPlan:
+        """SQL plan of a star pattern, None if a predicate or class is unknown (empty result),
+        raises UnsupportedQuery for predicates that are no datatype properties"""
+        world = self.emmo_world
+        patterns = self._pattern_storids(star)
+        type_storids = [world._abbreviate(iri, False) for iri in star.types]
+        if patterns is None or None in type_storids:
+            return None
+
+        filtered = {var for var, _, _ in star.filters}
+        patterns.sort(key=lambda pattern: self._selectivity(pattern, filtered))
+
+        # first pattern (or type pattern): driving table, the other patterns are joined on its subject
+        subject_column = 't0.s' if patterns else 'y0.s'
+        tables, bound = self._pattern_tables(patterns)
+        tables += self._type_tables(type_storids, subject_column, first=not patterns)
+        for table, clauses, params in tables:
+            context_clauses, context_params = self._context_condition(table.split()[1])
+            clauses.extend(context_clauses)
+            params.extend(context_params)
+        conditions, where_params = tables[0][1], list(tables[0][2])
+        joins = [f"JOIN {table} ON " + ' AND '.join(clauses) for table, clauses, _ in tables[1:]]
+        join_params = [param for _, _, params in tables[1:] for param in params]
+
+        for var, op, value in star.filters:
+            if var not in bound:
+                raise UnsupportedQuery(f"filter on unbound variable ?{var}")
+            type_sql, type_params = literal_type_condition(bound[var], value)
+            conditions.extend([f"{bound[var]}.o {COMPARISON_OPERATORS[op]} ?", type_sql])
+            where_params.extend([to_literal(value)[0]] + type_params)
+
+        columns, select_sql = self._select_columns(star, bound, subject_column)
+        raw_select_sql = [f"(SELECT iri FROM resources WHERE storid = {subject_column})" if column == subject_column
+                          else column for column in select_sql]
+        body = f" FROM {tables[0][0]} {' '.join(joins)} WHERE {' AND '.join(conditions)}"
+        if star.limit is not None:
+            body += f" LIMIT {int(star.limit)}"
+        distinct = 'DISTINCT ' if star.distinct else ''
+        return QueryPlan(f"SELECT {distinct}{', '.join(select_sql)}{body}", join_params + where_params, columns,
+                         f"SELECT {distinct}{', '.join(raw_select_sql)}{body}")
+
+    def _pattern_storids(self, star: StarPattern) -> list:
+        """patterns with predicate storids and the owlready2 datatypes of their literals,
+        None if a predicate or datatype is unknown"""
+        patterns = []
+        for (predicate, var, value), datatype in zip(star.patterns, star.datatypes):
+            storid = self.emmo_world._abbreviate(predicate, False)
+            if storid is None:
+                return None
+            if not self._is_datatype_predicate(storid):
+                raise UnsupportedQuery(f"{predicate} is not a datatype property")
+            if datatype is not None and not datatype.startswith('@'):
+                datatype = self.emmo_world._abbreviate(datatype, False)
+                if datatype is None:
+                    return None
+            patterns.append((storid, var, value, datatype))
+        return patterns
+
+    @staticmethod
+    def _pattern_tables(patterns: list) -> tuple:
+        """datas table per pattern: list of (table, conditions, params), dict variable: alias of its table"""
+        tables = []
+        bound = {}  # variable: alias
+        for i, (storid, var, value, datatype) in enumerate(patterns):
+            alias = f"t{i}"
+            clauses = [f"{alias}.p = ?"]
+            params = [storid]
+            if i > 0:
+                clauses.insert(0, f"{alias}.s = t0.s")
+            if value is not None:
+                type_sql, type_params = literal_type_condition(alias, value, datatype)
+                clauses.extend([f"{alias}.o = ?", type_sql])
+                params.extend([to_literal(value)[0]] + type_params)
+            elif var in bound:
+                clauses.append(f"{alias}.o = {bound[var]}.o")
+            else:
+                bound[var] = alias
+            tables.append((f"datas {alias}", clauses, params))
+        return tables, bound
+
+    @staticmethod
+    def _type_tables(type_storids: list, subject_column: str, first: bool) -> list:
+        """objs table per rdf:type pattern: list of (table, conditions, params)
+
+        :param first: the first type pattern is the driving table (no datatype patterns)
+        """
+        tables = []
+        for i, storid in enumerate(type_storids):
+            alias = f"y{i}"
+            clauses = [f"{alias}.p = ?", f"{alias}.o = ?"]
+            if not (first and i == 0):
+                clauses.insert(0, f"{alias}.s = {subject_column}")
+            tables.append((f"objs {alias}", clauses, [rdf_type, storid]))
+        return tables
+
+    @staticmethod
+    def _select_columns(star: StarPattern, bound: dict, subject_column: str) -> tuple:
+        """column kinds ('subject', 'literal') and SQL expressions of the select variables"""
+        columns, select_sql = [], []
+        for var in star.select:
+            if var == star.subject:
+                columns.append('subject')
+                select_sql.append(subject_column)
+            elif var in bound:
+                columns.append('literal')
+                select_sql.extend([f"{bound[var]}.o", f"{bound[var]}.d"])
+            else:
+                raise UnsupportedQuery(f"unbound select variable ?{var}")
+        return columns, select_sql
+
+    def plan(self, query: str):
+        """cached plan of a query, None for queries of the general engine"""
+        if query in self.plans:
+            self.plans.move_to_end(query)
+            return self.plans[query]
+        try:
+            plan = self.compile(parse_star_query(query, self.prefixes))
+        except UnsupportedQuery as err:
+            logger.debug(f"query planner: fallback to SPARQL engine ({err})")
+            plan = None
+        else:
+            if plan is None:  # unknown predicate / class, not cached (might be defined later)
+                return QueryPlan(None, [], [], None)
+        self.plans[query] = plan
+        while len(self.plans) > self.max_plans:
+            self.plans.popitem(last=False)
+        return plan
+
+    def _sparql(self, query: str) -> list:
+        declared = set(re.findall(r'PREFIX\s+(\w*):', query, re.IGNORECASE))
+        prefix_lines = ''.join(f"PREFIX {prefix}: <{iri}>\n" for prefix, iri in self.prefixes.items()
+                               if prefix not in declared)
+        return list(self.emmo_world.sparql(prefix_lines + query))
+
+    def query(self, query: str, raw: bool = False) -> list:
+        """results of a SPARQL query as list of rows
+
+        :param raw: subjects as IRIs instead of owlready2 entities (no individuals are instantiated)
+        """
+        plan = self.plan(query)
+        if plan is None:
+            return self._sparql(query)
+        if plan.sql is None:
+            return []
+        world = self.emmo_world
+        cursor = world.graph.db.execute(plan.raw_sql if raw else plan.sql, plan.params)
+        if raw and 'literal' not in plan.columns:  # rows of IRIs, nothing to convert
+            return [list(values) for values in cursor]
+        rows = []
+        for values in cursor:
+            row, i = [], 0
+            for column in plan.columns:
+                if column == 'subject':
+                    # raw: the SQL selects the IRIs of the subjects (no lookups per row)
+                    row.append(values[i] if raw else world._get_by_storid(values[i]))
+                    i += 1
+                else:
+                    row.append(from_literal(values[i], values[i + 1]))
+                    i += 2
+            rows.append(row)
+        return rows
+
+    def explain(self, query: str) -> str:
+        """SQL of the plan and SQLite query plan, or 'SPARQL' for fallback queries"""
+        plan = self.plan(query)
+        if plan is None:
+            return 'SPARQL'
+        if plan.sql is None:
+            return 'EMPTY'
+        details = [row[-1] for row in self.emmo_world.graph.db.execute("EXPLAIN QUERY PLAN " + plan.sql, plan.params)]
+        return plan.sql + '\n' + '\n'.join(details)
+
+    def invalidate(self) -> None:
+        """dropping all plans and statistics, e.g. after schema changes or large imports"""
+        self.plans.clear()
+        self._predicate_counts = None
+        self._datatype_predicates.clear()
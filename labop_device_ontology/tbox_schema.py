@@ -0,0 +1,312 @@
+"""_____________________________________________________________________
+
+:PROJECT: LabOP Device Ontology
+
+* Declarative TBox property schema *
+
+:details:  compiler for the declarative device property schema (data/device_tbox_properties.csv).
+
+           Each row of the schema defines one property:
+             name, domain, range, functional, quantity (EMMO quantity class), description
+
+           domain / range are either 'Device', an EMMO class ('emmo:Length')
+           or a python datatype (float, int, str, bool).
+           quantity is informational, the compiler only checks it: it names the EMMO quantity
+           class of the values, for object properties it has to match the range
+           ('emmo:Length' - 'Length'), float properties keep their plain numeric range.
+           The description becomes the EMMO elucidation of the property, as the docstring
+           of a class-by-class property does on export (sync_attributes).
+
+           The compiler writes all properties into the quadstore with one bulk insert
+           (instead of one metaclass construction per property) and generates the
+           typed device record, that is used to read devices from the quadstore
+           without instantiating owlready2 individuals.
+
+           Quantity properties (Device -> emmo:Length, ...) point to EMMO quantity individuals
+           (hasNumericalPart -> Real with hasNumericalValue, hasReferenceUnit -> unit), their
+           tolerances (hasLengthTolerance, ...) are properties of the quantity individual.
+           In device records (and catalogue columns) both are plain numbers, quantities
+           in the units of QUANTITY_UNITS.
+
+.. note:: -
+.. todo:: -
+________________________________________________________________________
+"""
+
+import os
+import csv
+import pathlib
+import logging
+from collections import namedtuple
+
+from owlready2.base import (to_literal, from_literal, _universal_datatype_2_abbrev, _universal_iri_2_abbrev,
+                            rdf_type, rdf_domain, rdf_range, owl_object_property, owl_data_property)
+
+from labop_device_ontology.low_memory import intern_value
+from labop_device_ontology.emmo_utils import en
+
+logger = logging.getLogger(__name__)
+
+# universal storids, that owlready2.base registers without module level names
+rdfs_label = _universal_iri_2_abbrev['http://www.w3.org/2000/01/rdf-schema#label']
+owl_functional_property = _universal_iri_2_abbrev['http://www.w3.org/2002/07/owl#FunctionalProperty']
+
+DEFAULT_SCHEMA_FILENAME = os.path.join(pathlib.Path(__file__).parent.resolve(), 'data', 'device_tbox_properties.csv')
+
+PYTHON_DATATYPES = {'float': float, 'int': int, 'str': str, 'bool': bool}
+
+PropertySpec = namedtuple('PropertySpec', ['name', 'domain', 'range', 'functional', 'quantity', 'description'])
+
+# unit of the catalogue columns and device record fields of the quantity properties
+QUANTITY_UNITS = {'Length': 'MilliMetre', 'Pressure': 'KiloPascal', 'Force': 'Newton'}
+
+# factors of the stored units to the units of QUANTITY_UNITS
+UNIT_FACTORS = {'MilliMetre': 1.0, 'Metre': 1000.0, 'KiloPascal': 1.0, 'Pascal': 0.001, 'Newton': 1.0}
+
+TOLERANCE_SUFFIX = 'Tolerance'
+
+
+def load_property_schema(schema_filename: str = None) -> list:
+    """reading the property schema
+
+    :param schema_filename: CSV schema file, default: data/device_tbox_properties.csv
+    :return: list of PropertySpec
+    """
+    with open(schema_filename or DEFAULT_SCHEMA_FILENAME, newline='', encoding='utf-8') as schema_file:
+        return [PropertySpec(name=row['name'],
+                             domain=row['domain'],
+                             range=row['range'],
+                             functional=row['functional'].strip().lower() in ('true', '1', 'yes'),
+                             quantity=row['quantity'] or None,
+                             description=row['description'])
+                for row in csv.DictReader(schema_file)]
+
+
+def python_datatype(spec: PropertySpec):
+    """python datatype of a datatype property, None for object properties"""
+    return PYTHON_DATATYPES.get(spec.range)
+
+
+def is_quantity_property(spec: PropertySpec) -> bool:
+    """object property of Device to an EMMO quantity individual (hasLength, ...)"""
+    return spec.domain == 'Device' and spec.range.startswith('emmo:') and spec.quantity is not None
+
+
+def tolerance_quantity(spec: PropertySpec) -> str:
+    """quantity property of a tolerance (hasLengthTolerance -> hasLength), None for other properties"""
+    if spec.domain.startswith('emmo:') and python_datatype(spec) is float and spec.name.endswith(TOLERANCE_SUFFIX):
+        return spec.name[:-len(TOLERANCE_SUFFIX)]
+    return None
+
+
+def record_datatype(spec: PropertySpec):
+    """python datatype of the device record field of a property, None for properties without field:
+    quantities and tolerances are numbers"""
+    if is_quantity_property(spec) or tolerance_quantity(spec) is not None:
+        return float
+    return python_datatype(spec) if spec.domain == 'Device' else None
+
+
+def compile_property_schema(ontology=None, specs: list = None, emmo=None, classes: dict = None) -> list:
+    """creating all properties of the schema with one bulk quadstore insert
+
+    :param ontology: target ontology (TBox)
+    :param specs: list of PropertySpec, default: the default schema
+    :param emmo: EMMO ontology, resolving 'emmo:' domains and ranges and providing the elucidation annotation
+    :param classes: dict name: class of TBox classes used as domain or range, e.g. {'Device': Device}
+    :return: list of the created owlready2 properties
+    """
+    specs = specs if specs is not None else load_property_schema()
+    classes = classes or {}
+    world = ontology.world
+    c = ontology.graph.c
+
+    def resolve(name):
+        if name.startswith('emmo:'):
+            entity = getattr(emmo, name[5:])
+        else:
+            entity = classes.get(name) or getattr(ontology, name)
+        if entity is None:
+            raise ValueError(f"TBox schema: unknown class '{name}'")
+        return entity.storid
+
+    for spec in specs:
+        if spec.quantity is not None and spec.range.startswith('emmo:') and spec.range != f"emmo:{spec.quantity}":
+            raise ValueError(f"TBox schema: quantity '{spec.quantity}' of {spec.name} does not match "
+                             f"its range '{spec.range}'")
+    elucidation = emmo.elucidation.storid
+
+    db = world.graph.db
+    storids = [world._abbreviate(ontology.base_iri + spec.name) for spec in specs]
+    # properties of a reopened (persistent) World are already stored
+    existing = {s for (s,) in db.execute(
+        f"SELECT DISTINCT s FROM objs WHERE c = ? AND p = ? AND s IN ({','.join('?' * len(storids))})",
+        [c, rdf_type] + storids)} if storids else set()
+
+    objs, datas = [], []
+    for spec, storid in zip(specs, storids):
+        if storid in existing:
+            continue
+        datatype = python_datatype(spec)
+
+        objs.append((c, storid, rdf_type, owl_data_property if datatype else owl_object_property))
+        if spec.functional:
+            objs.append((c, storid, rdf_type, owl_functional_property))
+        objs.append((c, storid, rdf_domain, resolve(spec.domain)))
+        objs.append((c, storid, rdf_range, _universal_datatype_2_abbrev[datatype] if datatype else resolve(spec.range)))
+        if spec.description:
+            o, d = to_literal(en(spec.description))
+            datas.append((c, storid, elucidation, o, d))
+
+    db.executemany("INSERT INTO objs (c, s, p, o) VALUES (?, ?, ?, ?)", objs)
+    db.executemany("INSERT INTO datas (c, s, p, o, d) VALUES (?, ?, ?, ?, ?)", datas)
+    logger.debug(f"TBox schema: {len(specs) - len(existing)} of {len(specs)} properties created, "
+                 f"{len(objs) + len(datas)} triples inserted")
+
+    # loading the python property objects registers the python names (device.hasX)
+    return [world._get_by_storid(storid) for storid in storids]
+
+
+# --- typed device records
+
+def device_record_fields(specs: list = None) -> list:
+    """names of the datatype, quantity and tolerance properties of Device, in schema order"""
+    specs = specs if specs is not None else load_property_schema()
+    return [spec.name for spec in specs if record_datatype(spec) is not None]
+
+
+def make_device_record_type(specs: list = None):
+    """generating the DeviceRecord namedtuple: iri + one field per device record property"""
+    fields = ['iri'] + device_record_fields(specs)
+    return namedtuple('DeviceRecord', fields, defaults=[None] * len(fields))
+
+
+DeviceRecord = make_device_record_type()
+
+
+def _add_value(values: dict, s: int, name: str, value, multi_valued: set) -> bool:
+    """adding a value to the record values of a device
+
+    :return: True, if it is a second value of a functional property (all values are kept as tuple,
+             reported by the 'functional' rule of the DeviceValidator)
+    """
+    device_values = values.setdefault(s, {})
+    if name in multi_valued:
+        device_values[name] = device_values.get(name, ()) + (value,)
+    elif name in device_values:
+        previous = device_values[name]
+        device_values[name] = (previous if type(previous) is tuple else (previous,)) + (value,)
+        return True
+    else:
+        device_values[name] = value
+    return False
+
+
+def _subject_filter(column: str, subject_storids) -> tuple:
+    if subject_storids is None:
+        return '', []
+    return f" AND {column} IN ({','.join('?' * len(subject_storids))})", list(subject_storids)
+
+
+def _property_storids(emmo_world, ontology, specs: list, names: set) -> tuple:
+    """storid: name of the datatype, quantity and tolerance properties among names"""
+    prop_storids, quantity_storids, tolerance_storids = {}, {}, {}
+    for spec in specs:
+        storid = emmo_world._abbreviate(ontology.base_iri + spec.name, False) if spec.name in names else None
+        if storid is None:
+            continue
+        if is_quantity_property(spec):
+            quantity_storids[storid] = spec.name
+        elif tolerance_quantity(spec) is not None:
+            tolerance_storids[storid] = spec.name
+        elif python_datatype(spec) is not None:
+            prop_storids[storid] = spec.name
+    return prop_storids, quantity_storids, tolerance_storids
+
+
+def _read_datatype_values(db, values: dict, prop_storids: dict, subject_storids, multi_valued: set,
+                          intern_strings: bool) -> int:
+    """adding the literal values of the datatype properties
+
+    :return: number of additional values of functional properties
+    """
+    if not prop_storids:
+        return 0
+    convert = (lambda o, d: intern_value(from_literal(o, d))) if intern_strings else from_literal
+    subject_sql, subject_params = _subject_filter('s', subject_storids)
+    conflicts = 0
+    for s, p, o, d in db.execute(f"SELECT s, p, o, d FROM datas WHERE p IN ({','.join('?' * len(prop_storids))})"
+                                 + subject_sql, list(prop_storids) + subject_params):
+        conflicts += _add_value(values, s, prop_storids[p], convert(o, d), multi_valued)
+    return conflicts
+
+
+def read_device_records(emmo_world=None, ontology=None, specs: list = None, subject_storids=None,
+                        record_type=None, intern_strings: bool = False, emmo=None) -> dict:
+    """bulk reading of device records from the quadstore, without instantiating individuals
+
+    :param ontology: TBox ontology defining the properties
+    :param subject_storids: restrict to these devices, default: all subjects with any device property
+    :param intern_strings: intern repeated short string values (low-memory mode)
+    :param emmo: EMMO ontology, resolving the numerical values and units of the quantity individuals,
+                 without EMMO the quantity and tolerance fields are None
+    :return: dict device iri: DeviceRecord, non-functional properties are tuples of values,
+             functional properties with more than one value as well
+    """
+    record_type = record_type or (make_device_record_type(specs) if specs is not None else DeviceRecord)
+    specs = specs if specs is not None else load_property_schema()
+    multi_valued = {spec.name for spec in specs if not spec.functional}
+    prop_storids, quantity_storids, tolerance_storids = _property_storids(emmo_world, ontology, specs,
+                                                                          set(record_type._fields[1:]))
+
+    if subject_storids is not None:
+        subject_storids = list(subject_storids)
+        if not subject_storids:
+            return {}
+    db = emmo_world.graph.db
+    values = {}
+    conflicts = _read_datatype_values(db, values, prop_storids, subject_storids, multi_valued, intern_strings)
+    if quantity_storids and emmo is not None:
+        conflicts += _read_quantities(db, emmo, values, quantity_storids, tolerance_storids, subject_storids,
+                                      multi_valued)
+    if conflicts:
+        logger.warning(f"device records: {conflicts} additional values of functional properties")
+
+    return {iri: record_type(iri=iri, **device_values)
+            for iri, device_values in ((emmo_world._unabbreviate(s), v) for s, v in values.items())}
+
+
+def _read_quantities(db, emmo, values: dict, quantity_storids: dict, tolerance_storids: dict, subject_storids,
+                     multi_valued: set) -> int:
+    """adding the numerical values (converted to QUANTITY_UNITS) and tolerances of the quantity individuals
+
+    :return: number of additional values of functional properties
+    """
+    unit_factors = {getattr(emmo, unit).storid: factor for unit, factor in UNIT_FACTORS.items()
+                    if getattr(emmo, unit, None) is not None}
+    quantity_sql = f"q.p IN ({','.join('?' * len(quantity_storids))})"
+    subject_sql, subject_params = _subject_filter('q.s', subject_storids)
+    conflicts = unknown_units = 0
+    for s, p, o, d, unit in db.execute(
+            "SELECT q.s, q.p, v.o, v.d, u.o FROM objs q "
+            "JOIN objs n ON n.s = q.o AND n.p = ? "
+            "JOIN datas v ON v.s = n.o AND v.p = ? "
+            "LEFT JOIN objs u ON u.s = q.o AND u.p = ? "
+            f"WHERE {quantity_sql}{subject_sql}",
+            [emmo.hasNumericalPart.storid, emmo.hasNumericalValue.storid, emmo.hasReferenceUnit.storid]
+            + list(quantity_storids) + subject_params):
+        factor = 1.0 if unit is None else unit_factors.get(unit)  # no unit: QUANTITY_UNITS
+        if factor is None:
+            unknown_units += 1
+            continue
+        conflicts += _add_value(values, s, quantity_storids[p], from_literal(o, d) * factor, multi_valued)
+    if unknown_units:
+        logger.warning(f"device records: {unknown_units} quantity values in unknown units skipped")
+
+    if tolerance_storids:
+        for s, p, o, d in db.execute(
+                "SELECT q.s, t.p, t.o, t.d FROM objs q JOIN datas t ON t.s = q.o "
+                f"WHERE {quantity_sql} AND t.p IN ({','.join('?' * len(tolerance_storids))}){subject_sql}",
+                list(quantity_storids) + list(tolerance_storids) + subject_params):
+            conflicts += _add_value(values, s, tolerance_storids[p], from_literal(o, d), multi_valued)
+    return conflicts
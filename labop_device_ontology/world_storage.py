@@ -0,0 +1,140 @@
+"""_____________________________________________________________________
+
+:PROJECT: LabOP Device Ontology
+
+* Storage profiles of the persistent World *
+
+:details:  SQLite tuning of the owlready2 World database.
+
+           profiles:
+             default     - owlready2 settings
+             bulk_load   - large page cache, relaxed synchronous, in-memory journal;
+                           used with bulk_load(), which also defers the quadstore indexes
+                           and runs the import in a single transaction, the pragmas of the
+                           previous profile are restored afterwards
+             wal         - write-ahead log for concurrent readers after the import
+             low_memory  - small page cache, temporary tables on disk
+
+           compact() runs ANALYZE, REINDEX and VACUUM to shrink the database file
+           and refresh the query planner statistics.
+
+.. note:: -
+.. todo:: -
+________________________________________________________________________
+"""
+
+import time
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+STORAGE_PROFILES = {
+    'default': {},
+    'bulk_load': {'synchronous': 'OFF', 'journal_mode': 'MEMORY', 'cache_size': -512 * 1024,  # 512 MB
+                  'temp_store': 'MEMORY'},
+    'wal': {'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'cache_size': -64 * 1024},
+    'low_memory': {'cache_size': -8 * 1024, 'temp_store': 'FILE'},
+}
+
+# quadstore tables, whose indexes are deferred during bulk loading
+# (the resources table keeps its indexes, IRI abbreviation depends on them)
+QUADSTORE_TABLES = ('objs', 'datas')
+
+
+def _commit(emmo_world) -> None:
+    if emmo_world.graph.db.in_transaction:
+        emmo_world.graph.db.commit()
+
+
+def apply_profile(emmo_world=None, profile: str = 'default') -> None:
+    """setting the SQLite pragmas of a storage profile,
+    commits the World (journal mode and synchronous cannot be changed within a transaction)"""
+    if profile not in STORAGE_PROFILES:
+        raise ValueError(f"unknown storage profile '{profile}', valid profiles: {', '.join(STORAGE_PROFILES)}")
+    db = emmo_world.graph.db
+    if STORAGE_PROFILES[profile]:
+        _commit(emmo_world)
+    for pragma, value in STORAGE_PROFILES[profile].items():
+        db.execute(f"PRAGMA {pragma} = {value}")
+    logger.debug(f"storage profile '{profile}' applied")
+
+
+def current_pragmas(emmo_world=None, pragmas=None) -> dict:
+    """current values of SQLite pragmas, default: the pragmas of the bulk_load profile"""
+    db = emmo_world.graph.db
+    return {pragma: db.execute(f"PRAGMA {pragma}").fetchone()[0]
+            for pragma in (pragmas if pragmas is not None else STORAGE_PROFILES['bulk_load'])}
+
+
+def restore_pragmas(emmo_world=None, pragmas: dict = None) -> None:
+    """setting pragma values read by current_pragmas, commits the World"""
+    _commit(emmo_world)
+    for pragma, value in pragmas.items():
+        emmo_world.graph.db.execute(f"PRAGMA {pragma} = {value}")
+
+
+@contextmanager
+def bulk_load(emmo_world=None, defer_indexes: bool = True, final_profile: str = None):
+    """context for large imports: bulk_load profile, deferred quadstore indexes, one transaction
+
+        with bulk_load(world):
+            import_csv_parallel(...)
+
+    :param final_profile: profile applied after the import, default: the pragmas before the import are restored
+    """
+    db = emmo_world.graph.db
+    _commit(emmo_world)
+    previous_pragmas = current_pragmas(emmo_world)
+    apply_profile(emmo_world, 'bulk_load')
+
+    indexes = []
+    if defer_indexes:
+        indexes = db.execute(f"SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL "
+                             f"AND tbl_name IN ({','.join('?' * len(QUADSTORE_TABLES))})", QUADSTORE_TABLES).fetchall()
+        for name, _ in indexes:
+            db.execute(f"DROP INDEX IF EXISTS {name}")
+        logger.debug(f"bulk load: {len(indexes)} indexes deferred")
+
+    db.execute("SAVEPOINT lodev_bulk_load")
+    try:
+        yield emmo_world
+        db.execute("RELEASE SAVEPOINT lodev_bulk_load")
+    except BaseException:
+        db.execute("ROLLBACK TO SAVEPOINT lodev_bulk_load")
+        db.execute("RELEASE SAVEPOINT lodev_bulk_load")
+        raise
+    finally:
+        start = time.perf_counter()
+        for _, sql in indexes:
+            db.execute(sql)
+        if indexes:
+            logger.debug(f"bulk load: indexes rebuilt in {time.perf_counter() - start:.2f} s")
+        _commit(emmo_world)
+        if final_profile is not None:
+            apply_profile(emmo_world, final_profile)
+        else:
+            restore_pragmas(emmo_world, previous_pragmas)
+
+
+def database_size(emmo_world=None) -> int:
+    """size of the World database in bytes"""
+    db = emmo_world.graph.db
+    return db.execute("PRAGMA page_count").fetchone()[0] * db.execute("PRAGMA page_size").fetchone()[0]
+
+
+def compact(emmo_world=None) -> tuple:
+    """ANALYZE, REINDEX and VACUUM of the World database
+
+    :return: database size in bytes before and after compaction
+    """
+    db = emmo_world.graph.db
+    size_before = database_size(emmo_world)
+    _commit(emmo_world)
+    db.execute("ANALYZE")
+    db.execute("REINDEX")
+    _commit(emmo_world)
+    db.execute("VACUUM")
+    size_after = database_size(emmo_world)
+    logger.info(f"database compacted: {size_before / 2 ** 20:.1f} MB -> {size_after / 2 ** 20:.1f} MB")
+    return size_before, size_after
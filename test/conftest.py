@@ -0,0 +1,47 @@
+"""_____________________________________________________________________
+
+:PROJECT: LabOP Device Ontology
+
+* Test fixtures *
+
+:details:  LabwareInterface on a minimal EMMO stand-in (test/data/emmo_minimal.ttl,
+           only the quantity, unit and substance classes used by the device ontology),
+           so that the tests run offline, and synthetic device catalogues
+           (see benchmarks/synthetic_catalogue.py).
+
+.. note:: -
+.. todo:: -
+________________________________________________________________________
+"""
+
+import os
+import sys
+import pathlib
+
+import pytest
+
+TEST_DIR = pathlib.Path(__file__).parent.resolve()
+EMMO_FILENAME = str(TEST_DIR / 'data' / 'emmo_minimal.ttl')
+
+sys.path.insert(0, str(TEST_DIR.parent / 'benchmarks'))
+
+from synthetic_catalogue import write_synthetic_catalogue  # noqa: E402
+
+from labop_device_ontology.labop_device_ontology_impl import LabwareInterface  # noqa: E402
+
+
+@pytest.fixture
+def emmo_filename() -> str:
+    return EMMO_FILENAME
+
+
+@pytest.fixture
+def lodev() -> LabwareInterface:
+    """LabwareInterface with an in-memory World"""
+    return LabwareInterface(emmo_filename=EMMO_FILENAME)
+
+
+@pytest.fixture
+def catalogue(tmp_path) -> str:
+    """synthetic catalogue CSV file of 200 devices"""
+    return write_synthetic_catalogue(os.path.join(tmp_path, 'catalogue.csv'), num_devices=200)
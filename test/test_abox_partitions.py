@@ -0,0 +1,90 @@
+"""_____________________________________________________________________
+
+:PROJECT: LabOP Device Ontology
+
+* Tests: partitioned device ABox *
+
+:details:  partitioned import, stored partitions loaded lazily with change events
+           for the indices and the payload cache, partition pruning of queries.
+
+.. note:: -
+.. todo:: -
+________________________________________________________________________
+"""
+
+import os
+import json
+
+import pytest
+
+from labop_device_ontology.abox_partitions import partition_slug
+from labop_device_ontology.parallel_import import read_catalogue
+from labop_device_ontology.labop_device_ontology_impl import LabwareInterface
+
+VENDOR_QUERY = 'SELECT ?d WHERE { ?d lodev:hasVendorName "%s" . }'
+
+
+@pytest.fixture
+def partition_dir(lodev, catalogue, tmp_path) -> str:
+    """partitions of the catalogue, stored by vendor"""
+    partition_dir = os.path.join(tmp_path, 'partitions')
+    lodev.enable_partitioning(key='vendor', partition_dir=partition_dir)
+    lodev.import_csv_parallel(catalogue, processes=1)
+    lodev.abox_partitions.store()
+    return partition_dir
+
+
+@pytest.fixture
+def stored_lodev(emmo_filename, partition_dir) -> LabwareInterface:
+    """fresh LabwareInterface on the stored partitions, nothing loaded yet"""
+    lodev = LabwareInterface(emmo_filename=emmo_filename)
+    lodev.enable_partitioning(key='vendor', partition_dir=partition_dir)
+    return lodev
+
+
+def test_partitioned_import(lodev, catalogue, partition_dir):
+    rows = read_catalogue(catalogue)
+    vendors = {partition_slug(row['hasVendorName']) for row in rows}
+
+    assert lodev.abox_partitions.stored_partitions() == sorted(vendors)
+    assert sum(len(records) for records in (lodev.abox_partitions.devices([vendor]) for vendor in vendors)) == 200
+
+
+def test_loaded_partitions_reach_the_change_feed_listeners(stored_lodev, catalogue):
+    row = read_catalogue(catalogue)[0]
+    partition = partition_slug(row['hasVendorName'])
+    assert not stored_lodev.search_index.lookup_code(row['hasEAN'])
+    events = []
+    stored_lodev.change_feed.add_listener(events.extend)
+
+    stored_lodev.abox_partitions.get(partition)
+
+    assert events and {event.operation for event in events} == {'insert'}
+    assert stored_lodev.search_index.lookup_code(row['hasEAN'])
+    iri = stored_lodev.search_index.lookup_code(row['hasEAN'])[0]
+    assert json.loads(stored_lodev.devices_json([iri]))[0]['hasVendorName'] == row['hasVendorName']
+
+    num_loaded = len(events)
+    stored_lodev.abox_partitions.unload(partition)
+    assert not stored_lodev.search_index.lookup_code(row['hasEAN'])
+    assert [event.operation for event in events[num_loaded:]] == ['delete'] * num_loaded
+    # loading and unloading are no device mutations: nothing for the feed consumers
+    assert stored_lodev.change_feed.last_seq() == 0
+    assert not stored_lodev.change_feed.read(0)
+
+
+def test_query_loads_only_the_partitions_of_the_query(lodev, stored_lodev, catalogue):
+    vendor = read_catalogue(catalogue)[0]['hasVendorName']
+
+    rows = stored_lodev.query(VENDOR_QUERY % vendor, raw=True)
+
+    assert list(stored_lodev.abox_partitions.loaded) == [partition_slug(vendor)]
+    assert sorted(rows) == sorted(lodev.query(VENDOR_QUERY % vendor, raw=True))
+    assert rows
+
+
+def test_query_without_partition_key_loads_all_partitions(stored_lodev):
+    rows = stored_lodev.query("SELECT ?d WHERE { ?d lodev:hasNumWells ?wells . }", raw=True)
+
+    assert sorted(stored_lodev.abox_partitions.loaded) == stored_lodev.abox_partitions.stored_partitions()
+    assert len(rows) == 200
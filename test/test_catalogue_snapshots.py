@@ -0,0 +1,112 @@
+"""_____________________________________________________________________
+
+:PROJECT: LabOP Device Ontology
+
+* Tests: versioned catalogue snapshots *
+
+:details:  recording, manifests, version order and structural diffs of snapshots.
+
+.. note:: -
+.. todo:: -
+________________________________________________________________________
+"""
+
+import os
+
+import pytest
+import rdflib
+
+from labop_device_ontology.catalogue_snapshots import SnapshotStore, version_key, nt_term
+
+EX = rdflib.Namespace('http://www.example.org/devices#')
+
+
+def device_graph(devices: dict) -> rdflib.Graph:
+    """graph of devices {name: number of wells}, each with a blank node footprint"""
+    graph = rdflib.Graph()
+    for name, wells in devices.items():
+        footprint = rdflib.BNode()
+        graph.add((EX[name], rdflib.RDF.type, EX.Device))
+        graph.add((EX[name], EX.hasNumWells, rdflib.Literal(wells)))
+        graph.add((EX[name], EX.hasFootprint, footprint))
+        graph.add((footprint, EX.hasLength, rdflib.Literal(127.76)))
+    return graph
+
+
+def named(subjects) -> set:
+    """subjects of a diff without the canonical blank nodes"""
+    return {subject for subject in subjects if not subject.startswith('_:')}
+
+
+@pytest.fixture
+def store(tmp_path) -> SnapshotStore:
+    store = SnapshotStore(os.path.join(tmp_path, 'snapshots'))
+    store.record('0.9.0', 'labop_device_abox', graph=device_graph({'plate1': 96, 'plate2': 384}))
+    store.record('0.10.0', 'labop_device_abox', graph=device_graph({'plate1': 96, 'plate3': 24, 'plate2': 1536}))
+    return store
+
+
+def test_record_and_manifest(store, tmp_path):
+    sha256 = store.record('0.10.0', 'labop_device_tbox', graph=device_graph({}))
+    filename = os.path.join(tmp_path, 'tbox.ttl')
+    device_graph({'plate1': 96, 'plate2': 384}).serialize(filename, format='turtle')
+
+    manifest = store.manifest('0.10.0')
+    assert sorted(manifest) == ['labop_device_abox', 'labop_device_tbox']
+    assert manifest['labop_device_tbox'] == {'sha256': sha256, 'num_triples': 0}
+    assert manifest['labop_device_abox']['num_triples'] == 12
+    # canonical triples: blank node labels and the serialization do not change the hash
+    assert store.record('0.11.0', 'labop_device_abox', filename=filename) == \
+        store.manifest('0.9.0')['labop_device_abox']['sha256']
+    assert store.manifest('1.0.0') == {}
+
+
+def test_versions_sort_numerically(store):
+    store.record('0.10.0rc1', 'labop_device_abox', graph=device_graph({}))
+
+    assert store.versions() == ['0.9.0', '0.10.0rc1', '0.10.0']
+    assert sorted(['1.0.0', '0.10.0', '0.9.1', '0.10.0-dev'], key=version_key) == \
+        ['0.9.1', '0.10.0-dev', '0.10.0', '1.0.0']
+
+
+def test_diff(store):
+    diff = store.diff('0.9.0', '0.10.0', 'labop_device_abox')
+
+    assert named(diff.added) == {EX.plate3.n3()}
+    assert not diff.removed
+    assert named(diff.changed) == {EX.plate2.n3()}
+    assert diff.changed[EX.plate2.n3()][EX.hasNumWells.n3()] == ([nt_term(rdflib.Literal(384))],
+                                                                 [nt_term(rdflib.Literal(1536))])
+    assert store.diff('0.10.0', '0.10.0', 'labop_device_abox').empty
+
+
+def test_diff_of_multi_line_literals(store, tmp_path):
+    """multi-line literals (e.g. the contacts comment of the exports) are written on one line"""
+    old_comment = rdflib.Literal('Contacts:\nmark doerr\n"University" Greifswald\r\n\\', lang='en')
+    new_comment = rdflib.Literal('Contacts:\nmark doerr\nUniversity Greifswald\n', lang='en')
+    for version, comment in (('0.9.0', old_comment), ('0.10.0', new_comment)):
+        graph = device_graph({'plate1': 96})
+        graph.add((EX.plate1, rdflib.RDFS.comment, comment))
+        store.record(version, 'labop_device_tbox', graph=graph)
+
+    with open(os.path.join(tmp_path, 'snapshots', '0.9.0', 'labop_device_tbox.nt'), encoding='utf-8') as snapshot:
+        assert len(snapshot.readlines()) == 5
+    diff = store.diff('0.9.0', '0.10.0', 'labop_device_tbox')
+
+    assert named(diff.changed) == {EX.plate1.n3()}
+    assert diff.changed[EX.plate1.n3()] == {rdflib.RDFS.comment.n3(): ([nt_term(old_comment)], [nt_term(new_comment)])}
+    assert rdflib.Graph().parse(data=f"{EX.plate1.n3()} {rdflib.RDFS.comment.n3()} {nt_term(old_comment)} .",
+                                format='nt').value(EX.plate1, rdflib.RDFS.comment) == old_comment
+
+
+def test_diff_versions_reports_ontologies_of_one_version(store):
+    store.record('0.10.0', 'labop_device_abox_corning', graph=device_graph({'corning1': 96}))
+    store.record('0.9.0', 'labop_device_abox_nunc', graph=device_graph({'nunc1': 384}))
+
+    diffs = store.diff_versions('0.9.0', '0.10.0')
+
+    assert sorted(diffs) == ['labop_device_abox', 'labop_device_abox_corning', 'labop_device_abox_nunc']
+    assert named(diffs['labop_device_abox_corning'].added) == {EX.corning1.n3()}
+    assert len(diffs['labop_device_abox_corning'].added[EX.corning1.n3()]) == 3
+    assert named(diffs['labop_device_abox_nunc'].removed) == {EX.nunc1.n3()}
+    assert not diffs['labop_device_abox_nunc'].added and not diffs['labop_device_abox_nunc'].changed
@@ -0,0 +1,62 @@
+"""_____________________________________________________________________
+
+:PROJECT: LabOP Device Ontology
+
+* Tests: change feed of ABox mutations *
+
+:details:  events are written in the transactions of the World (WAL mode),
+           read-only consumers of the World database file.
+
+.. note:: -
+.. todo:: -
+________________________________________________________________________
+"""
+
+import os
+
+import pytest
+
+from labop_device_ontology.change_feed import ChangeFeed
+from labop_device_ontology.labop_device_ontology_impl import LabwareInterface
+
+
+@pytest.fixture
+def wal_lodev(tmp_path, emmo_filename) -> LabwareInterface:
+    return LabwareInterface(db_path=str(tmp_path), db_name='lodev.sqlite3', emmo_filename=emmo_filename,
+                            storage_profile='wal')
+
+
+def test_feed_is_rolled_back_with_the_devices(wal_lodev, catalogue):
+    wal_lodev.emmo_world.save()
+    db = wal_lodev.emmo_world.graph.db
+    db.execute("SAVEPOINT import_test")
+    wal_lodev.import_csv_parallel(catalogue, processes=1)
+    assert wal_lodev.change_feed.last_seq() == 200
+    db.execute("ROLLBACK TO SAVEPOINT import_test")
+    db.execute("RELEASE SAVEPOINT import_test")
+
+    assert wal_lodev.change_feed.last_seq() == 0
+    assert not list(wal_lodev.lodev_tbox.lodevt.Device.instances())
+
+
+def test_read_only_consumer(wal_lodev, catalogue, tmp_path):
+    wal_lodev.emmo_world.save()
+    device_iris = wal_lodev.import_csv_parallel(catalogue, processes=1)
+    consumer = ChangeFeed(filename=os.path.join(tmp_path, 'lodev.sqlite3'))
+    assert consumer.last_seq() == 0  # not committed yet
+
+    wal_lodev.emmo_world.save()
+    assert [event.iri for event in consumer.iterate(cursor=0)] == device_iris
+    assert [event.iri for event in consumer.read(cursor=150)] == device_iris[150:]
+
+
+def test_device_changed_and_delete_device(lodev, catalogue):
+    device_iris = lodev.import_csv_parallel(catalogue, processes=1)
+    device = lodev.emmo_world[device_iris[0]]
+    device.hasMaterial = ['polypropylene']
+    seq = lodev.device_changed(device)
+    delete_seq = lodev.delete_device(lodev.emmo_world[device_iris[1]])
+
+    assert delete_seq == seq + 1 == len(device_iris) + 2
+    assert [(event.operation, event.iri) for event in lodev.change_feed.read(cursor=len(device_iris))] == \
+        [('update', device_iris[0]), ('delete', device_iris[1])]
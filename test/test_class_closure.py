@@ -0,0 +1,79 @@
+"""_____________________________________________________________________
+
+:PROJECT: LabOP Device Ontology
+
+* Tests: precomputed class hierarchy closure *
+
+:details:  subclass / instance tests against the owlready2 class hierarchy,
+           subclass cycles and the rebuild of the cached closure after lazily
+           loaded partitions and catalogue versions were added.
+
+.. note:: -
+.. todo:: -
+________________________________________________________________________
+"""
+
+import os
+import types
+
+from owlready2.base import rdfs_subclassof
+
+from labop_device_ontology.federation import versioned_iri
+from labop_device_ontology.labop_device_ontology_impl import LabwareInterface
+
+
+def test_closure_matches_owlready(lodev, catalogue):
+    device_iris = lodev.import_csv_parallel(catalogue, processes=1)
+    Device = lodev.lodev_tbox.lodevt.Device
+    closure = lodev.class_hierarchy
+
+    subclasses = set(closure.entities(closure.subclasses(Device)))
+    assert subclasses == set(Device.descendants())
+    assert all(closure.is_subclass(subclass, Device) for subclass in subclasses)
+    assert not closure.is_subclass(Device, next(iter(subclasses - {Device})))
+    assert set(closure.entities(closure.superclasses(Device))) >= {Device, lodev.emmo.Device} - {None}
+    assert sorted(entity.iri for entity in lodev.devices_of_class(Device)) == sorted(device_iris)
+    assert closure.is_instance(device_iris[0], Device)
+
+
+def test_subclass_cycle(lodev):
+    lodevt = lodev.lodev_tbox.lodevt
+    with lodevt:
+        Rack = types.new_class('Rack', (lodevt.Device,))
+        Holder = types.new_class('Holder', (Rack,))
+    # mutual subclasses (equivalent classes), only in the quadstore - python classes can not be cyclic
+    lodevt._add_obj_triple_spo(Rack.storid, rdfs_subclassof, Holder.storid)
+    closure = lodev.class_hierarchy
+
+    assert closure.is_subclass(Rack, Holder) and closure.is_subclass(Holder, Rack)
+    assert closure.is_subclass(Holder, lodevt.Device)
+
+
+def test_rebuilt_after_partition_load(lodev, catalogue, emmo_filename, tmp_path):
+    partition_dir = os.path.join(tmp_path, 'partitions')
+    lodev.enable_partitioning(key='vendor', partition_dir=partition_dir)
+    lodev.import_csv_parallel(catalogue, processes=1)
+    lodev.abox_partitions.store()
+
+    stored_lodev = LabwareInterface(emmo_filename=emmo_filename)
+    stored_lodev.enable_partitioning(key='vendor', partition_dir=partition_dir)
+    Device = stored_lodev.lodev_tbox.lodevt.Device
+    assert stored_lodev.devices_of_class(Device) == []
+
+    partition = stored_lodev.abox_partitions.stored_partitions()[0]
+    stored_lodev.abox_partitions.get(partition)
+    assert len(stored_lodev.devices_of_class(Device)) == len(lodev.abox_partitions.devices([partition])) > 0
+
+
+def test_rebuilt_after_catalogue_version(lodev, catalogue, tmp_path):
+    lodev.import_csv_parallel(catalogue, processes=1)
+    lodev.export_ontologies(path=str(tmp_path), format='turtle')
+    Device = lodev.lodev_tbox.lodevt.Device
+    closure = lodev.class_hierarchy
+
+    lodev.add_catalogue_version('0.0.0', os.path.join(tmp_path, 'labop_device_tbox.ttl'),
+                                [os.path.join(tmp_path, 'labop_device_abox.ttl')])
+
+    assert lodev.class_hierarchy is not closure
+    assert len(lodev.class_hierarchy.instances_of(versioned_iri(Device.iri, '0.0.0'))) == 200
+    assert len(lodev.class_hierarchy.instances_of(Device)) == 200
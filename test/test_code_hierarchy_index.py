@@ -0,0 +1,51 @@
+"""_____________________________________________________________________
+
+:PROJECT: LabOP Device Ontology
+
+* Tests: classification code hierarchy index *
+
+:details:  incremental maintenance from the change feed matches a full rebuild.
+
+.. note:: -
+.. todo:: -
+________________________________________________________________________
+"""
+
+from labop_device_ontology.code_hierarchy_index import CodeHierarchyIndex, CODE_SCHEMES
+from labop_device_ontology.parallel_import import read_catalogue
+
+
+def index_state(code_index) -> dict:
+    return {scheme: {prefix: set(node.devices) for prefix, node in code_index.nodes[scheme].items()}
+            for scheme in CODE_SCHEMES}
+
+
+def rebuilt_state(lodev) -> dict:
+    code_index = CodeHierarchyIndex(emmo_world=lodev.emmo_world, lw_tbox=lodev.lodev_tbox)
+    code_index.rebuild()
+    return index_state(code_index)
+
+
+def test_import_updates_index(lodev, catalogue):
+    rows = read_catalogue(catalogue)
+    device_iris = lodev.import_csv_parallel(catalogue, processes=1)
+
+    expected = {iri for iri, row in zip(device_iris, rows) if row['hasUNSPSC'].startswith('4112')}
+    assert lodev.code_index.devices_under('4112') == expected
+    assert lodev.code_index.count('41') == len(device_iris)
+    assert index_state(lodev.code_index) == rebuilt_state(lodev)
+
+
+def test_changed_codes_move_and_deleted_devices_are_pruned(lodev, catalogue):
+    device_iris = lodev.import_csv_parallel(catalogue, processes=1)
+    device = lodev.emmo_world[device_iris[0]]
+    device.hasUNSPSC = '42-14-15-00'
+    device.hasEClass = None
+    lodev.device_changed(device)
+    lodev.delete_device(lodev.emmo_world[device_iris[1]])
+
+    assert lodev.code_index.devices_under('42141500') == {device_iris[0]}
+    assert lodev.code_index.facets('42') == {'4214': 1}
+    assert device_iris[0] not in lodev.code_index.devices_under('', scheme='eclass')
+    assert device_iris[1] not in lodev.code_index.devices_under('')
+    assert index_state(lodev.code_index) == rebuilt_state(lodev)
@@ -0,0 +1,86 @@
+"""_____________________________________________________________________
+
+:PROJECT: LabOP Device Ontology
+
+* Tests: deck layout and labware placement solver *
+
+:details:  height, stacking, gripping and pressure constraints, records with resolved quantities.
+
+.. note:: -
+.. todo:: -
+________________________________________________________________________
+"""
+
+import random
+import itertools
+
+from labop_device_ontology.deck_layout import DeckLayoutSolver, DeckPosition, PlacementItem, hungarian
+
+PLATE = {'hasHeight': 14.0, 'hasHightLidded': 16.5, 'hasHightStacked': 12.0, 'hasHightStackedLidded': 14.5,
+         'hasGrippingHeight': 7.0, 'hasGrippingHeightWithLid': 9.0, 'hasGrippingPressure': 50.0,
+         'isStackable': 'true'}
+
+
+def solver(**records) -> DeckLayoutSolver:
+    return DeckLayoutSolver(records=records, positions=[
+        DeckPosition('low', max_height=15.0),
+        DeckPosition('high', max_height=60.0, max_stack=4),
+        DeckPosition('gripper_low', max_height=60.0, max_gripping_height=6.0),
+        DeckPosition('hard_gripper', max_height=60.0, gripping_pressure=80.0),
+        DeckPosition('lidding', max_height=60.0, min_gripping_height=6.0, lidding=True),
+    ])
+
+
+def positions_of(deck: DeckLayoutSolver, item) -> set:
+    mask = deck.feasible_positions(item)
+    return {position.name for i, position in enumerate(deck.positions) if mask >> i & 1}
+
+
+def test_height_gripping_and_pressure_constraints():
+    deck = solver(plate=PLATE, unknown={})
+
+    assert positions_of(deck, PlacementItem('plate')) == {'low', 'high', 'lidding'}
+    assert positions_of(deck, PlacementItem('plate', lidded=True)) == {'high', 'lidding'}
+    assert positions_of(deck, PlacementItem('plate', count=3)) == {'high'}
+    # without data only positions without height limit, no gripping restrictions
+    assert positions_of(deck, PlacementItem('unknown')) == set()
+
+
+def test_lidding_gripping_height():
+    deck = solver(plate=dict(PLATE, hasGrippingHeightLidding=5.0))
+
+    assert positions_of(deck, PlacementItem('plate')) == {'low', 'high'}
+
+
+def test_optimal_assignment_and_layout_checks():
+    deck = solver(plate=PLATE, tall=dict(PLATE, hasHeight=40.0, hasHightLidded=42.0))
+
+    assignment = deck.solve([PlacementItem('plate'), PlacementItem('tall')])
+    assert [deck.positions[assignment[i]].name for i in range(2)] == ['low', 'high']
+    assert deck.check_layouts([{0: PlacementItem('plate')}, {0: PlacementItem('tall')}]) == [True, False]
+    assert deck.solve([PlacementItem('tall', count=2, lidded=True)] * 2) is None
+
+
+def test_device_records_of_the_catalogue(lodev, catalogue):
+    device_iris = lodev.import_csv_parallel(catalogue, processes=1)
+    deck = lodev.deck_layout_solver(positions=[DeckPosition('gripper', max_height=100.0, gripping_pressure=50.0)])
+
+    for iri in device_iris[:10]:
+        bounds = deck.bounds[iri]
+        assert abs(bounds.gripping_height - bounds.height / 2) < 0.01
+        assert deck.feasible_positions(PlacementItem(iri)) == (1 if bounds.max_gripping_pressure >= 50.0 else 0)
+
+
+def test_hungarian_is_optimal():
+    rng = random.Random(7)
+    for _ in range(200):
+        num_rows = rng.randint(1, 5)
+        num_cols = rng.randint(num_rows, 6)
+        cost = [[rng.randint(0, 20) for _ in range(num_cols)] for _ in range(num_rows)]
+
+        assignment = hungarian(cost)
+
+        assert len(set(assignment)) == num_rows
+        assert sum(cost[i][j] for i, j in enumerate(assignment)) == \
+            min(sum(cost[i][j] for i, j in enumerate(columns))
+                for columns in itertools.permutations(range(num_cols), num_rows))
@@ -0,0 +1,126 @@
+"""_____________________________________________________________________
+
+:PROJECT: LabOP Device Ontology
+
+* Tests: JSON device serialization and payload cache *
+
+:details:  payloads of imported catalogue devices conform to the JSON schema generated
+           from the TBox property schema and round trip through JSON;
+           cached payloads are invalidated by change feed events.
+
+.. note:: -
+.. todo:: -
+________________________________________________________________________
+"""
+
+import json
+
+import pytest
+
+from labop_device_ontology import device_serialization
+from labop_device_ontology.device_serialization import (DevicePayloadCache, device_json_schema,
+                                                        msgpack_array_header)
+
+JSON_CHECKS = {'number': lambda value: isinstance(value, (int, float)) and not isinstance(value, bool),
+               'integer': lambda value: isinstance(value, int) and not isinstance(value, bool),
+               'string': lambda value: isinstance(value, str),
+               'boolean': lambda value: isinstance(value, bool)}
+
+
+def check_schema(payload: dict, schema: dict) -> None:
+    """minimal JSON schema check of a device payload (types, required and additional properties)"""
+    properties = schema['properties']
+    assert set(schema['required']) <= set(payload)
+    assert set(payload) <= set(properties)
+    for name, value in payload.items():
+        json_property = properties[name]
+        if json_property['type'] == 'array':
+            assert isinstance(value, list)
+            assert all(JSON_CHECKS[json_property['items']['type']](item) for item in value), name
+        else:
+            assert JSON_CHECKS[json_property['type']](value), name
+
+
+@pytest.fixture
+def device_iris(lodev, catalogue) -> list:
+    return lodev.import_csv_parallel(catalogue, processes=1)
+
+
+def test_payloads_conform_to_schema(lodev, device_iris):
+    schema = device_json_schema()
+    devices = json.loads(lodev.devices_json(device_iris))
+
+    assert [device['iri'] for device in devices] == device_iris
+    for device in devices:
+        check_schema(device, schema)
+    assert devices[0]['hasNumWells'] == lodev.emmo_world[device_iris[0]].hasNumWells
+    assert json.loads(lodev.payload_cache.get(device_iris[0])) == devices[0]
+
+
+def test_batch_is_read_in_chunks(lodev, device_iris, monkeypatch):
+    """the devices of a batch are read LOAD_BATCH_SIZE at a time (SQLite host parameter limit)"""
+    monkeypatch.setattr(device_serialization, 'LOAD_BATCH_SIZE', 7)
+    reads = []
+    original_read_device_records = device_serialization.read_device_records
+
+    def read_device_records(subject_storids=None, **kwargs):
+        reads.append(len(subject_storids))
+        return original_read_device_records(subject_storids=subject_storids, **kwargs)
+    monkeypatch.setattr(device_serialization, 'read_device_records', read_device_records)
+
+    devices = json.loads(lodev.devices_json(device_iris))
+
+    assert [device['iri'] for device in devices] == device_iris
+    assert max(reads) == 7 and sum(reads) == len(device_iris)
+
+
+def test_msgpack_payloads(lodev, device_iris):
+    msgpack = pytest.importorskip('msgpack')
+    cache = DevicePayloadCache(emmo_world=lodev.emmo_world, lw_tbox=lodev.lodev_tbox, format='msgpack')
+    devices = json.loads(lodev.devices_json(device_iris[:20]))
+
+    assert msgpack.unpackb(cache.encode_batch(device_iris[:20]), raw=False) == devices
+    assert msgpack.unpackb(cache.get(device_iris[0]), raw=False) == devices[0]
+    assert msgpack.unpackb(cache.encode_batch([]), raw=False) == []
+
+
+def test_batch_skips_unknown_devices(lodev, device_iris):
+    unknown_iri = 'http://www.labop.org/labop_device_abox#unknown'
+
+    assert lodev.payload_cache.get(unknown_iri) is None
+    assert json.loads(lodev.devices_json([unknown_iri, device_iris[1]]))[0]['iri'] == device_iris[1]
+    assert lodev.devices_json([]) == b'[]'
+
+
+def test_change_feed_invalidates_payloads(lodev, device_iris):
+    cache = lodev.payload_cache
+    before = json.loads(cache.get(device_iris[0]))
+    device = lodev.emmo_world[device_iris[0]]
+    device.hasMaterial = ['polypropylene']
+
+    assert json.loads(cache.get(device_iris[0])) == before  # not announced yet
+    lodev.device_changed(device)
+    assert device_iris[0] not in cache.payloads
+    assert json.loads(cache.get(device_iris[0]))['hasMaterial'] == ['polypropylene']
+
+    cache.get(device_iris[1])
+    lodev.delete_device(lodev.emmo_world[device_iris[1]])
+    assert cache.get(device_iris[1]) is None
+
+
+def test_separate_cache_listens_to_feed(lodev, device_iris):
+    cache = DevicePayloadCache(emmo_world=lodev.emmo_world, lw_tbox=lodev.lodev_tbox, change_feed=lodev.change_feed)
+    cache.encode_batch(device_iris[:3])
+    lodev.device_changed(lodev.emmo_world[device_iris[2]])
+
+    assert sorted(cache.payloads) == sorted(device_iris[:2])
+    cache.invalidate()
+    assert not cache.payloads
+
+
+def test_payload_formats():
+    with pytest.raises(ValueError):
+        DevicePayloadCache(format='xml')
+    assert msgpack_array_header(3) == b'\x93'
+    assert msgpack_array_header(16) == b'\xdc\x00\x10'
+    assert msgpack_array_header(2 ** 16) == b'\xdd\x00\x01\x00\x00'
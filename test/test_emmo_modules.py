@@ -0,0 +1,60 @@
+"""_____________________________________________________________________
+
+:PROJECT: LabOP Device Ontology
+
+* Tests: minimal EMMO module extraction *
+
+:details:  extract -> verify -> reload of the EMMO module on the minimal EMMO stand-in.
+
+.. note:: -
+.. todo:: -
+________________________________________________________________________
+"""
+
+import os
+
+from labop_device_ontology.emmo_modules import extract_emmo_module, load_emmo, verify_emmo_module
+from labop_device_ontology.labop_device_ontology_impl import LabwareInterface
+from labop_device_ontology.parallel_import import read_catalogue
+from labop_device_ontology.tbox_schema import read_device_records
+
+
+def test_extract_verify_reload(emmo_filename, tmp_path):
+    module_filename = os.path.join(tmp_path, 'emmo_module.nt')
+    emmo = load_emmo(emmo_filename)
+
+    num_triples = extract_emmo_module(emmo=emmo, filename=module_filename)
+    emmo_module = load_emmo(module_filename)
+
+    assert num_triples > 0
+    assert verify_emmo_module(emmo=emmo, emmo_module=emmo_module) == {}
+    assert emmo_module.Length.iri == emmo.Length.iri
+    assert emmo.Length in emmo.Length.ancestors()
+    assert {ancestor.iri for ancestor in emmo_module.Length.ancestors()} == \
+        {ancestor.iri for ancestor in emmo.Length.ancestors()}
+
+    lodev = LabwareInterface(emmo_module_filename=module_filename)
+    assert lodev.lodev_tbox.lodevt.Device is not None
+
+
+def test_import_into_a_world_of_the_module(emmo_filename, catalogue, tmp_path):
+    module_filename = os.path.join(tmp_path, 'emmo_module.nt')
+    extract_emmo_module(emmo=load_emmo(emmo_filename), filename=module_filename)
+    emmo_module = load_emmo(module_filename)
+    for name in ('MilliMetre', 'KiloPascal', 'Newton', 'hasNumericalPart', 'hasReferenceUnit',
+                 'hasNumericalValue', 'Real'):
+        assert getattr(emmo_module, name) is not None, name
+
+    rows = read_catalogue(catalogue)
+    lodev = LabwareInterface(emmo_module_filename=module_filename)
+    device_iris = lodev.import_csv_parallel(catalogue, processes=1)
+
+    assert len(device_iris) == len(rows)
+    records = read_device_records(emmo_world=lodev.emmo_world, ontology=lodev.lodev_tbox.lodevt,
+                                  emmo=lodev.lodev_tbox.emmo)
+    assert records[device_iris[0]].hasLength == float(rows[0]['hasLength'])
+    assert records[device_iris[0]].hasGrippingPressure == float(rows[0]['hasGrippingPressure'])
+
+
+def test_labware_interface_extracts_the_module(lodev, tmp_path):
+    assert lodev.extract_emmo_module(os.path.join(tmp_path, 'emmo_module.nt')) == {}
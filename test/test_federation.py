@@ -0,0 +1,127 @@
+"""_____________________________________________________________________
+
+:PROJECT: LabOP Device Ontology
+
+* Tests: catalogue version federation *
+
+:details:  round trip of the exported current release, loaded as catalogue version
+           next to it: device records, version routed queries and the size of a version.
+
+.. note:: -
+.. todo:: -
+________________________________________________________________________
+"""
+
+import os
+
+import pytest
+
+from labop_device_ontology import __version__
+from labop_device_ontology.federation import versioned_iri
+
+OLD_VERSION = '0.0.0'
+WELLS_QUERY = "SELECT ?d ?wells WHERE { ?d lodev:hasNumWells ?wells . FILTER(?wells >= 96) }"
+
+
+def normalized(record) -> tuple:
+    """record values without the IRI, multi-valued properties in a defined order"""
+    return tuple(tuple(sorted(map(str, value))) if isinstance(value, tuple) else value for value in record[1:])
+
+
+@pytest.fixture
+def federated_lodev(lodev, catalogue, tmp_path):
+    """current release and its exports loaded as OLD_VERSION"""
+    lodev.import_csv_parallel(catalogue, processes=1)
+    lodev.export_ontologies(path=str(tmp_path), format='turtle')
+    lodev.add_catalogue_version(OLD_VERSION, os.path.join(tmp_path, 'labop_device_tbox.ttl'),
+                                [os.path.join(tmp_path, 'labop_device_abox.ttl')])
+    return lodev
+
+
+def test_round_trip_device_records(federated_lodev):
+    federation = federated_lodev.federation
+    current = {versioned_iri(iri, OLD_VERSION): normalized(record)
+               for iri, record in federation.device_records().items()}
+    loaded = {iri: normalized(record) for iri, record in federation.device_records(OLD_VERSION).items()}
+
+    assert list(federation.versions) == [__version__, OLD_VERSION]
+    assert len(loaded) == 200
+    assert loaded == current
+
+
+def test_round_trip_queries(federated_lodev):
+    current_rows = sorted((versioned_iri(iri, OLD_VERSION), wells)
+                          for iri, wells in federated_lodev.query_version(__version__, WELLS_QUERY, raw=True))
+    loaded_rows = sorted(tuple(row) for row in federated_lodev.query_version(OLD_VERSION, WELLS_QUERY, raw=True))
+
+    assert loaded_rows
+    assert loaded_rows == current_rows
+    assert all(iri.startswith(f'http://www.labop.org/{OLD_VERSION}/') for iri, _ in loaded_rows)
+
+
+def test_version_sizes(federated_lodev):
+    """a release costs all of its triples (+ the EMMO imports of its ontologies), not a delta:
+    only EMMO and the EMMO extension are shared"""
+    sizes = federated_lodev.federation.version_sizes()
+    num_ontologies = len(federated_lodev.federation.get(OLD_VERSION).ontologies)
+
+    assert 0 <= sizes[OLD_VERSION] - sizes[__version__] <= num_ontologies
+
+    federated_lodev.remove_catalogue_version(OLD_VERSION)
+    assert list(federated_lodev.federation.version_sizes()) == [__version__]
+
+
+def test_version_errors(federated_lodev, tmp_path):
+    federation = federated_lodev.federation
+    with pytest.raises(ValueError):
+        federation.add_version(OLD_VERSION, os.path.join(tmp_path, 'labop_device_tbox.ttl'))
+    with pytest.raises(ValueError):
+        federation.remove_version(__version__)
+    with pytest.raises(ValueError):
+        federation.get('9.9.9')
+
+
+def test_version_from_rdf_xml_export(federated_lodev, tmp_path):
+    export_dir = os.path.join(tmp_path, 'owl')
+    os.makedirs(export_dir)
+    federated_lodev.export_ontologies(path=export_dir, format='owl')
+    federated_lodev.add_catalogue_version('0.0.2', os.path.join(export_dir, 'labop_device_tbox.owl'),
+                                          [os.path.join(export_dir, 'labop_device_abox.owl')])
+
+    loaded = {iri: normalized(record) for iri, record in federated_lodev.federation.device_records('0.0.2').items()}
+    assert sorted(loaded.values()) == sorted(map(normalized, federated_lodev.federation.device_records().values()))
+
+
+def test_remove_version_resets_the_class_hierarchy(federated_lodev):
+    old_device_class = federated_lodev.federation.get(OLD_VERSION).tbox.Device.storid
+    assert len(federated_lodev.devices_of_class(old_device_class)) == 200
+
+    federated_lodev.remove_catalogue_version(OLD_VERSION)
+
+    assert federated_lodev.devices_of_class(old_device_class) == []
+    devices = federated_lodev.devices_of_class(federated_lodev.lodev_tbox.lodevt.Device)
+    assert len(devices) == 200 and None not in devices
+
+
+def test_shared_predicates_are_not_joined_across_versions(federated_lodev):
+    """rdfs:label is no versioned predicate, the planners only match the triples of their release"""
+    label_query = "SELECT ?d ?name WHERE { ?d rdfs:label ?name }"
+    old_namespace = f'http://www.labop.org/{OLD_VERSION}/'
+    current_iris = {iri for iri, _ in federated_lodev.query_version(__version__, label_query, raw=True)}
+    loaded_iris = {iri for iri, _ in federated_lodev.query_version(OLD_VERSION, label_query, raw=True)}
+
+    assert len(loaded_iris) >= 200
+    assert all(iri.startswith(old_namespace) for iri in loaded_iris)
+    assert not any(iri.startswith(old_namespace) for iri in current_iris)
+    assert {versioned_iri(iri, OLD_VERSION) for iri in current_iris} >= loaded_iris
+
+    federated_lodev.remove_catalogue_version(OLD_VERSION)
+    assert {iri for iri, _ in federated_lodev.query(label_query, raw=True)} == current_iris
+
+
+def test_removed_version_can_be_added_again(federated_lodev, tmp_path):
+    federated_lodev.remove_catalogue_version(OLD_VERSION)
+    federated_lodev.add_catalogue_version(OLD_VERSION, os.path.join(tmp_path, 'labop_device_tbox.ttl'),
+                                          [os.path.join(tmp_path, 'labop_device_abox.ttl')])
+
+    assert len(federated_lodev.federation.device_records(OLD_VERSION)) == 200
@@ -0,0 +1,135 @@
+"""_____________________________________________________________________
+
+:PROJECT: LabOP Device Ontology
+
+* Tests: catalogue import into the device ABox *
+
+:details:  serial and parallel CSV import, quantity individuals, change events and ABox export.
+
+.. note:: -
+.. todo:: -
+________________________________________________________________________
+"""
+
+import os
+
+import rdflib
+
+from labop_device_ontology.parallel_import import read_catalogue
+from labop_device_ontology.tbox_schema import read_device_records
+
+SKOS = rdflib.Namespace('http://www.w3.org/2004/02/skos/core#')
+
+
+def test_serial_import(lodev, catalogue):
+    rows = read_catalogue(catalogue)
+    device_iris = lodev.lodev_abox.import_csv(catalogue, change_feed=lodev.change_feed)
+
+    assert len(device_iris) == len(rows) == 200
+    device = lodev.emmo_world[device_iris[0]]
+    assert lodev.lodev_tbox.lodevt.Device in device.is_a
+    assert device.namespace.ontology is lodev.lodev_abox.lodeva
+    assert device.hasVendorName == rows[0]['hasVendorName']
+    assert device.hasNumWells == int(rows[0]['hasNumWells'])
+    assert device.label == [rows[0]['name']]
+
+    events = list(lodev.change_feed.read(0))
+    assert [event.operation for event in events] == ['insert'] * 200
+    assert [event.iri for event in events] == device_iris
+
+
+def test_parallel_import_matches_serial_import(lodev, catalogue):
+    serial_iris = lodev.import_csv_parallel(catalogue, processes=1)
+    parallel_iris = lodev.import_csv_parallel(catalogue, processes=2)
+
+    assert sorted(parallel_iris) == sorted(serial_iris)
+    # re-import replaces the devices
+    assert len(list(lodev.lodev_tbox.lodevt.Device.instances())) == 200
+    events = list(lodev.change_feed.read(0))
+    assert [event.operation for event in events] == ['insert'] * 200 + ['update'] * 200
+
+
+def test_import_updates_search_index(lodev, catalogue):
+    rows = read_catalogue(catalogue)
+    lodev.import_csv_parallel(catalogue, processes=1)
+
+    assert lodev.search_index.lookup_code(rows[0]['hasEAN'])
+
+
+def exported_graph(path, onto_base_filename: str) -> rdflib.Graph:
+    return rdflib.Graph().parse(os.path.join(path, onto_base_filename + '.ttl'), format='turtle')
+
+
+def test_export_abox(lodev, catalogue, tmp_path):
+    device_iris = lodev.import_csv_parallel(catalogue, processes=1)
+    lodev.export_ontologies(path=str(tmp_path), format='turtle')
+
+    graph = exported_graph(tmp_path, 'labop_device_abox')
+    tbox_graph = exported_graph(tmp_path, 'labop_device_tbox')
+    (device_class,) = tbox_graph.subjects(SKOS.prefLabel, rdflib.Literal('Device', lang='en'))
+    assert len(set(graph.subjects(rdflib.RDF.type, device_class))) == len(device_iris)
+
+
+def test_exported_abox_references_declared_tbox_entities(lodev, catalogue, tmp_path):
+    lodev.import_csv_parallel(catalogue, processes=1)
+    lodev.export_ontologies(path=str(tmp_path), format='turtle')
+
+    abox_graph = exported_graph(tmp_path, 'labop_device_abox')
+    declared = {s for onto_base_filename in ('labop_device_tbox', 'labop_device_emmo', 'labop_device_abox')
+                for s in exported_graph(tmp_path, onto_base_filename).subjects()}
+    tbox_iri = lodev.lodev_tbox.lodevt.base_iri
+    used = {term for triple in abox_graph for term in triple
+            if isinstance(term, rdflib.URIRef) and str(term).startswith(tbox_iri)}
+    assert used
+    assert used <= declared
+
+
+def test_repeated_export(lodev, catalogue, tmp_path):
+    lodev.import_csv_parallel(catalogue, processes=1)
+    for format in ('turtle', 'ntriples', 'owl'):
+        os.makedirs(os.path.join(tmp_path, format))
+        lodev.export_ontologies(path=os.path.join(tmp_path, format), format=format)
+
+    assert sorted(os.listdir(os.path.join(tmp_path, 'ntriples'))) == \
+        ['labop_device_abox.nt', 'labop_device_emmo.nt', 'labop_device_tbox.nt']
+    with open(os.path.join(tmp_path, 'owl', 'labop_device_tbox.owl'), encoding='utf-8') as owl_file:
+        assert owl_file.read(5) == '<?xml'
+    # every file is written in its format, the graphs are the same
+    for onto_base_filename in ('labop_device_emmo', 'labop_device_tbox', 'labop_device_abox'):
+        graph = rdflib.Graph().parse(os.path.join(tmp_path, 'ntriples', onto_base_filename + '.nt'), format='nt')
+        assert len(graph) == len(exported_graph(os.path.join(tmp_path, 'turtle'), onto_base_filename)) > 0
+
+
+def test_export_keeps_emmo_names(lodev, catalogue, tmp_path):
+    lodev.import_csv_parallel(catalogue, processes=1)
+    lodev.export_ontologies(path=str(tmp_path), format='turtle')
+
+    emmo_iri = lodev.emmo.base_iri
+    used = {term for onto_base_filename in ('labop_device_emmo', 'labop_device_tbox', 'labop_device_abox')
+            for triple in exported_graph(tmp_path, onto_base_filename) for term in triple
+            if isinstance(term, rdflib.URIRef) and str(term).startswith(emmo_iri + 'EMMO_')}
+    assert used
+    assert all(lodev.emmo_world[str(term)] is not None for term in used)
+
+
+def test_quantity_individuals(lodev, catalogue):
+    rows = read_catalogue(catalogue)
+    lodev.import_csv_parallel(catalogue, processes=1)
+    (num_objs,) = lodev.emmo_world.graph.db.execute("SELECT COUNT(*) FROM objs").fetchone()
+    device_iris = lodev.import_csv_parallel(catalogue, processes=1)
+
+    # re-import replaces the quantity individuals
+    assert lodev.emmo_world.graph.db.execute("SELECT COUNT(*) FROM objs").fetchone() == (num_objs,)
+    device = lodev.emmo_world[device_iris[0]]
+    emmo = lodev.lodev_tbox.emmo
+    assert emmo.Length in device.hasHeight.is_a
+    assert device.hasHeight.hasNumericalPart[0].hasNumericalValue == float(rows[0]['hasHeight'])
+
+    records = read_device_records(emmo_world=lodev.emmo_world, ontology=lodev.lodev_tbox.lodevt, emmo=emmo)
+    assert records[device_iris[0]].hasHeight == float(rows[0]['hasHeight'])
+    assert records[device_iris[0]].hasGrippingPressure == float(rows[0]['hasGrippingPressure'])
+    assert records[device_iris[0]].hasLengthTolerance == float(rows[0]['hasLengthTolerance'])
+    assert records[device_iris[0]].hasRadiusXY is None
+
+    lodev.delete_device(device)
+    assert lodev.emmo_world.graph.db.execute("SELECT COUNT(*) FROM objs").fetchone()[0] == num_objs - 2 - 5 * 7
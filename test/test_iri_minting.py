@@ -0,0 +1,110 @@
+"""_____________________________________________________________________
+
+:PROJECT: LabOP Device Ontology
+
+* Tests: deterministic IRI minting *
+
+:details:  stable names and keys, the persisted (namespace, key) <-> IRI map,
+           the same IRIs in other minters, processes and sessions, byte identical exports.
+
+.. note:: -
+.. todo:: -
+________________________________________________________________________
+"""
+
+import os
+import sys
+import filecmp
+import subprocess
+
+from labop_device_ontology.iri_minting import IRIMinter, stable_name, entity_key, device_key
+
+NAMESPACE = 'http://www.labop.org/labop_device_abox#'
+EXPORTED_FILES = ['labop_device_abox.ttl', 'labop_device_emmo.ttl', 'labop_device_tbox.ttl']
+
+EXPORT_SCRIPT = '''
+import sys
+from labop_device_ontology.labop_device_ontology_impl import LabwareInterface
+lodev = LabwareInterface(emmo_filename=sys.argv[1])
+lodev.import_csv_parallel(sys.argv[2], processes=1)
+lodev.export_ontologies(path=sys.argv[3], format='turtle')
+'''
+
+
+def run_python(*args, hash_seed: str = '1') -> str:
+    """stdout of a python subprocess (own interpreter, other string hash seed)"""
+    env = {**os.environ, 'PYTHONHASHSEED': hash_seed,
+           'PYTHONPATH': os.pathsep.join([os.getcwd(), *sys.path])}
+    return subprocess.run([sys.executable, *args], env=env, check=True, capture_output=True, text=True).stdout
+
+
+def test_stable_name_and_entity_key():
+    name = stable_name('corning|3599')
+
+    assert name == stable_name('corning|3599')
+    assert name.startswith('labop_') and len(name) == len('labop_') + 24
+    assert stable_name('corning|3599', prefix='dev_') == 'dev_' + name[len('labop_'):]
+    assert stable_name('corning|3598') != name
+    assert entity_key('http://www.labop.org/labop_device_tbox#', 'Plate') == \
+        'entity|http://www.labop.org/labop_device_tbox#|Plate'
+    assert device_key({'hasVendorName': ' Corning ', 'hasVendorProductID': '3599'}) == 'corning|3599'
+    assert IRIMinter().is_minted(name) and not IRIMinter().is_minted('Plate')
+
+
+def test_stable_name_in_other_processes():
+    names = run_python('-c', 'from labop_device_ontology.iri_minting import stable_name; '
+                             'print(stable_name("corning|3599"))', hash_seed='1234')
+
+    assert names.split() == [stable_name('corning|3599')]
+
+
+def test_map_is_persisted(tmp_path):
+    map_filename = str(tmp_path / 'iri_map.sqlite')
+    minter = IRIMinter(map_filename=map_filename)
+    iris = minter.mint_many(NAMESPACE, ['corning|3599', 'greiner|655101'])
+    entity_iri = minter.mint_entity(NAMESPACE, 'Plate')
+    minter.db.close()
+
+    minter = IRIMinter(map_filename=map_filename)
+    assert minter.db.execute("SELECT COUNT(*) FROM lodev_iri_map").fetchone() == (3,)
+    assert [minter.resolve(NAMESPACE, key) for key in ('corning|3599', 'greiner|655101')] == iris
+    assert minter.key_of(entity_iri) == entity_key(NAMESPACE, 'Plate')
+    assert minter.resolve(NAMESPACE, 'unknown|1') is None
+    assert minter.key_of(NAMESPACE + 'unknown') is None
+
+
+def test_resolve_and_key_of_across_minters(lodev):
+    minter = IRIMinter(emmo_world=lodev.emmo_world)
+    iri = minter.mint(NAMESPACE, 'corning|3599')
+
+    other_minter = IRIMinter(emmo_world=lodev.emmo_world)
+    assert other_minter.resolve(NAMESPACE, 'corning|3599') == iri
+    assert other_minter.key_of(iri) == 'corning|3599'
+    # without a map the same IRIs are minted, the keys are only known to the minting instance
+    unmapped_minter = IRIMinter()
+    assert unmapped_minter.mint(NAMESPACE, 'corning|3599') == iri
+    assert unmapped_minter.key_of(iri) == 'corning|3599'
+    assert IRIMinter().key_of(iri) is None
+
+
+def test_device_iris_across_sessions(lodev, emmo_filename, catalogue):
+    from labop_device_ontology.labop_device_ontology_impl import LabwareInterface
+    device_iris = lodev.import_csv_parallel(catalogue, processes=1)
+
+    other_lodev = LabwareInterface(emmo_filename=emmo_filename)
+    assert other_lodev.import_csv_parallel(catalogue, processes=1) == device_iris
+    assert other_lodev.iri_minter.key_of(device_iris[0]) == lodev.iri_minter.key_of(device_iris[0])
+
+
+def test_repeated_exports_are_byte_identical(lodev, emmo_filename, catalogue, tmp_path):
+    lodev.import_csv_parallel(catalogue, processes=1)
+    for export_dir in ('first', 'second'):
+        os.makedirs(tmp_path / export_dir)
+        lodev.export_ontologies(path=str(tmp_path / export_dir), format='turtle')
+    os.makedirs(tmp_path / 'other_process')
+    run_python('-c', EXPORT_SCRIPT, emmo_filename, catalogue, str(tmp_path / 'other_process'))
+
+    for export_dir in ('second', 'other_process'):
+        match, mismatch, errors = filecmp.cmpfiles(tmp_path / 'first', tmp_path / export_dir, EXPORTED_FILES,
+                                                   shallow=False)
+        assert sorted(match) == EXPORTED_FILES, (export_dir, mismatch, errors)
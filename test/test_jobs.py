@@ -0,0 +1,138 @@
+"""_____________________________________________________________________
+
+:PROJECT: LabOP Device Ontology
+
+* Tests: background jobs and the command line *
+
+:details:  jobs hold the World lock for their whole run, cancelled imports are rolled back,
+           progress / ETA, the status file and argument checks of the command line.
+
+.. note:: -
+.. todo:: -
+________________________________________________________________________
+"""
+
+import os
+import sys
+import csv
+import time
+import asyncio
+import threading
+
+import pytest
+
+from labop_device_ontology.jobs import Job, JobRunner, JobCancelled, read_status
+from labop_device_ontology.__main__ import main, parse_command_line
+
+from synthetic_catalogue import COLUMNS, synthetic_rows
+
+NEW_VENDOR = 'Acme Labware'
+
+
+def world_state(lodev) -> dict:
+    """sizes of the ABox, the change feed, the search index, the IRI map and the loaded partitions"""
+    db = lodev.emmo_world.graph.db
+    state = {table: db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+             for table in ('objs', 'datas', 'lodev_search', 'lodev_iri_map')}
+    state['last_seq'] = lodev.change_feed.last_seq()
+    state['partitions'] = sorted(lodev.abox_partitions.loaded)
+    state['ontologies'] = sorted(lodev.emmo_world.ontologies)
+    return state
+
+
+def test_job_holds_the_world_lock(lodev, monkeypatch):
+    started, release = threading.Event(), threading.Event()
+
+    def classify():
+        started.set()
+        release.wait(timeout=10)
+        return 'classified'
+    monkeypatch.setattr(lodev, 'classify', classify)
+    runner = JobRunner(lodev)
+    job = runner.submit_classification()
+    assert started.wait(timeout=10)
+
+    assert not lodev.world_lock.acquire(blocking=False)
+    release.set()
+    assert job.wait(timeout=10) == 'classified'
+    assert lodev.world_lock.acquire(blocking=False)
+    lodev.world_lock.release()
+    runner.shutdown()
+
+
+def test_partition_dir_requires_partition_by(monkeypatch):
+    monkeypatch.setattr(sys, 'argv', ['lodev', '--partition-dir', 'partitions'])
+    with pytest.raises(SystemExit):
+        parse_command_line()
+
+    monkeypatch.setattr(sys, 'argv', ['lodev', '--partition-dir', 'partitions', '--partition-by', 'vendor'])
+    assert parse_command_line().partition_dir == 'partitions'
+
+
+def test_cancelled_import_is_rolled_back(lodev, catalogue, tmp_path, monkeypatch):
+    lodev.enable_partitioning(key='vendor')
+    lodev.import_csv_parallel(catalogue, processes=1)
+    rows = synthetic_rows(300, seed=7)
+    for row in rows:  # a new partition
+        row['hasVendorName'] = row['hasManufacturer'] = NEW_VENDOR
+    new_catalogue = os.path.join(tmp_path, 'new_catalogue.csv')
+    with open(new_catalogue, 'w', newline='', encoding='utf-8') as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=COLUMNS, lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(rows)
+    state = world_state(lodev)
+
+    original_progress = Job.progress
+
+    def progress(job, rows_processed, triples_written):
+        """cancelled after the rows are converted, when the new partition exists"""
+        if not triples_written:
+            assert len(lodev.abox_partitions.loaded) > len(state['partitions'])
+            job.cancel()
+        original_progress(job, rows_processed, triples_written)
+    monkeypatch.setattr(Job, 'progress', progress)
+    runner = JobRunner(lodev)
+    job = runner.submit_import(new_catalogue, processes=1)
+
+    with pytest.raises(JobCancelled):
+        job.wait(timeout=60)
+    runner.shutdown()
+    assert job.state == 'cancelled' and job.triples == 0
+    assert world_state(lodev) == state
+    assert not lodev.search_index.lookup_code(rows[0]['hasEAN'])
+    assert not lodev.search_index.prefix_search(NEW_VENDOR)
+
+
+def test_progress_and_eta():
+    job = Job(job_id=1, kind='import', total_rows=100)
+    assert job.eta() is None
+
+    job.state, job.started = 'running', time.monotonic() - 10.0
+    job.progress(25, 0)
+
+    assert job.eta() == pytest.approx(30.0, rel=0.1)
+    assert job.status_line().startswith('job 1 (import): running, 25/100 rows, 0 triples, ETA ')
+    job.cancel()
+    with pytest.raises(JobCancelled):
+        job.progress(50, 0)
+    job.progress(100, 1000)  # the triples are written: no cancellation any more
+    assert job.triples == 1000
+
+
+def test_status_file_round_trip(lodev, tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(lodev, 'classify', lambda: 'classified')
+    status_filename = str(tmp_path / 'jobs.json')
+    runner = JobRunner(lodev, status_filename=status_filename)
+
+    async def run_jobs():
+        return [await runner.submit_classification(), await runner.submit_classification()]
+    assert asyncio.run(run_jobs()) == ['classified', 'classified']
+    runner.shutdown()
+
+    statuses = read_status(status_filename)
+    assert statuses == runner.status()
+    assert [(status.job_id, status.state) for status in statuses] == [(1, 'done'), (2, 'done')]
+
+    monkeypatch.setattr(sys, 'argv', ['lodev', '--job-status', status_filename])
+    assert main() == 0
+    assert capsys.readouterr().out.splitlines() == [runner.jobs[1].status_line(), runner.jobs[2].status_line()]
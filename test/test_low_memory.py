@@ -0,0 +1,107 @@
+"""_____________________________________________________________________
+
+:PROJECT: LabOP Device Ontology
+
+* Tests: low-memory mode *
+
+:details:  bounded owlready2 entity cache and interned catalogue values of the imports,
+           live entities and retained memory of a large catalogue in both modes.
+
+.. note:: -
+.. todo:: -
+________________________________________________________________________
+"""
+
+import os
+import gc
+import tracemalloc
+
+import pytest
+
+from labop_device_ontology import parallel_import
+from labop_device_ontology.low_memory import (bound_entity_cache, bounded_entity_cache, entity_cache_size,
+                                              num_cached_entities)
+from labop_device_ontology.labop_device_ontology_impl import LabwareInterface
+
+from synthetic_catalogue import write_synthetic_catalogue
+
+
+@pytest.fixture
+def restore_entity_cache():
+    """owlready2's entity ring buffer is shared by the process, restored after the test"""
+    size = entity_cache_size()
+    yield
+    bound_entity_cache(size)
+
+
+@pytest.fixture
+def large_catalogue(tmp_path) -> str:
+    return write_synthetic_catalogue(os.path.join(tmp_path, 'large_catalogue.csv'), num_devices=2000)
+
+
+def load_all_devices(emmo_filename, csv_filename, **kwargs) -> tuple:
+    """live entities of the World and retained python memory (bytes) after loading every device once"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        lodev = LabwareInterface(emmo_filename=emmo_filename, **kwargs)
+        for iri in lodev.import_csv_parallel(csv_filename, processes=1):
+            assert lodev.emmo_world[iri].hasHeight is not None
+        gc.collect()
+        retained, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return len(lodev.emmo_world._entities), retained, lodev
+
+
+def test_bound_entity_cache_keeps_the_most_recent_entities(restore_entity_cache):
+    bound_entity_cache(5)
+    assert entity_cache_size() == 5
+    assert bound_entity_cache(3) == 5
+    assert num_cached_entities() <= 3
+
+    with pytest.raises(ValueError):
+        bound_entity_cache(0)
+
+
+def test_bounded_entity_cache_restores_the_size(restore_entity_cache):
+    size = entity_cache_size()
+    with bounded_entity_cache(5):
+        assert entity_cache_size() == 5
+    assert entity_cache_size() == size
+
+
+def test_close_restores_the_entity_cache_size(emmo_filename, restore_entity_cache):
+    size = entity_cache_size()
+    with LabwareInterface(emmo_filename=emmo_filename, low_memory=True, max_entities=50) as lodev:
+        assert entity_cache_size() == 50
+    assert entity_cache_size() == size
+
+    lodev.close()  # closing twice keeps the restored size
+    assert entity_cache_size() == size
+
+
+def test_low_memory_mode_retains_fewer_entities(emmo_filename, large_catalogue, restore_entity_cache):
+    num_entities, retained, _ = load_all_devices(emmo_filename, large_catalogue)
+    low_num_entities, low_retained, lodev = load_all_devices(emmo_filename, large_catalogue,
+                                                             low_memory=True, max_entities=100)
+
+    assert num_entities > 2000
+    assert low_num_entities < num_entities / 4
+    assert low_retained < retained
+    assert num_cached_entities() == lodev.memory_report()['num_cached_entities'] == 100
+
+
+def test_low_memory_import_interns_values(emmo_filename, catalogue, monkeypatch, restore_entity_cache):
+    interned, original_read_catalogue = [], parallel_import.read_catalogue
+
+    def read_catalogue(csv_filename, intern_values=False):
+        interned.append(intern_values)
+        return original_read_catalogue(csv_filename, intern_values=intern_values)
+    monkeypatch.setattr(parallel_import, 'read_catalogue', read_catalogue)
+    lodev = LabwareInterface(emmo_filename=emmo_filename, low_memory=True, max_entities=50)
+
+    device_iris = lodev.import_csv_parallel(catalogue, processes=1)
+
+    assert interned == [True]
+    assert len(device_iris) == 200
@@ -0,0 +1,72 @@
+"""_____________________________________________________________________
+
+:PROJECT: LabOP Device Ontology
+
+* Tests: substance - material compatibility *
+
+:details:  ratings of catalogue-like device records with the packaged resistance table:
+             - placeholder materials ('N/A', '') of missing coatings / septa are ignored
+             - unknown materials and devices without materials are rated unknown,
+               a known incompatible material is not hidden by an unknown one
+             - substances given as EMMO ChemicalSubstance entities
+
+.. note:: -
+.. todo:: -
+________________________________________________________________________
+"""
+
+import types
+
+import pytest
+
+from labop_device_ontology.material_compatibility import CompatibilityMatrix, RATINGS, UNKNOWN
+
+RECORDS = {
+    'pp_plate': {'hasMaterial': 'Polypropylene (PP)', 'hasCoatingMaterial': 'N/A', 'hasSeptumMaterial': 'N/A'},
+    'ps_plate_empty': {'hasMaterial': 'PS', 'hasCoatingMaterial': '', 'hasSeptumMaterial': ('N/A',)},
+    'pp_vial_septum': {'hasMaterial': 'PP', 'hasSeptumMaterial': 'PTFE'},
+    'coated_plate': {'hasMaterial': 'PS', 'hasCoatingMaterial': 'poly-D-lysine'},
+    'no_material': {'hasMaterial': 'N/A'},
+    'ps_plate_viton_septum': {'hasMaterial': 'polystyrene', 'hasSeptumMaterial': 'Viton'},
+    'pp_plate_viton_septum': {'hasMaterial': 'PP', 'hasSeptumMaterial': 'Viton'},
+}
+
+
+@pytest.fixture
+def matrix() -> CompatibilityMatrix:
+    return CompatibilityMatrix(records=RECORDS)
+
+
+@pytest.mark.parametrize('device, expected', [
+    ('pp_plate', RATINGS['A']),
+    ('ps_plate_empty', RATINGS['A']),
+    ('pp_vial_septum', RATINGS['A']),
+    ('coated_plate', UNKNOWN),
+    ('no_material', UNKNOWN),
+])
+def test_water_ratings(matrix, device, expected):
+    assert matrix.ratings('water', [device]) == [expected]
+
+
+def test_placeholders_are_no_materials(matrix):
+    assert matrix.compatible('water', ['pp_plate']) == [True]
+    assert matrix.compatible('H2O', ['no_material', 'no_material'], allow_unknown=True) == [True, True]
+
+
+def test_known_incompatible_material_with_unknown_material(matrix):
+    devices = ['ps_plate_viton_septum', 'pp_plate_viton_septum']
+    assert matrix.ratings('acetone', devices) == [RATINGS['D'], UNKNOWN]
+    assert matrix.compatible('acetone', devices, allow_unknown=True) == [False, True]
+    assert matrix.compatible('acetone', devices) == [False, False]
+    assert 'pp_plate_viton_septum' not in matrix.compatible_devices('acetone')
+
+
+def test_emmo_substances(matrix, lodev):
+    emmo = lodev.emmo
+    with emmo:
+        acetone = types.new_class('Substance_1', (emmo.ChemicalSubstance,))
+        acetone.prefLabel = ['Acetone']
+        water = emmo.ChemicalSubstance('sample_1', label=['H2O'])
+
+    assert matrix.ratings(acetone, ['pp_plate']) == matrix.ratings('acetone', ['pp_plate']) != [UNKNOWN]
+    assert matrix.compatible_devices(water) == ['pp_plate', 'ps_plate_empty', 'pp_vial_septum']
@@ -0,0 +1,174 @@
+"""_____________________________________________________________________
+
+:PROJECT: LabOP Device Ontology
+
+* Tests: query planner for device searches *
+
+:details:  compiled star / filter queries return the same rows as world.sparql,
+           unsupported queries fall back to the SPARQL engine.
+
+.. note:: -
+.. todo:: -
+________________________________________________________________________
+"""
+
+import pytest
+import rdflib
+from rdflib.namespace import XSD
+from owlready2 import locstr
+
+from labop_device_ontology.query_planner import parse_star_query, parse_literal, UnsupportedQuery
+
+QUERIES = {
+    'literal object': 'SELECT ?d WHERE { ?d lodev:hasMaterial "polystyrene" . }',
+    'numeric literal': 'SELECT ?d WHERE { ?d lodev:hasVendorName "Corning" ; lodev:hasNumWells 96 . }',
+    'boolean literal': 'SELECT ?d WHERE { ?d lodev:isLiddable true . }',
+    'filter range': 'SELECT ?d ?n WHERE { ?d lodev:hasNumWells ?n . FILTER(?n >= 96 && ?n <= 384) }',
+    'mirrored filter': 'SELECT ?d WHERE { ?d lodev:hasWellVolume ?v . FILTER(1000.0 < ?v) }',
+    'string filter': 'SELECT ?d WHERE { ?d lodev:hasMaterial ?m . FILTER(?m != "glass") }',
+    'type pattern': 'SELECT ?d WHERE { ?d a lodev:Device . }',
+    'type and literal': 'SELECT ?d ?vendor WHERE { ?d a lodev:Device ; lodev:hasMaterial "glass" ; '
+                        'lodev:hasVendorName ?vendor . }',
+    'distinct': 'SELECT DISTINCT ?m WHERE { ?d lodev:hasMaterial ?m . }',
+    'star projection': '''SELECT ?d ?vendor ?volume WHERE {
+                              ?d a lodev:Device ;
+                                 lodev:hasMaterial "polypropylene" ;
+                                 lodev:hasNumWells ?wells ;
+                                 lodev:hasVendorName ?vendor ;
+                                 lodev:hasWellVolume ?volume .
+                              FILTER(?wells = 96 && ?volume > 100.0)
+                          }''',
+}
+
+
+@pytest.fixture
+def imported_lodev(lodev, catalogue):
+    lodev.import_csv_parallel(catalogue, processes=1)
+    return lodev
+
+
+def sorted_rows(rows) -> list:
+    """rows with entities as IRIs, sorted"""
+    return sorted(tuple(getattr(value, 'iri', value) for value in row) for row in rows)
+
+
+@pytest.mark.parametrize('name', QUERIES)
+def test_planner_matches_sparql_engine(imported_lodev, name):
+    planner = imported_lodev.query_planner
+    query = QUERIES[name]
+
+    assert planner.plan(query) is not None
+    rows = planner.query(query)
+    assert rows
+    assert sorted_rows(rows) == sorted_rows(planner._sparql(query))
+
+
+def test_limit(imported_lodev):
+    planner = imported_lodev.query_planner
+    query = 'SELECT ?d WHERE { ?d lodev:hasMaterial "glass" . }'
+
+    rows = planner.query(query + ' LIMIT 5')
+
+    assert len(rows) == 5
+    assert set(sorted_rows(rows)) <= set(sorted_rows(planner._sparql(query)))
+
+
+@pytest.mark.parametrize('query', [
+    'SELECT ?d WHERE { ?d lodev:hasMaterial ?m . OPTIONAL { ?d lodev:hasMass ?mass } }',
+    'SELECT ?d WHERE { ?d lodev:hasNumWells ?n . } ORDER BY ?n',
+    'SELECT ?d WHERE { ?d lodev:hasNumWells ?n . FILTER(?n > 96 || ?n < 24) }',
+    'SELECT ?d ?h WHERE { ?d lodev:hasHeight ?h . }',  # object property (quantity individual)
+])
+def test_unsupported_queries_fall_back_to_sparql(imported_lodev, query):
+    planner = imported_lodev.query_planner
+
+    assert planner.plan(query) is None
+    assert sorted_rows(planner.query(query)) == sorted_rows(planner._sparql(query))
+
+
+def test_unknown_predicate_gives_an_empty_result(imported_lodev):
+    assert imported_lodev.query_planner.query('SELECT ?d WHERE { ?d lodev:hasNoSuchProperty 1 . }') == []
+
+
+def test_parse_star_query():
+    star = parse_star_query('PREFIX ex: <http://example.org/> SELECT * WHERE { ?d a ex:Plate ; ex:wells ?n , 96 . '
+                            'FILTER((?n > 1) && 400 >= ?n) }')
+
+    assert star.subject == 'd'
+    assert star.types == ['http://example.org/Plate']
+    assert star.patterns == [('http://example.org/wells', 'n', None), ('http://example.org/wells', None, 96)]
+    assert star.filters == [('n', '>', 1), ('n', '<=', 400)]
+    assert star.select == ['d', 'n']
+    with pytest.raises(UnsupportedQuery):
+        parse_star_query('SELECT ?d WHERE { ?d ex:p ?x . ?x ex:q 1 . }')
+
+
+@pytest.mark.parametrize('name', ['filter range', 'star projection'])
+def test_raw_rows_select_the_subject_iris(imported_lodev, name):
+    planner = imported_lodev.query_planner
+    query = QUERIES[name]
+
+    assert 'FROM resources' in planner.plan(query).raw_sql
+    assert sorted(map(tuple, planner.query(query, raw=True))) == sorted_rows(planner.query(query))
+
+
+def test_device_changes_keep_the_plans(imported_lodev):
+    planner = imported_lodev.query_planner
+    query = 'SELECT ?d WHERE { ?d lodev:hasMaterial "glass" . }'
+    plan = planner.plan(query)
+    num_devices = len(planner.query(query))
+    material = imported_lodev.emmo_world._abbreviate(imported_lodev.lodev_tbox.lodevt.hasMaterial.iri, False)
+    num_materials = planner._predicate_counts[material]
+
+    imported_lodev.delete_device(planner.query(query)[0][0])
+
+    # plans depend on the TBox only, the statistics are recounted for the next compiled plan
+    assert planner._predicate_counts is None and planner.plan(query) is plan
+    assert len(planner.query(query)) == num_devices - 1
+    planner.plan('SELECT ?d WHERE { ?d lodev:hasMaterial "polystyrene" . }')
+    assert planner._predicate_counts[material] < num_materials
+
+
+def test_literals_match_like_rdflib(imported_lodev):
+    """a plain string does not match a language tagged label, an integer no double (triple patterns),
+    FILTERs compare numbers by value and strings of the same language"""
+    world = imported_lodev.emmo_world
+    planner = imported_lodev.query_planner
+    devices = [world[iri] for iri, in planner.query('SELECT ?d WHERE { ?d a lodev:Device . }', raw=True)[:2]]
+    name = str(devices[0].label[0])
+    devices[0].label.append(locstr(name, 'en'))
+    num_wells = imported_lodev.lodev_tbox.lodevt.hasNumWells
+    double = world._abbreviate(str(XSD.double))
+    imported_lodev.lodev_abox.lodeva._add_data_triple_spod(devices[1].storid, num_wells.storid, 96.0, double)
+    # reference: rdflib SPARQL on a copy of the World (xsd:string literals are plain literals in RDF 1.1)
+    graph = rdflib.Graph()
+    for s, p, o in world.as_rdflib_graph():
+        if isinstance(o, rdflib.Literal) and o.datatype == XSD.string:
+            o = rdflib.Literal(str(o))
+        graph.add((s, p, o))
+    prefixes = ''.join(f"PREFIX {prefix}: <{iri}>\n" for prefix, iri in planner.prefixes.items())
+
+    for query in [f'SELECT ?d WHERE {{ ?d rdfs:label "{name}" . }}',
+                  f'SELECT ?d WHERE {{ ?d rdfs:label "{name}"@en . }}',
+                  f'SELECT ?d WHERE {{ ?d rdfs:label "{name}"@EN . }}',
+                  f'SELECT ?d WHERE {{ ?d rdfs:label ?l . FILTER(?l = "{name}") }}',
+                  f'SELECT ?d WHERE {{ ?d rdfs:label ?l . FILTER(?l = "{name}"@en) }}',
+                  'SELECT ?d WHERE { ?d lodev:hasNumWells 96 . }',
+                  'SELECT ?d WHERE { ?d lodev:hasNumWells 96.0e0 . }',
+                  'SELECT ?d WHERE { ?d lodev:hasNumWells ?n . FILTER(?n = 96) }']:
+        assert planner.plan(query) is not None
+        expected = sorted(str(row[0]) for row in graph.query(prefixes + query))
+        assert expected
+        assert sorted(iri for iri, in planner.query(query, raw=True)) == expected, query
+
+
+def test_escaped_non_ascii_literal(imported_lodev):
+    assert parse_literal('string', r'"Müller\"s \u00e9\U0001F600\t\\"') == 'Müller"s é\U0001F600\t\\'
+
+    planner = imported_lodev.query_planner
+    device = imported_lodev.emmo_world[planner.query('SELECT ?d WHERE { ?d a lodev:Device . }', raw=True)[0][0]]
+    device.hasVendorName = 'Müller"s Labware'
+    query = r'SELECT ?d WHERE { ?d lodev:hasVendorName "Müller\"s Labware" . }'
+
+    assert planner.query(query) == [[device]]
+    assert planner.query(query.replace('ü', r'\u00fc')) == [[device]]
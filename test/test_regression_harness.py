@@ -0,0 +1,86 @@
+"""_____________________________________________________________________
+
+:PROJECT: LabOP Device Ontology
+
+* Tests: offline regression harness *
+
+:details:  the checks, that decide pass / fail of the regression gate, report regressions:
+           baseline comparison, cross-file declarations and the federation round trip.
+
+.. note:: -
+.. todo:: -
+________________________________________________________________________
+"""
+
+import os
+import copy
+
+import rdflib
+
+from regression_harness import compare, undeclared_iris, federation_round_trip
+
+from labop_device_ontology import __version__
+from labop_device_ontology.iri_minting import stable_name
+
+TBOX = rdflib.Namespace('http://www.labop.org/labop_device_tbox#')
+ABOX = rdflib.Namespace('http://www.labop.org/labop_device_abox#')
+
+BASELINE = {
+    'hashes': {'turtle': {'labop_device_abox.ttl': 'a1', 'labop_device_tbox.ttl': 't1'}},
+    'stages': {'import': {'seconds': 2.0, 'peak_mb': 40.0}, 'export:turtle': {'seconds': 1.0, 'peak_mb': 20.0}},
+}
+
+
+def test_compare_reports_regressions():
+    result = copy.deepcopy(BASELINE)
+    assert compare(result, BASELINE) == []
+
+    result['hashes']['turtle'] = {'labop_device_abox.ttl': 'a2', 'labop_device_emmo.ttl': 'e1'}
+    result['stages']['import'] = {'seconds': 3.0, 'peak_mb': 40.0}
+    result['stages']['export:turtle'] = {'seconds': 1.2, 'peak_mb': 60.0}
+    result['round_trip'] = ["round trip: 1 devices missing, 0 devices changed"]
+
+    assert compare(result, BASELINE) == [
+        "round trip: 1 devices missing, 0 devices changed",
+        "output turtle/labop_device_abox.ttl: graph changed",
+        "output turtle/labop_device_emmo.ttl: new file",
+        "output turtle/labop_device_tbox.ttl: missing",
+        "stage import: seconds 3.0 > 2.500 (baseline 2.0)",
+        "stage export:turtle: peak_mb 60.0 > 25.000 (baseline 20.0)",
+    ]
+    # slower within the threshold / the absolute tolerance is no regression
+    result = copy.deepcopy(BASELINE)
+    result['stages']['export:turtle']['seconds'] = 1.4
+    assert compare(result, BASELINE) == []
+
+
+def test_undeclared_iris(tmp_path):
+    device_class, height = TBOX[stable_name('Device')], TBOX[stable_name('hasHeight')]
+    tbox = rdflib.Graph()
+    tbox.add((device_class, rdflib.RDF.type, rdflib.OWL.Class))
+    tbox.serialize(os.path.join(tmp_path, 'labop_device_tbox.ttl'), format='turtle')
+    abox = rdflib.Graph()
+    abox.add((ABOX.device_1, rdflib.RDF.type, device_class))
+    abox.serialize(os.path.join(tmp_path, 'labop_device_abox.ttl'), format='turtle')
+
+    assert undeclared_iris(str(tmp_path)) == []
+
+    abox.add((ABOX.device_1, height, rdflib.Literal(14.2)))
+    abox.serialize(os.path.join(tmp_path, 'labop_device_abox.ttl'), format='turtle')
+
+    assert undeclared_iris(str(tmp_path)) == [
+        f"cross-file: labop_device_abox.ttl references 1 undeclared IRIs, e.g. {height}"]
+
+
+def test_federation_round_trip_reports_missing_devices(lodev, catalogue, tmp_path):
+    device_iris = lodev.import_csv_parallel(catalogue, processes=1)
+    lodev.export_ontologies(path=str(tmp_path), format='turtle')
+
+    abox_filename = os.path.join(tmp_path, 'labop_device_abox.ttl')
+    abox = rdflib.Graph().parse(abox_filename, format='turtle')
+    abox.remove((rdflib.URIRef(device_iris[0]), None, None))
+    abox.serialize(abox_filename, format='turtle')
+
+    failures = federation_round_trip(lodev, str(tmp_path), 'turtle')
+    assert failures[0] == "round trip: 1 devices missing, 0 devices changed"
+    assert list(lodev.federation.versions) == [__version__]  # the round trip version is removed again
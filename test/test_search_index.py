@@ -0,0 +1,75 @@
+"""_____________________________________________________________________
+
+:PROJECT: LabOP Device Ontology
+
+* Tests: device search index *
+
+:details:  the index follows the change feed of imports, updates and deletes.
+
+.. note:: -
+.. todo:: -
+________________________________________________________________________
+"""
+
+from labop_device_ontology.parallel_import import read_catalogue
+
+
+def test_abox_import_is_indexed(lodev, catalogue):
+    rows = read_catalogue(catalogue)
+    device_iris = lodev.lodev_abox.import_csv(catalogue, change_feed=lodev.change_feed)
+
+    assert lodev.search_index.lookup_code(rows[3]['hasEAN']) == [device_iris[3]]
+    assert lodev.search_index.lookup_code(rows[3]['hasVendorProductID'], kind='vendor_product_id') == [device_iris[3]]
+    assert set(lodev.search_index.prefix_search('Eppendorf', limit=1000)) == \
+        {iri for iri, row in zip(device_iris, rows) if row['hasVendorName'] == 'Eppendorf'}
+
+
+def test_reimport_replaces_index_entries(lodev, catalogue):
+    rows = read_catalogue(catalogue)
+    lodev.import_csv_parallel(catalogue, processes=1)
+    device_iris = lodev.import_csv_parallel(catalogue, processes=1)
+
+    assert lodev.search_index.lookup_code(rows[0]['hasEAN']) == [device_iris[0]]
+    (count,) = lodev.search_index.db.execute("SELECT COUNT(*) FROM lodev_search").fetchone()
+    assert count == len(device_iris)
+
+
+def test_changed_and_deleted_devices(lodev, catalogue):
+    device_iris = lodev.import_csv_parallel(catalogue, processes=1)
+    device = lodev.emmo_world[device_iris[0]]
+    device.hasVendorName = 'Zymark'
+    lodev.device_changed(device)
+    lodev.delete_device(lodev.emmo_world[device_iris[1]])
+
+    assert lodev.search_index.prefix_search('Zymark') == [device_iris[0]]
+    assert device_iris[1] not in lodev.search_index.prefix_search('Corning', limit=1000)
+    assert not lodev.search_index.db.execute("SELECT 1 FROM lodev_codes WHERE iri = ?", (device_iris[1],)).fetchall()
+
+
+def test_name_prefix_search(lodev, catalogue):
+    rows = read_catalogue(catalogue)
+    device_iris = lodev.import_csv_parallel(catalogue, processes=1)
+    search_index = lodev.search_index
+
+    assert len(search_index.prefix_search('well plate', limit=1000)) == len(device_iris)
+    assert set(search_index.prefix_search('384 well', limit=1000)) == \
+        {iri for iri, row in zip(device_iris, rows) if row['name'].split()[-4] == '384'}
+    assert search_index.prefix_search(rows[7]['name']) == [device_iris[7]]
+    # FTS rows are keyed by the device storids
+    assert search_index.db.execute("SELECT rowid FROM lodev_search WHERE iri = ?", (device_iris[7],)).fetchone() == \
+        (lodev.emmo_world[device_iris[7]].storid,)
+
+
+def test_fuzzy_search(lodev, catalogue):
+    rows = read_catalogue(catalogue)
+    device_iris = lodev.import_csv_parallel(catalogue, processes=1)
+    search_index = lodev.search_index
+
+    eppendorf = {iri for iri, row in zip(device_iris, rows) if row['hasVendorName'] == 'Eppendorf'}
+    results = search_index.fuzzy_search('Epenndorf', limit=len(eppendorf))
+    assert {iri for iri, _ in results} == eppendorf
+    assert all(similarity >= 0.3 for _, similarity in results)
+    # misspelled name
+    (best_iri, similarity), *_ = search_index.fuzzy_search(rows[7]['name'].replace('plate', 'plat'))
+    assert best_iri == device_iris[7] and similarity > 0.8
+    assert search_index.fuzzy_search('xyzzy') == []
@@ -0,0 +1,70 @@
+"""_____________________________________________________________________
+
+:PROJECT: LabOP Device Ontology
+
+* Tests: declarative TBox property schema *
+
+:details:  bulk compiled and class-by-class properties export the same axioms and annotations.
+
+.. note:: -
+.. todo:: -
+________________________________________________________________________
+"""
+
+import os
+
+import pytest
+import rdflib
+from ontopy import World
+
+from labop_device_ontology.device_tbox import LOLabwareTBox
+from labop_device_ontology.emmo_utils import sync_python_names
+from labop_device_ontology.tbox_schema import compile_property_schema, load_property_schema
+
+SKOS = rdflib.Namespace('http://www.w3.org/2004/02/skos/core#')
+
+
+def load_test_emmo(emmo_filename):
+    emmo = World().get_ontology(emmo_filename).load()
+    sync_python_names(emmo)
+    emmo.base_iri = emmo.base_iri.rstrip('/#')
+    return emmo
+
+
+def normalized(term):
+    """literals without surrounding whitespace and quotes (left over in some docstrings)"""
+    if isinstance(term, rdflib.Literal):
+        return rdflib.Literal(str(term).strip(' "'), lang=term.language, datatype=term.datatype)
+    return term
+
+
+def exported_properties(emmo_filename, path, bulk_schema: bool) -> dict:
+    """prefLabel: set of (predicate, object) of all exported properties"""
+    emmo = load_test_emmo(emmo_filename)
+    tbox = LOLabwareTBox(emmo_world=emmo.world, emmo=emmo, bulk_schema=bulk_schema)
+    os.makedirs(path)
+    tbox.export(path=path, format='turtle')
+    graph = rdflib.Graph().parse(os.path.join(path, 'labop_device_tbox.ttl'), format='turtle')
+    names = {spec.name for spec in load_property_schema()}
+    return {str(label): {(p, normalized(o)) for p, o in graph.predicate_objects(subject)}
+            for subject, label in graph.subject_objects(SKOS.prefLabel) if str(label) in names}
+
+
+def test_bulk_schema_matches_class_by_class_definition(emmo_filename, tmp_path):
+    bulk = exported_properties(emmo_filename, os.path.join(tmp_path, 'bulk'), bulk_schema=True)
+    class_by_class = exported_properties(emmo_filename, os.path.join(tmp_path, 'classes'), bulk_schema=False)
+
+    assert len(bulk) == len(load_property_schema())
+    assert bulk == class_by_class
+    elucidations = [o for p, o in bulk['hasLength'] if isinstance(o, rdflib.Literal) and o.language == 'en'
+                    and p != SKOS.prefLabel]
+    assert elucidations == [rdflib.Literal("Device total length, without  any additions, like lids etc.", lang='en')]
+
+
+def test_quantity_has_to_match_the_range(emmo_filename):
+    emmo = load_test_emmo(emmo_filename)
+    ontology = emmo.world.get_ontology('http://www.labop.org/test_tbox')
+    specs = [spec._replace(quantity='Force') if spec.name == 'hasLength' else spec for spec in load_property_schema()]
+
+    with pytest.raises(ValueError, match="hasLength"):
+        compile_property_schema(ontology=ontology, specs=specs, emmo=emmo)
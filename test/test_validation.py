@@ -0,0 +1,134 @@
+"""_____________________________________________________________________
+
+:PROJECT: LabOP Device Ontology
+
+* Tests: data quality validation of devices *
+
+:details:  column rules on catalogue rows and on device records read from the quadstore.
+
+.. note:: -
+.. todo:: -
+________________________________________________________________________
+"""
+
+import os
+import csv
+
+from owlready2.base import to_literal
+
+from synthetic_catalogue import synthetic_rows, COLUMNS
+
+from labop_device_ontology.device_validation import DeviceValidator
+from labop_device_ontology.iri_minting import device_key
+from labop_device_ontology.labop_device_ontology_impl import LabwareInterface
+from labop_device_ontology.parallel_import import unique_rows
+from labop_device_ontology.tbox_schema import read_device_records
+
+
+def issues_of(report, rule: str) -> list:
+    return [(issue.iri, issue.property) for issue in report.issues if issue.rule == rule]
+
+
+def test_synthetic_catalogue_is_valid():
+    assert DeviceValidator().validate_rows(synthetic_rows(500)).valid
+
+
+def duplicate_rows() -> list:
+    """catalogue rows with repeated device keys, the duplicates differ in their mass"""
+    rows = synthetic_rows(7)
+    rows[3].update(hasVendorName=rows[0]['hasVendorName'], hasVendorProductID=rows[0]['hasVendorProductID'].upper())
+    rows[5].update(hasVendorName=rows[0]['hasVendorName'], hasVendorProductID=rows[0]['hasVendorProductID'])
+    # without vendor product ID the manufacturer product ID is the key
+    rows[4].update(hasVendorName=rows[1]['hasVendorName'], hasVendorProductID='', hasProductID='X1')
+    rows[2].update(hasVendorName=rows[1]['hasVendorName'], hasVendorProductID=' ', hasProductID='X1')
+    rows[6].update(hasVendorName=rows[1]['hasVendorName'], hasVendorProductID='N/A', hasProductID='X2')
+    for i, row in enumerate(rows):
+        row['hasMass'] = f"{10.0 + i}"
+    return rows
+
+
+def test_only_the_repeated_device_keys_are_duplicates():
+    rows = duplicate_rows()
+
+    valid_rows, quarantined, report = DeviceValidator().quarantine(rows)
+
+    # the last row of a key is valid
+    assert issues_of(report, 'unique') == [(0, 'hasVendorProductID'), (2, 'hasVendorProductID'),
+                                           (3, 'hasVendorProductID')]
+    assert valid_rows == [rows[1], rows[4], rows[5], rows[6]]
+
+
+def test_device_keys_differing_in_whitespace_are_duplicates():
+    """keys are stripped and lower case like iri_minting.device_key, also if all key values are strings"""
+    columns = {'hasVendorName': ['Acme', 'Acme ', 'Acme'], 'hasVendorProductID': ['P1', ' p1', 'P2']}
+
+    report = DeviceValidator().validate_columns(columns, ids=[0, 1, 2])
+
+    assert issues_of(report, 'unique') == [(0, 'hasVendorProductID')]
+    assert device_key({'hasVendorName': 'Acme', 'hasVendorProductID': 'P1'}) == \
+        device_key({'hasVendorName': 'Acme ', 'hasVendorProductID': ' p1'})
+
+
+def test_quarantine_and_import_keep_the_same_duplicates(lodev, emmo_filename, tmp_path):
+    rows = duplicate_rows()
+    csv_filename = os.path.join(tmp_path, 'duplicates.csv')
+    with open(csv_filename, 'w', newline='', encoding='utf-8') as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=COLUMNS, lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(rows)
+
+    valid_rows, _, _ = DeviceValidator().quarantine(rows)
+    validated = LabwareInterface(emmo_filename=emmo_filename)
+    device_iris = lodev.import_csv_parallel(csv_filename, processes=1)
+    validated_iris = validated.import_csv_parallel(csv_filename, processes=1, validate=True)
+
+    assert sorted(map(id, unique_rows(rows))) == sorted(map(id, valid_rows))
+    assert sorted(device_iris) == sorted(validated_iris)
+    masses = {iri: record.hasMass for iri, record in read_device_records(
+        emmo_world=lodev.emmo_world, ontology=lodev.lodev_tbox.lodevt).items()}
+    validated_masses = {iri: record.hasMass for iri, record in read_device_records(
+        emmo_world=validated.emmo_world, ontology=validated.lodev_tbox.lodevt).items()}
+    assert masses == validated_masses
+    assert sorted(masses.values()) == [float(row['hasMass']) for row in valid_rows]
+
+
+def test_tolerances_outside_of_range():
+    rows = synthetic_rows(4)
+    for row, tolerance in zip(rows, ['1.05', '0', '2.5', '']):
+        row['hasLengthTolerance'] = tolerance
+
+    report = DeviceValidator().validate_rows(rows)
+
+    assert issues_of(report, 'tolerance') == [(1, 'hasLengthTolerance'), (2, 'hasLengthTolerance')]
+
+
+def test_rules_of_the_original_catalogue_checks():
+    rows = synthetic_rows(4)
+    rows[0]['hasNumWells'] = str(int(rows[0]['hasNumWells']) + 1)
+    rows[1]['hasColorRGB'] = 'white'
+    rows[2]['hasMass'] = '-1.5'
+    rows[3]['hasNumRows'] = 'eight'
+
+    report = DeviceValidator().validate_rows(rows)
+
+    assert report.summary() == {'well_count': 1, 'color_rgb': 1, 'non_negative': 1, 'datatype': 1}
+    assert report.failing == {0, 1, 2, 3}
+
+
+def test_second_value_of_a_functional_property(lodev, catalogue):
+    device_iris = lodev.import_csv_parallel(catalogue, processes=1)
+    world = lodev.emmo_world
+    c = lodev.lodev_abox.lodeva.graph.c
+    # a second mass and vendor name, e.g. written by another tool
+    for name, value in (('hasMass', 99.5), ('hasVendorName', 'Zymark')):
+        world.graph.db.execute("INSERT INTO datas (c, s, p, o, d) VALUES (?, ?, ?, ?, ?)",
+                               (c, world._abbreviate(device_iris[0]), world._abbreviate(
+                                   lodev.lodev_tbox.lodevt.base_iri + name), *to_literal(value)))
+
+    records = read_device_records(emmo_world=world, ontology=lodev.lodev_tbox.lodevt)
+    report = DeviceValidator().validate_records(records)
+
+    assert len(records[device_iris[0]].hasMass) == 2
+    assert 'Zymark' in records[device_iris[0]].hasVendorName
+    assert sorted(issues_of(report, 'functional')) == [(device_iris[0], 'hasMass'), (device_iris[0], 'hasVendorName')]
+    assert report.failing == {device_iris[0]}
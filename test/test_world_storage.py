@@ -0,0 +1,85 @@
+"""_____________________________________________________________________
+
+:PROJECT: LabOP Device Ontology
+
+* Tests: storage profiles of the World database *
+
+:details:  bulk_load restores the previous profile, rolls back on errors and rebuilds
+           the deferred indexes, compact() shrinks the database file.
+
+.. note:: -
+.. todo:: -
+________________________________________________________________________
+"""
+
+import os
+
+import pytest
+from ontopy import World
+
+from labop_device_ontology import world_storage
+
+
+@pytest.fixture
+def file_world(tmp_path):
+    world = World(filename=os.path.join(tmp_path, 'world.sqlite3'))
+    yield world
+    world.close()
+
+
+def quadstore_indexes(world) -> set:
+    return {name for (name,) in world.graph.db.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name IN ('objs', 'datas')")}
+
+
+def count_datas(world) -> int:
+    return world.graph.db.execute("SELECT COUNT(*) FROM datas").fetchone()[0]
+
+
+@pytest.mark.parametrize('profile', ['default', 'low_memory', 'wal'])
+def test_bulk_load_restores_the_previous_profile(file_world, profile):
+    world_storage.apply_profile(file_world, profile)
+    pragmas = world_storage.current_pragmas(file_world)
+    indexes = quadstore_indexes(file_world)
+
+    with world_storage.bulk_load(file_world):
+        assert world_storage.current_pragmas(file_world)['cache_size'] == \
+            world_storage.STORAGE_PROFILES['bulk_load']['cache_size']
+        assert not quadstore_indexes(file_world) & indexes
+
+    assert world_storage.current_pragmas(file_world) == pragmas
+    assert quadstore_indexes(file_world) == indexes
+
+
+def test_bulk_load_final_profile(file_world):
+    with world_storage.bulk_load(file_world, final_profile='wal'):
+        pass
+
+    assert world_storage.current_pragmas(file_world)['journal_mode'] == 'wal'
+
+
+def test_bulk_load_rolls_back_on_errors(file_world):
+    ontology = file_world.get_ontology('http://www.example.org/onto#')
+    num_datas = count_datas(file_world)
+    indexes = quadstore_indexes(file_world)
+
+    with pytest.raises(RuntimeError):
+        with world_storage.bulk_load(file_world):
+            ontology.metadata.comment.append('written in the bulk load')
+            assert count_datas(file_world) == num_datas + 1
+            raise RuntimeError("import failed")
+
+    assert count_datas(file_world) == num_datas
+    assert quadstore_indexes(file_world) == indexes
+
+
+def test_compact(file_world):
+    ontology = file_world.get_ontology('http://www.example.org/onto#')
+    ontology.metadata.comment.extend(f"comment {i} " * 20 for i in range(5000))
+    file_world.save()
+    ontology.metadata.comment = []
+    file_world.save()
+
+    size_before, size_after = world_storage.compact(file_world)
+
+    assert size_after == world_storage.database_size(file_world) < size_before